@@ -1,3 +1,4 @@
-__all__ = ["UserCache"]
+__all__ = ["UserCache", "SentNotificationCache"]
 
+from .sent_notification import SentNotificationCache
 from .user import UserCache
@@ -0,0 +1,17 @@
+from redis_wrapper.client import RedisCache
+
+from app.utils import json_dumps, json_loads
+
+
+class SentNotificationCache(RedisCache):
+    _key_prefix = "sent_notification"
+    expire_time = 24 * 60 * 60
+
+    @classmethod
+    async def set_sent(cls, log_id, value: dict):
+        return await cls.set(log_id, json_dumps(value), cls.expire_time)
+
+    @classmethod
+    async def get_sent(cls, log_id):
+        value = await cls.get(log_id)
+        return json_loads(value) if value else None
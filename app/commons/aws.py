@@ -1,8 +1,9 @@
 import re
-from typing import Any, Tuple
+from typing import Any, Optional, Tuple
 
 import aiohttp
 
+from app.commons import http
 from app.constants import aws as ac
 
 
@@ -15,3 +16,24 @@ async def get_file_details(url: str, timeout: int = 30) -> Tuple[str, Any]:
         content = await response.content.read()
         headers = response.headers
         return headers, content
+
+
+def aws_error_type(err: BaseException) -> Optional[str]:
+    """
+    ErrorType of a failed AWS API call (SES, SNS), by its error code
+    """
+    response = getattr(err, "response", None)
+    if not isinstance(response, dict):
+        return http.exception_error_type(err)
+    error = response.get("Error", {})
+    code = error.get("Code")
+    if code in ac.THROTTLING_ERRORS:
+        return http.ErrorType.THROTTLED.value
+    if code in ac.PARAMETER_ERRORS:
+        parameter = re.match(ac.INVALID_PARAMETER_REGEX, error.get("Message") or "")
+        if parameter and parameter.group(1) in ac.RECIPIENT_PARAMETERS:
+            return http.ErrorType.PERMANENT_RECIPIENT.value
+    if code in ac.CONFIG_ERRORS:
+        return http.ErrorType.PERMANENT_CONFIG.value
+    status_code = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return http.error_type_of(status_code) if status_code else None
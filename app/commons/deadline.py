@@ -0,0 +1,39 @@
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+
+# Deadline (by time.monotonic) of the notification being sent in the current context, shared with
+# the tasks and calls made for it
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+def set_deadline(deadline: Optional[float]) -> Token:
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token: Token):
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left before the deadline, None without a deadline
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def expired() -> bool:
+    return remaining() == 0
+
+
+def timeout(default: Optional[float]) -> Optional[float]:
+    """
+    Timeout of a call - `default`, shortened to the time left before the deadline
+    """
+    left = remaining()
+    if left is None:
+        return default
+    return left if default is None else min(default, left)
@@ -1,5 +1,24 @@
+import asyncio
 from dataclasses import dataclass
-from typing import Dict, Optional, Union
+from enum import Enum
+from typing import Dict, Mapping, Optional, Union
+
+import aiohttp
+
+
+class ErrorType(Enum):
+    """
+    Kinds of send failures, deciding what the handler does next
+    """
+
+    # Worth retrying the same gateway - timeouts, connection errors, gateway side errors
+    TRANSIENT = "TRANSIENT"
+    # Gateway rate limit hit, worth retrying the same gateway after a while
+    THROTTLED = "THROTTLED"
+    # The recipient can't be reached by any gateway - invalid number or address, unregistered device
+    PERMANENT_RECIPIENT = "PERMANENT_RECIPIENT"
+    # The gateway configuration is broken - credentials, sender, template
+    PERMANENT_CONFIG = "PERMANENT_CONFIG"
 
 
 @dataclass
@@ -9,6 +28,10 @@ class Response:
     error: Optional[Dict] = None
     event_id: Optional[str] = None
     meta: Optional[Dict] = None
+    # ErrorType value of a failure, None if unknown
+    error_type: Optional[str] = None
+    # Seconds to wait before retrying a throttled send, if the gateway tells
+    retry_after: Optional[float] = None
 
     def __post_init__(self):
         if not self.data and not self.error:
@@ -17,3 +40,37 @@ class Response:
 
 def is_success(status_code: int):
     return 200 <= status_code <= 299
+
+
+def error_type_of(status_code: int) -> Optional[str]:
+    """
+    ErrorType of a failed gateway call, by its HTTP status - None for the statuses not telling
+    """
+    if status_code == 429:
+        return ErrorType.THROTTLED.value
+    if status_code == 408 or status_code >= 500:
+        return ErrorType.TRANSIENT.value
+    if status_code in (401, 403):
+        return ErrorType.PERMANENT_CONFIG.value
+    return None
+
+
+def exception_error_type(err: BaseException) -> Optional[str]:
+    """
+    ErrorType of a gateway call that raised - timeouts and connection errors are transient
+    """
+    # The API client wraps the errors of the underlying requests
+    err = err.__cause__ or err
+    if isinstance(err, (asyncio.TimeoutError, aiohttp.ClientConnectionError, ConnectionError)):
+        return ErrorType.TRANSIENT.value
+    return None
+
+
+def retry_after(headers: Mapping) -> Optional[float]:
+    """
+    Seconds of the Retry-After header of a response, if given as seconds
+    """
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
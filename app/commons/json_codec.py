@@ -0,0 +1,76 @@
+"""
+JSON codec used on the hot paths of the service (SQS messages, status updates, provider APIs).
+
+The fastest available backend is picked at import time - orjson, then ujson, then the standard
+library json module. Accelerated backends are optional dependencies. Whatever the backend,
+`dumps` returns a str and `loads` raises `json.JSONDecodeError` on invalid documents.
+"""
+import json
+from typing import Any, Callable, Dict
+
+JSONDecodeError = json.JSONDecodeError
+
+
+def _stdlib_backend() -> Dict[str, Callable]:
+    return {"dumps": json.dumps, "loads": json.loads}
+
+
+def _orjson_backend() -> Dict[str, Callable]:
+    import orjson
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    # orjson.JSONDecodeError is a subclass of json.JSONDecodeError
+    return {"dumps": dumps, "loads": orjson.loads}
+
+
+def _ujson_backend() -> Dict[str, Callable]:
+    import ujson
+
+    def loads(s: str) -> Any:
+        try:
+            return ujson.loads(s)
+        except ValueError as err:
+            raise JSONDecodeError(str(err), s if isinstance(s, str) else "", 0) from err
+
+    return {"dumps": ujson.dumps, "loads": loads}
+
+
+BACKENDS = {
+    "orjson": _orjson_backend,
+    "ujson": _ujson_backend,
+    "json": _stdlib_backend,
+}
+
+backend_name: str = None
+_dumps: Callable = None
+_loads: Callable = None
+
+
+def set_backend(name: str):
+    global backend_name, _dumps, _loads
+    backend = BACKENDS[name]()
+    backend_name, _dumps, _loads = name, backend["dumps"], backend["loads"]
+
+
+def available_backends() -> list:
+    available = []
+    for name, backend in BACKENDS.items():
+        try:
+            backend()
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def dumps(obj: Any) -> str:
+    return _dumps(obj)
+
+
+def loads(s: str) -> Any:
+    return _loads(s)
+
+
+set_backend(available_backends()[0])
@@ -0,0 +1,149 @@
+import base64
+import gzip
+import logging
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import aiobotocore
+
+from app.utils import json_dumps
+
+logger = logging.getLogger()
+
+
+def project(value: Any, fields: Optional[List[str]]) -> Any:
+    """
+    Keep only the given fields of a dict. Fields are dotted paths, `*` matches any key - for
+    example `results.id` or `msys.*.type`. Missing paths are skipped, values other than dicts (and
+    everything when `fields` is None) are kept as is.
+    """
+    if fields is None or not isinstance(value, dict):
+        return value
+    projected = {}
+    for field in fields:
+        _copy_path(value, projected, field.split("."))
+    return projected
+
+
+def _copy_path(source: Dict, target: Dict, path: List[str]):
+    key, rest = path[0], path[1:]
+    keys = list(source) if key == "*" else [key]
+    for key in keys:
+        if key not in source:
+            continue
+        if not rest:
+            target[key] = source[key]
+        elif isinstance(source[key], dict):
+            child = target.setdefault(key, {})
+            if isinstance(child, dict):
+                _copy_path(source[key], child, rest)
+
+
+class BlobStore(ABC):
+    """
+    Where the claim checked status update fields are stored
+    """
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes) -> str:
+        """
+        Store a blob, returns its URI
+        """
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    async def put(self, key: str, data: bytes) -> str:
+        path = os.path.join(self.directory, key)
+        with open(path, "wb") as blob:
+            blob.write(data)
+        return "file://{}".format(path)
+
+
+class S3BlobStore(BlobStore):
+    def __init__(self, config: Dict):
+        self.bucket = config["BUCKET"]
+        self.prefix = config.get("PREFIX", "")
+        self.region = config.get("REGION")
+        self.endpoint_url = config.get("ENDPOINT_URL")
+        self.session = aiobotocore.session.get_session()
+
+    async def put(self, key: str, data: bytes) -> str:
+        key = self.prefix + key
+        async with self.session.create_client(
+            service_name="s3",
+            region_name=self.region,
+            endpoint_url=self.endpoint_url,
+        ) as client:
+            await client.put_object(Bucket=self.bucket, Key=key, Body=data)
+        return "s3://{}/{}".format(self.bucket, key)
+
+
+class StatusCompactor:
+    """
+    Shrinks status updates before they are published.
+
+    `metadata` is projected to the `__metadata_fields__` of the provider. `message` and `metadata`
+    values larger than `max_field_bytes` (once JSON encoded) are gzipped, and if still too large,
+    moved to the claim check `store` (a pointer to them is published instead) or truncated without
+    a store. Finally, a whole update larger than `max_message_bytes` is moved to the `store`,
+    only its identifying fields are published along with the pointer.
+    """
+
+    COMPACTED_FIELDS = ("message", "metadata")
+    # Fields kept in the published update when the whole update is claim checked
+    IDENTIFYING_FIELDS = (
+        "sent_at",
+        "notification_log_id",
+        "status",
+        "operator",
+        "operator_event_id",
+        "channel",
+        "attempt_number",
+    )
+
+    def __init__(
+        self,
+        max_field_bytes: int = 4096,
+        compress: bool = True,
+        max_message_bytes: int = 64 * 1024,
+        store: Optional[BlobStore] = None,
+    ):
+        self.max_field_bytes = max_field_bytes
+        self.compress = compress
+        self.max_message_bytes = max_message_bytes
+        self.store = store
+
+    async def compact(self, payload: Dict, metadata_fields: Optional[List[str]] = None) -> str:
+        payload["metadata"] = project(payload.get("metadata"), metadata_fields)
+        for field in self.COMPACTED_FIELDS:
+            encoded = json_dumps(payload.get(field))
+            if len(encoded) > self.max_field_bytes:
+                payload[field] = await self._shrink(encoded)
+
+        message = json_dumps(payload)
+        if len(message) <= self.max_message_bytes or not self.store:
+            return message
+        compacted = {
+            field: payload[field] for field in self.IDENTIFYING_FIELDS if field in payload
+        }
+        compacted["claim_check"] = await self._claim_check(message)
+        return json_dumps(compacted)
+
+    async def _shrink(self, encoded: str) -> Dict:
+        if self.compress:
+            compressed = base64.b64encode(gzip.compress(encoded.encode("utf-8"))).decode()
+            if len(compressed) <= self.max_field_bytes:
+                return {"encoding": "gzip+base64", "data": compressed}
+        if self.store:
+            return {"claim_check": await self._claim_check(encoded), "size": len(encoded)}
+        return {"truncated": True, "size": len(encoded), "data": encoded[: self.max_field_bytes]}
+
+    async def _claim_check(self, encoded: str) -> str:
+        key = "{}.json.gz".format(uuid.uuid4().hex)
+        return await self.store.put(key, gzip.compress(encoded.encode("utf-8")))
@@ -0,0 +1,77 @@
+import logging
+from typing import Dict, List
+
+from torpedo.exceptions import HTTPRequestException
+
+from app.commons.logging.sqs import BatchSQSLogger, SQSAioLogger
+from app.service_clients.notifyone_core import NotifyOneCoreClient
+
+logger = logging.getLogger()
+
+
+class CoreStatusClient:
+    """
+    Publishes status updates straight to notifyone-core's bulk endpoint, behind the same interface
+    as `APIClientSQS.publish_messages` so that the batching, spooling and replaying of the SQS
+    status loggers work unchanged.
+    """
+
+    # Statuses worth retrying a request for, any other client error would fail the same way
+    RETRYABLE_STATUSES = (408, 429)
+
+    async def publish_messages(self, entries: List[Dict[str, str]]) -> Dict:
+        try:
+            failed = await NotifyOneCoreClient.publish_status_updates(
+                [entry["MessageBody"] for entry in entries]
+            )
+        except HTTPRequestException as err:
+            if err.status_code >= 500 or err.status_code in self.RETRYABLE_STATUSES:
+                raise
+            logger.error("notifyone-core rejected status updates: %s", err)
+            return {
+                "Failed": [{"Id": entry["Id"], "SenderFault": True} for entry in entries]
+            }
+        return {
+            "Failed": [
+                {"Id": entries[index]["Id"], "SenderFault": False} for index in failed
+            ]
+        }
+
+
+class CoreStatusLogger(BatchSQSLogger):
+    # notifyone-core accepts larger batches than SQS
+    MAX_BATCH_SIZE = 100
+    MAX_BATCH_BYTES = 1024 * 1024
+
+
+class CoreAioLogger(SQSAioLogger):
+    """
+    Status sink publishing the updates to notifyone-core directly, instead of through the status
+    updates queue. Updates are always batched, NOTIFYONE_CORE.STATUS_UPDATES_BATCH_SIZE at a time.
+    The other SQS.PUBLISH.LOGGING BATCH settings, and the SPOOL and COMPACTION ones, apply as they
+    do for the SQS sink.
+    """
+
+    batch_logger_class = CoreStatusLogger
+
+    def __init__(self, config: Dict) -> None:
+        # The settings are shared with the SQS sink, its SQS client isn't
+        self._configure(config)
+        self.core_client = CoreStatusClient()
+
+    async def _connect(self):
+        """
+        noop, requests go through NotifyOneCoreClient
+        """
+
+    def _publisher(self) -> CoreStatusClient:
+        return self.core_client
+
+    def _batched(self) -> bool:
+        return True
+
+    def _batch_size(self) -> int:
+        # Not the SQS batch size, notifyone-core takes larger batches
+        return NotifyOneCoreClient.ns_config.get(
+            "STATUS_UPDATES_BATCH_SIZE", CoreStatusLogger.MAX_BATCH_SIZE
+        )
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from app.commons.logging import types
+
+logger = logging.getLogger()
+
+
+class OutboxLogger(types.AsyncLogger):
+    def __init__(self, outbox: "StatusOutbox") -> None:
+        self.outbox = outbox
+
+    async def log(self, log: types.LogRecord, extras: Optional[Dict] = None):
+        await self.outbox.put(log, extras)
+
+
+class StatusOutbox(types.AsyncLoggerContextCreator):
+    """
+    Takes status logging off the send path - records are put in a bounded in-process outbox and
+    logged with the wrapped `logger` by `publishers` background tasks, so that logging costs a
+    send nothing more than an enqueue.
+
+    When the outbox is full, the `overflow` policy applies - BLOCK waits for room in the outbox
+    (the send path slows down to the logging throughput), SPILL hands the record to the `spill` of
+    the wrapped logger (i.e. writes it to the local status spool) and counts it in `spilled`, DROP
+    discards the record and counts it in `dropped`.
+    """
+
+    BLOCK = "BLOCK"
+    SPILL = "SPILL"
+    DROP = "DROP"
+
+    def __init__(
+        self,
+        logger: types.AsyncLoggerContextCreator,
+        max_size: int = 10000,
+        overflow: str = BLOCK,
+        publishers: int = 4,
+        drain_timeout: float = 10,
+    ) -> None:
+        if overflow not in (self.BLOCK, self.SPILL, self.DROP):
+            raise ValueError("Unknown outbox overflow policy {}".format(overflow))
+        self.logger = logger
+        self.max_size = max_size
+        self.overflow = overflow
+        self.publishers = max(1, publishers)
+        self.drain_timeout = drain_timeout
+        self.spilled = 0
+        self.dropped = 0
+
+        self._outbox_logger = OutboxLogger(self)
+        self._queue: asyncio.Queue = None
+        self._publishers: List[asyncio.Task] = []
+
+    def __len__(self):
+        return self._queue.qsize() if self._queue else 0
+
+    async def __aenter__(self) -> OutboxLogger:
+        if self._queue is None:
+            # Created lazily, within the event loop of the process using it
+            self._queue = asyncio.Queue(self.max_size)
+            self._publishers = [
+                asyncio.create_task(self._publish()) for _ in range(self.publishers)
+            ]
+        return self._outbox_logger
+
+    async def put(self, log: types.LogRecord, extras: Optional[Dict] = None):
+        record = (log, extras)
+        if self.overflow == self.BLOCK:
+            await self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            if self.overflow == self.SPILL:
+                self.spilled += 1
+                await self.logger.spill(log, extras)
+                return
+            self.dropped += 1
+            logger.warning(
+                "Status outbox full, dropped update of %s (%s dropped so far)",
+                log.log_id,
+                self.dropped,
+            )
+
+    async def _publish(self):
+        while True:
+            log, extras = await self._queue.get()
+            try:
+                async with self.logger as status_logger:
+                    await status_logger.log(log, extras)
+            except Exception as err:
+                logger.error("Couldn't log status update of %s: %s", log.log_id, err)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict:
+        return {"pending": len(self), "spilled": self.spilled, "dropped": self.dropped}
+
+    async def close(self):
+        """
+        Wait (for at most `drain_timeout` seconds) for the outbox to be drained, then close the
+        wrapped logger
+        """
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "%s status updates still in the outbox at the shutdown deadline", len(self)
+                )
+            for publisher in self._publishers:
+                publisher.cancel()
+        await self.logger.close()
+
+    async def abandon(self):
+        if self._queue is not None:
+            for publisher in self._publishers:
+                publisher.cancel()
+            while not self._queue.empty():
+                log, _ = self._queue.get_nowait()
+                logger.error("Dropping status update of %s at the shutdown deadline", log.log_id)
+        await self.logger.abandon()
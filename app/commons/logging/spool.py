@@ -0,0 +1,262 @@
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+from typing import List, Tuple
+
+from app.pubsub.sqs import APIClientSQS
+
+logger = logging.getLogger()
+
+
+class StatusSpool:
+    """
+    Append-only local spool of status updates (one JSON document per line), for the updates that
+    couldn't be published to SQS.
+
+    Updates are appended to segment files of `segment_bytes`, a new segment is started once the
+    current one is full. At most `max_segments` segments are kept, the oldest one is discarded
+    beyond that. With `use_mmap`, segments are preallocated and written through a memory map
+    instead of file writes.
+
+    Updates are read back in order from the position of a cursor persisted next to the segments,
+    which only moves on `commit` - so updates read but not yet published are read again after a
+    restart. Every process claims a spool of its own under `directory`, a process started after
+    another one died takes over (and replays) the spool it left behind.
+    """
+
+    SEGMENT_SUFFIX = ".log"
+    READ_CHUNK_BYTES = 1024 * 1024
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 16 * 1024 * 1024,
+        max_segments: int = 64,
+        use_mmap: bool = False,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max(2, max_segments)
+        self.use_mmap = use_mmap
+        self.discarded_segments = 0
+
+        self.path: str = None
+        self._lock = None
+        self._segments: List[int] = []
+        self._writer = None
+        self._map: mmap.mmap = None
+        self._write_offset = 0
+        # (segment, offset) of the first update not published yet
+        self._cursor: Tuple[int, int] = (0, 0)
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        index = 0
+        while True:
+            path = os.path.join(self.directory, str(index))
+            os.makedirs(path, exist_ok=True)
+            lock = open(os.path.join(path, "lock"), "w")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                lock.close()
+                index += 1
+        self.path, self._lock = path, lock
+
+        self._segments = sorted(
+            int(name[: -len(self.SEGMENT_SUFFIX)])
+            for name in os.listdir(path)
+            if name.endswith(self.SEGMENT_SUFFIX)
+        )
+        self._cursor = self._read_cursor()
+        # Never append to a segment left behind, it may be preallocated
+        self._start_segment((self._segments[-1] + 1) if self._segments else 0)
+        logger.info("Opened status spool %s, %s segments", path, len(self._segments))
+
+    def close(self):
+        self._close_segment()
+        if self._lock:
+            self._lock.close()
+
+    def pending_bytes(self) -> int:
+        """
+        Approximate size of the updates not published yet
+        """
+        segment, offset = self._cursor
+        size = 0
+        for seq in self._segments:
+            if seq == self._segments[-1]:
+                size += self._write_offset
+            elif seq >= segment:
+                size += os.path.getsize(self._segment_path(seq))
+        return max(0, size - offset)
+
+    def append(self, record: str):
+        data = record.encode("utf-8") + b"\n"
+        if self._write_offset + len(data) > self.segment_bytes and self._write_offset:
+            self._start_segment(self._segments[-1] + 1)
+        if self._map is not None and self._write_offset + len(data) <= self.segment_bytes:
+            self._map[self._write_offset : self._write_offset + len(data)] = data
+        else:
+            # Records larger than a segment are written past its preallocated size
+            self._writer.seek(self._write_offset)
+            self._writer.write(data)
+            self._writer.flush()
+        self._write_offset += len(data)
+
+    def read(self, max_records: int) -> Tuple[List[str], Tuple[int, int]]:
+        """
+        Read up to `max_records` updates from the cursor, returns them along with the position to
+        `commit` once they are published
+        """
+        segment, offset = self._cursor
+        while True:
+            if segment not in self._segments:
+                later = [seq for seq in self._segments if seq > segment]
+                if not later:
+                    return [], (segment, offset)
+                segment, offset = later[0], 0
+
+            with open(self._segment_path(segment), "rb") as reader:
+                reader.seek(offset)
+                chunk = reader.read(self.READ_CHUNK_BYTES)
+                # An update longer than a chunk is read whole
+                while b"\n" not in chunk and b"\0" not in chunk:
+                    more = reader.read(self.READ_CHUNK_BYTES)
+                    if not more:
+                        break
+                    chunk += more
+            # Preallocated segments are zero filled past their last update
+            chunk = chunk.split(b"\0", 1)[0]
+            lines = chunk.split(b"\n")[:-1][:max_records]
+            if lines:
+                position = offset + sum(len(line) + 1 for line in lines)
+                return [line.decode("utf-8") for line in lines], (segment, position)
+            if segment == self._segments[-1]:
+                return [], (segment, offset)
+            # Done with a full segment, moving on to the next one
+            segment, offset = segment + 1, 0
+
+    def commit(self, position: Tuple[int, int]):
+        segment, _ = position
+        self._cursor = position
+        cursor_path = os.path.join(self.path, "cursor")
+        with open(cursor_path + ".tmp", "w") as cursor:
+            cursor.write("{} {}".format(*position))
+        os.replace(cursor_path + ".tmp", cursor_path)
+        # Segments before the cursor are published
+        for seq in [seq for seq in self._segments[:-1] if seq < segment]:
+            self._remove_segment(seq)
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.path, "{:012d}{}".format(seq, self.SEGMENT_SUFFIX))
+
+    def _read_cursor(self) -> Tuple[int, int]:
+        try:
+            with open(os.path.join(self.path, "cursor")) as cursor:
+                segment, offset = cursor.read().split()
+                return int(segment), int(offset)
+        except (OSError, ValueError):
+            return (self._segments[0], 0) if self._segments else (0, 0)
+
+    def _start_segment(self, seq: int):
+        self._close_segment()
+        writer = open(self._segment_path(seq), "w+b")
+        if self.use_mmap:
+            writer.truncate(self.segment_bytes)
+            self._map = mmap.mmap(writer.fileno(), self.segment_bytes)
+        self._writer = writer
+        self._write_offset = 0
+        self._segments.append(seq)
+
+        while len(self._segments) > self.max_segments:
+            oldest = self._segments[0]
+            logger.error("Status spool full, discarding segment %s", oldest)
+            self.discarded_segments += 1
+            self._remove_segment(oldest)
+
+    def _remove_segment(self, seq: int):
+        self._segments.remove(seq)
+        try:
+            os.remove(self._segment_path(seq))
+        except OSError as err:
+            logger.error("Couldn't remove status spool segment %s: %s", seq, err)
+
+    def _close_segment(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._map = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+
+class SpoolReplayer:
+    """
+    Publishes the spooled status updates back to SQS, in batches of 10 and at most `rate` updates
+    per second, so that a recovering queue isn't flooded on top of the live traffic. Replaying
+    backs off for `retry_interval` seconds while publishing fails.
+    """
+
+    # SQS allows sending at most 10 messages in a single call
+    BATCH_SIZE = 10
+
+    def __init__(
+        self,
+        spool: StatusSpool,
+        sqs_client: APIClientSQS,
+        rate: float = 50,
+        idle_interval: float = 5,
+        retry_interval: float = 30,
+    ):
+        self.spool = spool
+        self.sqs_client = sqs_client
+        self.rate = rate
+        self.idle_interval = idle_interval
+        self.retry_interval = retry_interval
+        self.replayed = 0
+        self._replayer: asyncio.Task = None
+
+    def start(self):
+        self._replayer = asyncio.create_task(self._replay_periodically())
+
+    def stop(self):
+        if self._replayer:
+            self._replayer.cancel()
+
+    async def _replay_periodically(self):
+        while True:
+            try:
+                await asyncio.sleep(await self.replay())
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.error("Couldn't replay spooled status updates: %s", err)
+                await asyncio.sleep(self.retry_interval)
+
+    async def replay(self) -> float:
+        """
+        Replay one batch, returns the time to wait before the next one
+        """
+        records, position = self.spool.read(self.BATCH_SIZE)
+        if not records:
+            return self.idle_interval
+        entries = [
+            {"Id": str(index), "MessageBody": record} for index, record in enumerate(records)
+        ]
+        response = await self.sqs_client.publish_messages(entries)
+        self.spool.commit(position)
+        failed = response.get("Failed", [])
+        for entry in failed:
+            # Spooled again, to be replayed after the ones spooled in the meantime
+            if not entry.get("SenderFault", False):
+                self.spool.append(records[int(entry["Id"])])
+        self.replayed += len(records) - len(failed)
+        if failed:
+            logger.error("Couldn't replay %s spooled status updates", len(failed))
+            return self.retry_interval
+        return len(records) / self.rate
@@ -1,11 +1,18 @@
-import json
+import asyncio
+import logging
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 from app.commons import http, time
 from app.commons.logging import types
+from app.commons.logging.compaction import (LocalBlobStore, S3BlobStore,
+                                            StatusCompactor)
+from app.commons.logging.spool import SpoolReplayer, StatusSpool
 from app.pubsub.sqs import APIClientSQS
 from app.services.handlers.notifier import Notifier
+from app.utils import json_dumps
+
+logger = logging.getLogger()
 
 
 @dataclass
@@ -20,27 +27,51 @@ class SQSLogRecord:
 
 
 class SQSLogger(types.AsyncLogger):
-    def __init__(self, sqs_client: APIClientSQS) -> None:
+    """
+    Publishes status updates to SQS, shrunk by the `compactor` if any. With a `spool`, updates
+    whose publishing fails or takes more than `latency_budget` seconds are written to the spool
+    instead, for a `SpoolReplayer` to publish them later.
+    """
+
+    def __init__(
+        self,
+        sqs_client: APIClientSQS,
+        spool: Optional[StatusSpool] = None,
+        latency_budget: Optional[float] = None,
+        compactor: Optional[StatusCompactor] = None,
+    ) -> None:
         self.sqs_client = sqs_client
+        self.spool = spool
+        self.latency_budget = latency_budget
+        self.compactor = compactor
 
     @staticmethod
     def __construct_message(
         log: types.LogRecord, sqsrecord: SQSLogRecord, extras: Dict = None
-    ):
+    ) -> Dict:
         extras = extras or {}
-        return json.dumps(
-            {
-                "sent_at": time.now(as_str=True),
-                "notification_log_id": log.log_id,
-                "status": sqsrecord.status,
-                "message": sqsrecord.response.data
-                if sqsrecord.response.data
-                else sqsrecord.response.error,
-                "operator": sqsrecord.provider.__provider__,
-                "operator_event_id": sqsrecord.response.event_id,
-                "metadata": sqsrecord.response.meta,
-                **extras,
-            }
+        return {
+            "sent_at": time.now(as_str=True),
+            "notification_log_id": log.log_id,
+            "status": sqsrecord.status,
+            "message": sqsrecord.response.data
+            if sqsrecord.response.data
+            else sqsrecord.response.error,
+            "operator": sqsrecord.provider.__provider__,
+            "operator_event_id": sqsrecord.response.event_id,
+            "metadata": sqsrecord.response.meta,
+            **extras,
+        }
+
+    async def _message(self, log: types.LogRecord, extras: Dict) -> str:
+        sqsrecord = SQSLogRecord(
+            extras.pop("provider"), extras.pop("response"), extras.pop("status", None)
+        )
+        payload = self.__construct_message(log, sqsrecord, extras)
+        if not self.compactor:
+            return json_dumps(payload)
+        return await self.compactor.compact(
+            payload, getattr(sqsrecord.provider, "__metadata_fields__", None)
         )
 
     async def log(
@@ -48,30 +79,279 @@ class SQSLogger(types.AsyncLogger):
         log: types.LogRecord,
         extras: Optional[Dict] = None,
     ):
-        sqsrecord = SQSLogRecord(
-            extras.pop("provider"), extras.pop("response"), extras.pop("status", None)
-        )
-        message = self.__construct_message(log, sqsrecord, extras)
-        await self.sqs_client.publish_to_sqs(payload=message, batch=False)
+        await self.publish(await self._message(log, extras))
+
+    async def spill(self, log: types.LogRecord, extras: Optional[Dict] = None):
+        """
+        Write a status update straight to the spool
+        """
+        self.spool.append(await self._message(log, extras))
+
+    async def publish(self, message: str):
+        try:
+            await asyncio.wait_for(
+                self.sqs_client.publish_to_sqs(payload=message, batch=False),
+                self.latency_budget,
+            )
+        except Exception as err:
+            if not self.spool:
+                raise
+            logger.warning("Couldn't publish status update, spooling it: %r", err)
+            self.spool.append(message)
+
+
+class BatchSQSLogger(SQSLogger):
+    """
+    Buffers the status updates and publishes them with SendMessageBatch - once `batch_size`
+    messages are pending or every `flush_interval` seconds, whichever comes first. A batch holds
+    at most 10 messages and 256KB. Messages failed in a batch are retried with the next batches,
+    up to `max_retries` times (and spooled, if there's a spool, after that).
+
+    At most `max_buffered` messages are pending or being sent, `publish` waits for room beyond that
+    (i.e. while SQS can't keep up).
+    """
+
+    # SQS allows sending at most 10 messages and 256KB in a single call
+    MAX_BATCH_SIZE = 10
+    MAX_BATCH_BYTES = 256 * 1024
+
+    def __init__(
+        self,
+        sqs_client: APIClientSQS,
+        batch_size: int = 10,
+        flush_interval: float = 1,
+        max_buffered: int = 1000,
+        max_retries: int = 3,
+        spool: Optional[StatusSpool] = None,
+        latency_budget: Optional[float] = None,
+        compactor: Optional[StatusCompactor] = None,
+    ) -> None:
+        super().__init__(sqs_client, spool, latency_budget, compactor)
+        self.batch_size = max(1, min(batch_size, self.MAX_BATCH_SIZE))
+        self.flush_interval = flush_interval
+        self.max_buffered = max(self.batch_size, max_buffered)
+        self.max_retries = max_retries
+        # (message, attempts made)
+        self._pending: List[Tuple[str, int]] = []
+        self._sending = 0
+        self._room = asyncio.Condition()
+        self._flusher: asyncio.Task = None
+
+    def start(self):
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._flusher:
+            self._flusher.cancel()
+        # Failed messages are retried a bounded number of times, this ends
+        while self._pending:
+            await self.flush()
+
+    def abandon(self):
+        """
+        Give up on the pending messages - spool them if there's a spool, log them otherwise
+        """
+        if self._flusher:
+            self._flusher.cancel()
+        pending, self._pending = self._pending, []
+        for message, _ in pending:
+            if self.spool:
+                self.spool.append(message)
+            else:
+                logger.error("Dropping status update at the shutdown deadline: %s", message)
+
+    async def publish(self, message: str):
+        async with self._room:
+            await self._room.wait_for(
+                lambda: len(self._pending) + self._sending < self.max_buffered
+            )
+            self._pending.append((message, 0))
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        # Messages failed in this flush are put back, for the next one to retry them
+        pending, self._pending = self._pending, []
+        taken = len(pending)
+        self._sending += taken
+        failed = []
+        try:
+            while pending:
+                batch = self._next_batch(pending)
+                failed.extend(await self._send_batch(batch))
+                pending = pending[len(batch) :]
+        finally:
+            async with self._room:
+                self._sending -= taken
+                self._pending = failed + pending + self._pending
+                self._room.notify_all()
+
+    def _next_batch(self, pending: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        batch, size = [], 0
+        for message, attempts in pending[: self.batch_size]:
+            message_size = len(message.encode("utf-8"))
+            if batch and size + message_size > self.MAX_BATCH_BYTES:
+                break
+            batch.append((message, attempts))
+            size += message_size
+        return batch
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as err:
+                logger.error("Couldn't flush status updates: %s", err)
+
+    async def _send_batch(self, batch: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """
+        Send a batch, returns the messages to retry
+        """
+        entries = [
+            {"Id": str(index), "MessageBody": message}
+            for index, (message, _) in enumerate(batch)
+        ]
+        try:
+            response = await asyncio.wait_for(
+                self.sqs_client.publish_messages(entries), self.latency_budget
+            )
+            failed = {
+                int(entry["Id"]): entry.get("SenderFault", False)
+                for entry in response.get("Failed", [])
+            }
+        except Exception as err:
+            logger.error("Couldn't publish status updates in batch: %r", err)
+            failed = {index: False for index in range(len(batch))}
+
+        retry = []
+        for index, sender_fault in failed.items():
+            message, attempts = batch[index]
+            # Sender faults (like a message too large) fail the same way when retried
+            if sender_fault or attempts + 1 > self.max_retries:
+                if self.spool and not sender_fault:
+                    self.spool.append(message)
+                    continue
+                logger.error("Dropping status update after %s attempts: %s", attempts + 1, message)
+                continue
+            retry.append((message, attempts + 1))
+        return retry
 
 
 class SQSAioLogger(types.AsyncLoggerContextCreator):
+    batch_logger_class = BatchSQSLogger
+
     def __init__(self, config: Dict) -> None:
+        self._configure(config)
+        self.sqs_client = APIClientSQS(config)
+
+    def _configure(self, config: Dict):
         self.logger: SQSLogger = None
         self.queue_name = config.get("QUEUE_NAME")
-        self.sqs_client = APIClientSQS(config)
+        self.batch = config.get("BATCH", {})
+        self.spool_config = config.get("SPOOL", {})
+        self.compaction = config.get("COMPACTION", {})
+        self.spool: StatusSpool = None
+        self.replayer: SpoolReplayer = None
 
         self._client_created = False
 
     async def __aenter__(self) -> SQSLogger:
         if not self._client_created:
-            await self.sqs_client.get_sqs_client(self.queue_name)
-            self.logger = SQSLogger(self.sqs_client)
-            self._client_created = True
+            await self._connect()
+            # Another task may have created the logger in the meantime
+            if not self._client_created:
+                self.logger = self._create_logger()
+                self._client_created = True
 
         return self.logger
 
+    async def _connect(self):
+        await self.sqs_client.get_sqs_client(self.queue_name)
+
+    def _publisher(self) -> APIClientSQS:
+        """
+        Client the status updates are published, and replayed from the spool, through
+        """
+        return self.sqs_client
+
+    def _batched(self) -> bool:
+        return self.batch.get("ENABLED", False)
+
+    def _batch_size(self) -> int:
+        return self.batch.get("SIZE", 10)
+
+    def _create_logger(self) -> SQSLogger:
+        latency_budget = None
+        if self.spool_config.get("ENABLED"):
+            self.spool = StatusSpool(
+                self.spool_config["DIRECTORY"],
+                segment_bytes=self.spool_config.get("SEGMENT_BYTES", 16 * 1024 * 1024),
+                max_segments=self.spool_config.get("MAX_SEGMENTS", 64),
+                use_mmap=self.spool_config.get("MMAP", False),
+            )
+            self.spool.open()
+            self.replayer = SpoolReplayer(
+                self.spool, self._publisher(), rate=self.spool_config.get("REPLAY_RATE", 50)
+            )
+            self.replayer.start()
+            latency_budget = self.spool_config.get("LATENCY_BUDGET")
+
+        compactor = self._create_compactor()
+        if not self._batched():
+            return SQSLogger(self._publisher(), self.spool, latency_budget, compactor)
+        batch_logger = self.batch_logger_class(
+            self._publisher(),
+            batch_size=self._batch_size(),
+            flush_interval=self.batch.get("FLUSH_INTERVAL", 1),
+            max_buffered=self.batch.get("MAX_BUFFERED", 1000),
+            max_retries=self.batch.get("MAX_RETRIES", 3),
+            spool=self.spool,
+            latency_budget=latency_budget,
+            compactor=compactor,
+        )
+        batch_logger.start()
+        return batch_logger
+
+    def _create_compactor(self) -> Optional[StatusCompactor]:
+        if not self.compaction.get("ENABLED"):
+            return None
+        store = None
+        claim_check = self.compaction.get("CLAIM_CHECK", {})
+        if claim_check.get("STORE") == "LOCAL":
+            store = LocalBlobStore(claim_check["DIRECTORY"])
+        elif claim_check.get("STORE") == "S3":
+            store = S3BlobStore(claim_check)
+        return StatusCompactor(
+            max_field_bytes=self.compaction.get("MAX_FIELD_BYTES", 4096),
+            compress=self.compaction.get("COMPRESS", True),
+            max_message_bytes=self.compaction.get("MAX_MESSAGE_BYTES", 64 * 1024),
+            store=store,
+        )
+
+    async def spill(self, log: types.LogRecord, extras: Optional[Dict] = None):
+        sqs_logger = await self.__aenter__()
+        if not self.spool:
+            return await super().spill(log, extras)
+        await sqs_logger.spill(log, extras)
+
     async def __aexit__(self, *args):
         """
         noop
         """
+
+    async def close(self):
+        if self.replayer:
+            self.replayer.stop()
+        if isinstance(self.logger, BatchSQSLogger):
+            await self.logger.stop()
+        if self.spool:
+            self.spool.close()
+
+    async def abandon(self):
+        if self.replayer:
+            self.replayer.stop()
+        if isinstance(self.logger, BatchSQSLogger):
+            self.logger.abandon()
+        if self.spool:
+            self.spool.close()
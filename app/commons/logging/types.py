@@ -34,3 +34,22 @@ class AsyncLoggerContextCreator(ABC):
         """
         Async context manager method to operator while exiting from context manager
         """
+
+    async def spill(self, log: LogRecord, extras: Optional[Dict] = None):
+        """
+        Log a record that can't be kept in memory. Loggers having local storage persist it there,
+        to be logged later, others log it right away
+        """
+        async with self as logger:
+            await logger.log(log, extras)
+
+    async def close(self):
+        """
+        Flush whatever is pending to be logged, called once at shutdown
+        """
+
+    async def abandon(self):
+        """
+        Called at shutdown when `close` didn't finish in time - spool, or at least log, whatever
+        is still pending, without waiting for the network
+        """
@@ -0,0 +1,98 @@
+import asyncio
+import ssl
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+
+class RedisError(Exception):
+    """
+    Error reply of Redis
+    """
+
+
+class RedisConnection:
+    """
+    A single connection to Redis, speaking RESP2. Neither a Redis client nor redis_wrapper can be
+    installed along with the locked dependencies (redis-py's asyncio client needs async-timeout 4,
+    aiohttp 3.7 needs async-timeout 3), so this covers the few commands run by the handlers.
+
+    `url` - redis://[:password@]host[:port][/db], or rediss:// for TLS. Commands are sent one at a
+    time and time out after `timeout` seconds, the connection is opened again by the next command
+    after a failure.
+    """
+
+    def __init__(self, url: str, timeout: float = 1):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.ssl = parsed.scheme == "rediss"
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def execute(self, *args) -> Any:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                return await asyncio.wait_for(self._execute(args), self.timeout)
+            except RedisError:
+                raise
+            except BaseException:
+                # The reply may still be on its way, the connection can't be reused
+                await self.close()
+                raise
+
+    async def close(self):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+
+    async def _execute(self, args) -> Any:
+        if self._writer is None:
+            await self._connect()
+        return await self._command(args)
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context() if self.ssl else None
+        )
+        if self.password:
+            await self._command(("AUTH", self.password))
+        if self.db:
+            await self._command(("SELECT", self.db))
+
+    async def _command(self, args) -> Any:
+        self._writer.write(self._encode(args))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            value = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(value), value))
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = (await self._reader.readuntil(b"\r\n"))[:-2]
+        kind, value = line[:1], line[1:]
+        if kind == b"+":
+            return value.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(value.decode("utf-8"))
+        if kind == b":":
+            return int(value)
+        if kind == b"$":
+            if int(value) < 0:
+                return None
+            return (await self._reader.readexactly(int(value) + 2))[:-2]
+        if kind == b"*":
+            if int(value) < 0:
+                return None
+            return [await self._read_reply() for _ in range(int(value))]
+        raise ConnectionError("Unexpected reply from Redis: {!r}".format(line))
@@ -1 +1,30 @@
 PRESIGNED_S3_URL_REGEX = "[a-zA-z0-9:/\-?]+\.[a-z0-9]+\.[a-z]+\.[a-z]+\/[a-zA-Z0-9_\-/]+\.[a-z]+\?[a-zA-Z0-9\-/:?=]"
+
+# Error codes of the SES and SNS APIs, by kind of failure
+THROTTLING_ERRORS = {
+    "Throttling",
+    "ThrottlingException",
+    "Throttled",
+    "TooManyRequestsException",
+}
+# Codes of invalid request parameters, also returned for configuration problems (sender ID,
+# message attributes, unverified From address). A bad recipient only when the error is about the
+# recipient parameter - "Invalid parameter: PhoneNumber Reason: ..."
+PARAMETER_ERRORS = {
+    "InvalidParameter",
+    "InvalidParameterValue",
+}
+RECIPIENT_PARAMETERS = {"PhoneNumber"}
+INVALID_PARAMETER_REGEX = r"^Invalid parameter: (\w+)"
+CONFIG_ERRORS = {
+    "AccessDenied",
+    "AccessDeniedException",
+    "AuthorizationError",
+    "InvalidClientTokenId",
+    "SignatureDoesNotMatch",
+    "UnrecognizedClientException",
+    "MessageRejected",
+    "MailFromDomainNotVerifiedException",
+    "ConfigurationSetDoesNotExistException",
+    "AccountSendingPausedException",
+}
@@ -33,6 +33,8 @@ class HTTPStatusCodes(Enum):
     NOT_FOUND = 404
     INTERNAL_ERROR = 500
     TIMEOUT_ERROR = 408
+    TOO_MANY_REQUESTS = 429
+    SERVICE_UNAVAILABLE = 503
 
 
 class Channels(CustomEnum):
@@ -0,0 +1,3 @@
+from .exceptions import (MessageDecodeError, MissingFieldError,
+                         PoisonMessageError, PriorityLogicError,
+                         UnknownChannelError)
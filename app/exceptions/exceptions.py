@@ -0,0 +1,36 @@
+class PoisonMessageError(Exception):
+    """
+    A message that can never be handled, whatever the number of attempts. Such messages are
+    quarantined (see `MessageQuarantine`) and deleted from the queue instead of being redelivered
+    """
+
+    reason = "POISON_MESSAGE"
+
+
+class MessageDecodeError(PoisonMessageError):
+    reason = "DECODE_ERROR"
+
+
+class MissingFieldError(PoisonMessageError):
+    reason = "MISSING_FIELD"
+
+    def __init__(self, field: str):
+        super().__init__("Required field '{}' is missing".format(field))
+        self.field = field
+
+
+class UnknownChannelError(Exception):
+    """
+    No gateway is configured for a channel, usually for a while (gateways disabled or being
+    reconfigured). Not poison - the message is left in the queue to be redelivered
+    """
+
+    def __init__(self, channel: str):
+        super().__init__("No gateway is configured for the {} channel".format(channel))
+        self.channel = channel
+
+
+class PriorityLogicError(ValueError):
+    """
+    The priority logic of a channel isn't a valid (or allowed) expression
+    """
@@ -1,30 +1,129 @@
 import asyncio
-from typing import List
-
-from commonutils import BaseSQSWrapper
-from commonutils.handlers.sqs import SQSHandler
+import logging
+import multiprocessing
+import signal
+import time
+from typing import Dict, List
 
+from app.commons.logging.core import CoreAioLogger
+from app.commons.logging.outbox import StatusOutbox
 from app.commons.logging.sqs import SQSAioLogger
+from app.commons.logging.types import AsyncLoggerContextCreator
 from app.constants.config import Config
-from app.pubsub.sqs.sms_sqs import APIClientSQS
+from app.pubsub.sqs import APIClientSQS, SQSConsumer
+from app.pubsub.sqs.autoscaler import ConsumerAutoscaler
+from app.pubsub.sqs.lane import ConsumerLane
+from app.pubsub.sqs.quarantine import MessageQuarantine
 from app.pubsub.sqs_handler.sqs_handler import (EmailSqsHandler,
                                                 PushSqsHandler, SMSSqsHandler,
                                                 WhatsappSqsHandler)
 from app.service_clients.callback_handler import CallbackLogger
+from app.services.channel_partners.get_configurations import ChannelPartners
+from app.services.handlers.balancing import GatewayBalancer
+from app.services.handlers.deadline import NotificationDeadline
+from app.services.handlers.dedup import NotificationDeduplicator
 from app.services.handlers.email.handler import EmailHandler
+from app.services.handlers.gateway_health import GatewayHealth
+from app.services.handlers.hedging import HedgingPolicy
 from app.services.handlers.push.handler import PushHandler
+from app.services.handlers.rate_limit import RateLimiter
+from app.services.handlers.retry import RetryPolicy
 from app.services.handlers.sms.handler import SmsHandler
 from app.services.handlers.whatsapp.handler import WhatsappHandler
 
+logger = logging.getLogger()
+
 
 class Initialize:
     config = Config.get_config()
     sqs_event_mapping = {
-        "SMS": {"client": APIClientSQS, "handler": SMSSqsHandler},
-        "EMAIL": {"client": APIClientSQS, "handler": EmailSqsHandler},
-        "PUSH": {"client": APIClientSQS, "handler": PushSqsHandler},
-        "WHATSAPP": {"client": APIClientSQS, "handler": WhatsappSqsHandler},
+        "SMS": {"client": APIClientSQS, "handler": SMSSqsHandler, "notifier": SmsHandler},
+        "EMAIL": {"client": APIClientSQS, "handler": EmailSqsHandler, "notifier": EmailHandler},
+        "PUSH": {"client": APIClientSQS, "handler": PushSqsHandler, "notifier": PushHandler},
+        "WHATSAPP": {
+            "client": APIClientSQS,
+            "handler": WhatsappSqsHandler,
+            "notifier": WhatsappHandler,
+        },
     }
+    consumers: Dict[str, SQSConsumer] = {}
+    autoscalers: Dict[str, ConsumerAutoscaler] = {}
+    status_logger: AsyncLoggerContextCreator = None
+
+    @classmethod
+    def consumer_config(cls) -> dict:
+        return cls.config.get("CONSUMER", {})
+
+    @classmethod
+    def consumers_embedded(cls) -> bool:
+        """
+        Whether the SQS consumers run in the Sanic workers. When disabled, the consumers are expected to
+        run in the processes of a `--consumer-only` deployment
+        """
+        return cls.consumer_config().get("EMBEDDED", True)
+
+    @classmethod
+    def run_consumer_process(cls, index: int, metrics_queue: multiprocessing.Queue):
+        """
+        Entry point of a consumer process (see `ConsumerSupervisor`). Runs the SQS consumers of the
+        enabled channels, without the HTTP server, and reports their metrics to the supervisor
+        """
+        asyncio.run(cls._run_consumers(index, metrics_queue))
+
+    @classmethod
+    async def _run_consumers(cls, index: int, metrics_queue: multiprocessing.Queue):
+        cls.initialize_service_startup_dependencies()
+        await ChannelPartners.refresh_cp_configurations()
+        asyncio.create_task(
+            ChannelPartners.fetch_channel_partners_configurations_periodically()
+        )
+        await cls.initialize_sqs_subscribers()
+
+        # The supervisor terminates the processes with SIGTERM, drain the consumers before exiting
+        stopping = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+
+        metrics_interval = cls.consumer_config().get("METRICS_INTERVAL", 60)
+        while not stopping.is_set():
+            try:
+                await asyncio.wait_for(stopping.wait(), metrics_interval)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            metrics = {
+                channel: consumer.stats() for channel, consumer in cls.consumers.items()
+            }
+            if isinstance(cls.status_logger, StatusOutbox):
+                metrics["STATUS_OUTBOX"] = cls.status_logger.stats()
+            metrics_queue.put((index, metrics))
+        await cls.shutdown()
+
+    @classmethod
+    async def shutdown(cls):
+        """
+        Drain the consumers, waiting at most CONSUMER.SHUTDOWN_TIMEOUT seconds for the notifications
+        being sent, and flush the status updates not published yet within the rest of that time
+        """
+        timeout = cls.consumer_config().get("SHUTDOWN_TIMEOUT", 10)
+        deadline = time.monotonic() + timeout
+        logger.info("Draining SQS consumers, waiting for at most %s seconds", timeout)
+        # The autoscalers would restart the receive loops of the drained consumers
+        for autoscaler in cls.autoscalers.values():
+            autoscaler.stop()
+        cls.autoscalers = {}
+        await asyncio.gather(
+            *(consumer.stop(timeout) for consumer in cls.consumers.values()),
+            return_exceptions=True,
+        )
+        cls.consumers = {}
+        if cls.status_logger:
+            try:
+                await asyncio.wait_for(
+                    cls.status_logger.close(), max(0.0, deadline - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                logger.error("Status updates not flushed by the shutdown deadline")
+                await cls.status_logger.abandon()
 
     @classmethod
     async def initialize_sqs_subscribers(cls):
@@ -42,28 +141,107 @@ class Initialize:
             sqs = cls.config.get("SQS", {})
             auth = cls.config.get("SQS_AUTH", {})
             channel_config = sqs.get("SUBSCRIBE", {}).get(channel, {})
-            max_no_of_messages = channel_config.get("MAX_MESSAGE", 5)
-            queue_name = channel_config.get("QUEUE_NAME")
+            # `MAX_MESSAGE` is the legacy spelling of the key, still honoured for older configs
+            max_no_of_messages = channel_config.get(
+                "MAX_MESSAGES", channel_config.get("MAX_MESSAGE", 5)
+            )
             subscribers_count = channel_config.get("SUBSCRIBERS_COUNT", 1)
+            # Keep today's concurrency (every subscriber handling a full batch) as the default
+            max_in_flight = channel_config.get(
+                "MAX_IN_FLIGHT", max_no_of_messages * subscribers_count
+            )
 
             sqs_handler = callback.get("handler")()
 
-            subscribers: List[BaseSQSWrapper] = []
-            for _ in range(subscribers_count):
-                sqs_client = callback.get("client")({"SQS": auth})
-                await sqs_client.get_sqs_client(queue_name)
-                subscribers.append(sqs_client)
+            # Without lanes, the channel queue is consumed as the only lane
+            lanes_config = channel_config.get("LANES") or [
+                {"NAME": "default", "QUEUE_NAME": channel_config.get("QUEUE_NAME")}
+            ]
+            lanes = []
+            for lane_config in lanes_config:
+                lanes.append(
+                    await cls.create_lane(
+                        callback.get("client"), auth, channel_config, lane_config
+                    )
+                )
+
+            consumer = SQSConsumer(
+                channel,
+                lanes,
+                sqs_handler,
+                max_messages=max_no_of_messages,
+                max_in_flight=max_in_flight,
+                wait_time_seconds=channel_config.get("WAIT_TIME_SECONDS", 20),
+                prefetch_messages=channel_config.get("PREFETCH_MESSAGES"),
+                prefetch_bytes=channel_config.get("PREFETCH_BYTES", 5 * 1024 * 1024),
+                quarantine=await cls.create_quarantine(
+                    auth, channel_config.get("QUARANTINE", {})
+                ),
+                backpressure=callback.get("notifier").saturation,
+            )
+            consumer.start()
+            cls.consumers[channel] = consumer
 
-            cls.create_subscribers(subscribers, sqs_handler, max_no_of_messages)
+            autoscaling = channel_config.get("AUTOSCALING", {})
+            if autoscaling.get("ENABLED"):
+                # SUBSCRIBERS_COUNT and MAX_IN_FLIGHT are the upper bounds when autoscaling
+                autoscaler = ConsumerAutoscaler(
+                    consumer,
+                    min_pollers=autoscaling.get("MIN_SUBSCRIBERS", 1),
+                    max_pollers=consumer.max_pollers,
+                    min_in_flight=autoscaling.get("MIN_IN_FLIGHT", 1),
+                    max_in_flight=max_in_flight,
+                    max_messages=max_no_of_messages,
+                    interval=autoscaling.get("INTERVAL", 30),
+                    target_drain_time=autoscaling.get("TARGET_DRAIN_TIME", 30),
+                )
+                autoscaler.start()
+                cls.autoscalers[channel] = autoscaler
 
     @classmethod
-    def create_subscribers(
-        cls, subscribers: List[BaseSQSWrapper], handler: SQSHandler, max_messages: int
-    ):
-        for subscriber in subscribers:
-            asyncio.create_task(
-                subscriber.subscribe_all(handler, max_no_of_messages=max_messages)
-            )
+    async def create_lane(
+        cls, client_class, auth: dict, channel_config: dict, lane_config: dict
+    ) -> ConsumerLane:
+        """
+        Create a consumer lane, lane config keys default to the ones of the channel
+        """
+
+        def get(key, default=None):
+            return lane_config.get(key, channel_config.get(key, default))
+
+        clients: List[APIClientSQS] = []
+        for _ in range(get("SUBSCRIBERS_COUNT", 1)):
+            sqs_client = client_class({"SQS": auth})
+            await sqs_client.get_sqs_client(lane_config["QUEUE_NAME"])
+            clients.append(sqs_client)
+
+        return ConsumerLane(
+            lane_config.get("NAME", lane_config["QUEUE_NAME"]),
+            clients,
+            weight=lane_config.get("WEIGHT", 1),
+            concurrency_share=lane_config.get("CONCURRENCY_SHARE", 1),
+            critical=lane_config.get("CRITICAL", False),
+            ack_batch_size=get("ACK_BATCH_SIZE", 10),
+            ack_flush_interval=get("ACK_FLUSH_INTERVAL", 1),
+            visibility_timeout=get("VISIBILITY_TIMEOUT", 30),
+            max_processing_time=get("MAX_PROCESSING_TIME", 15 * 60),
+        )
+
+    @classmethod
+    async def create_quarantine(cls, auth: dict, quarantine_config: dict) -> MessageQuarantine:
+        """
+        Create the poison messages quarantine of a channel, None if neither a quarantine queue nor a
+        spool file is configured
+        """
+        queue_name = quarantine_config.get("QUEUE_NAME")
+        spool_path = quarantine_config.get("SPOOL_PATH")
+        if not (queue_name or spool_path):
+            return None
+        sqs_client = None
+        if queue_name:
+            sqs_client = APIClientSQS({"SQS": auth})
+            await sqs_client.get_sqs_client(queue_name)
+        return MessageQuarantine(sqs_client, spool_path)
 
     @classmethod
     def initialize_handlers(cls, logger):
@@ -76,12 +254,38 @@ class Initialize:
     def initialize_callback_logger(cls, logger):
         CallbackLogger.init(logger=logger)
 
+    @classmethod
+    def initialize_deduplication(cls):
+        NotificationDeduplicator.initialize(cls.config.get("DEDUPLICATION", {}))
+
+    @classmethod
+    def initialize_gateway_routing(cls):
+        GatewayHealth.initialize(cls.config.get("GATEWAY_HEALTH", {}))
+        HedgingPolicy.initialize(cls.config.get("HEDGING", {}))
+        GatewayBalancer.initialize(cls.config.get("GATEWAY_BALANCING", {}))
+        RateLimiter.initialize(cls.config.get("RATE_LIMITING", {}))
+        NotificationDeadline.initialize(cls.config.get("DEADLINES", {}))
+        RetryPolicy.initialize(cls.config.get("RETRIES", {}))
+
     @classmethod
     def initialize_service_startup_dependencies(cls):
         sqs = cls.config.get("SQS", {})
         auth = cls.config.get("SQS_AUTH", {})
-        logging = sqs.get("PUBLISH", {}).get("LOGGING", {})
-        logger = SQSAioLogger({"SQS": auth, **logging})
+        logging_config = sqs.get("PUBLISH", {}).get("LOGGING", {})
+        # Status updates go through the status updates queue, or straight to notifyone-core
+        sink = CoreAioLogger if cls.config.get("STATUS_SINK") == "CORE" else SQSAioLogger
+        cls.status_logger = sink({"SQS": auth, **logging_config})
+        outbox = logging_config.get("OUTBOX", {})
+        if outbox.get("ENABLED"):
+            cls.status_logger = StatusOutbox(
+                cls.status_logger,
+                max_size=outbox.get("MAX_SIZE", 10000),
+                overflow=outbox.get("OVERFLOW", StatusOutbox.BLOCK),
+                publishers=outbox.get("PUBLISHERS", 4),
+                drain_timeout=outbox.get("DRAIN_TIMEOUT", 10),
+            )
 
-        cls.initialize_handlers(logger)
-        cls.initialize_callback_logger(logger)
+        cls.initialize_deduplication()
+        cls.initialize_gateway_routing()
+        cls.initialize_handlers(cls.status_logger)
+        cls.initialize_callback_logger(cls.status_logger)
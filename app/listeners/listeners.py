@@ -8,7 +8,14 @@ from app.services.channel_partners.get_configurations import ChannelPartners
 
 
 async def initialize_sqs_subscribers(app, loop):
-    await Initialize.initialize_sqs_subscribers()
+    # The consumers run in dedicated processes instead, if not embedded (see app.service)
+    if Initialize.consumers_embedded():
+        await Initialize.initialize_sqs_subscribers()
+
+
+async def shutdown_sqs_subscribers(app, loop):
+    # Stop receiving and let the notifications being sent finish before the worker exits
+    await Initialize.shutdown()
 
 
 async def channel_partners_configurations(app, loop):
@@ -23,5 +30,6 @@ async def setup_channel_partners_configurations_periodic_refresh(app, loop):
 listeners = [
     (initialize_sqs_subscribers, ListenerEventTypes.AFTER_SERVER_START.value),
     (channel_partners_configurations, ListenerEventTypes.AFTER_SERVER_START.value),
-    (setup_channel_partners_configurations_periodic_refresh, ListenerEventTypes.AFTER_SERVER_START.value)
+    (setup_channel_partners_configurations_periodic_refresh, ListenerEventTypes.AFTER_SERVER_START.value),
+    (shutdown_sqs_subscribers, ListenerEventTypes.BEFORE_SERVER_STOP.value)
 ]
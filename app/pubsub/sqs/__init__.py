@@ -1 +1,2 @@
 from .sms_sqs import APIClientSQS
+from .consumer import SQSConsumer
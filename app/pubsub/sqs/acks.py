@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import List
+
+from app.pubsub.sqs.sms_sqs import APIClientSQS
+
+logger = logging.getLogger()
+
+
+class AckAggregator:
+    """
+    Collects receipt handles of handled messages of a queue and deletes them with
+    DeleteMessageBatch, once `batch_size` handles are pending or every `flush_interval` seconds,
+    whichever comes first. Entries failed in a batch are retried individually.
+    """
+
+    # SQS allows deleting at most 10 messages in a single call
+    MAX_BATCH_SIZE = 10
+
+    def __init__(
+        self, client: APIClientSQS, batch_size: int = 10, flush_interval: float = 1
+    ):
+        self.client = client
+        self.batch_size = max(1, min(batch_size, self.MAX_BATCH_SIZE))
+        self.flush_interval = flush_interval
+        self._pending: List[str] = []
+        self._flusher: asyncio.Task = None
+
+    def start(self):
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._flusher:
+            self._flusher.cancel()
+        await self.flush()
+
+    async def ack(self, receipt_handle: str):
+        self._pending.append(receipt_handle)
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        while self._pending:
+            batch = self._pending[: self.batch_size]
+            self._pending = self._pending[self.batch_size :]
+            await self._delete_batch(batch)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as err:
+                logger.error("Couldn't flush message acks: %s", err)
+
+    async def _delete_batch(self, receipt_handles: List[str]):
+        entries = [
+            {"Id": str(index), "ReceiptHandle": receipt_handle}
+            for index, receipt_handle in enumerate(receipt_handles)
+        ]
+        try:
+            response = await self.client.ack_messages(entries)
+            failed = [
+                receipt_handles[int(entry["Id"])]
+                for entry in response.get("Failed", [])
+            ]
+        except Exception as err:
+            logger.error("Couldn't delete messages in batch: %s", err)
+            failed = receipt_handles
+
+        for receipt_handle in failed:
+            try:
+                await self.client.ack_message(receipt_handle)
+            except Exception as err:
+                # The message is redelivered after the visibility timeout
+                logger.error("Couldn't delete message: %s", err)
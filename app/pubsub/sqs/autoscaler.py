@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Tuple
+
+from app.pubsub.sqs.consumer import SQSConsumer
+
+logger = logging.getLogger()
+
+
+class ConsumerAutoscaler:
+    """
+    Periodically scales a consumer to the load of its queue.
+
+    Every `interval` seconds the queue depth (ApproximateNumberOfMessages, summed over the lanes)
+    is sampled, and the rate at which the consumer received messages since the last sample is
+    measured. Along with the average handler and receive latencies measured by the consumer, these
+    size -
+        1) workers - enough sends in flight to keep up with the arrival rate (Little's law), plus
+           enough to drain the backlog in `target_drain_time` seconds
+        2) receive batch size - the messages expected per receive, at most `max_messages`
+        3) receive loops (per lane) - enough receives to keep the workers busy
+    each within the configured bounds. A consumer keeping up with its queue sees an empty queue,
+    but still a steady arrival rate, and so keeps its workers.
+    """
+
+    # Latency assumed until the consumer has measured one
+    DEFAULT_LATENCY = 1
+
+    def __init__(
+        self,
+        consumer: SQSConsumer,
+        min_pollers: int = 1,
+        max_pollers: int = None,
+        min_in_flight: int = 1,
+        max_in_flight: int = None,
+        max_messages: int = None,
+        interval: int = 30,
+        target_drain_time: int = 30,
+    ):
+        self.consumer = consumer
+        self.min_pollers = max(1, min_pollers)
+        self.max_pollers = max_pollers or consumer.max_pollers
+        self.min_in_flight = max(1, min_in_flight)
+        self.max_in_flight = max_in_flight or consumer.max_in_flight
+        self.max_messages = max_messages or consumer.max_messages
+        self.interval = interval
+        self.target_drain_time = target_drain_time
+        self._scaler: asyncio.Task = None
+        # Messages received by the consumer as of the last sample, and when it was taken
+        self._received = 0
+        self._sampled_at: float = None
+
+    def start(self):
+        self._sample_arrival_rate()
+        self._scaler = asyncio.create_task(self._scale_periodically())
+
+    def stop(self):
+        if self._scaler:
+            self._scaler.cancel()
+
+    @staticmethod
+    def _clamp(value: int, lower: int, upper: int) -> int:
+        return max(lower, min(value, upper))
+
+    def desired_scale(
+        self,
+        queue_depth: int,
+        arrival_rate: float,
+        handler_latency: float,
+        receive_latency: float,
+    ) -> Tuple[int, int, int]:
+        """
+        Returns (receive loops, receive batch size, workers) for the given queue depth, arrival
+        rate (messages/second) and latencies
+        """
+        handler_latency = handler_latency or self.DEFAULT_LATENCY
+        receive_latency = receive_latency or self.DEFAULT_LATENCY
+
+        in_flight = self._clamp(
+            math.ceil(
+                arrival_rate * handler_latency
+                + queue_depth * handler_latency / self.target_drain_time
+            ),
+            self.min_in_flight,
+            self.max_in_flight,
+        )
+        batch_size = self._clamp(
+            math.ceil(queue_depth + arrival_rate * receive_latency), 1, self.max_messages
+        )
+        # Messages/second the workers can handle vs. a single receive loop can fetch
+        handle_rate = in_flight / handler_latency
+        receive_rate = batch_size / receive_latency
+        pollers = self._clamp(
+            math.ceil(handle_rate / receive_rate), self.min_pollers, self.max_pollers
+        )
+        return pollers, batch_size, in_flight
+
+    def _sample_arrival_rate(self) -> float:
+        """
+        Messages/second received by the consumer since the last sample
+        """
+        now = time.monotonic()
+        received = self.consumer.received
+        rate = 0.0
+        if self._sampled_at is not None and now > self._sampled_at:
+            rate = (received - self._received) / (now - self._sampled_at)
+        self._received, self._sampled_at = received, now
+        return rate
+
+    async def _scale_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.scale()
+            except Exception as err:
+                logger.error("Couldn't scale %s consumer: %s", self.consumer.channel, err)
+
+    async def scale(self):
+        queue_depth = await self.consumer.queue_depth()
+        arrival_rate = self._sample_arrival_rate()
+        pollers, batch_size, in_flight = self.desired_scale(
+            queue_depth,
+            arrival_rate,
+            self.consumer.handler_latency,
+            self.consumer.receive_latency,
+        )
+        if (pollers, batch_size, in_flight) != (
+            self.consumer.pollers,
+            self.consumer.max_messages,
+            self.consumer.max_in_flight,
+        ):
+            logger.info(
+                "Scaling %s consumer to %s receive loops, %s messages per receive and %s workers "
+                "for queue depth %s and %.1f messages/second",
+                self.consumer.channel,
+                pollers,
+                batch_size,
+                in_flight,
+                queue_depth,
+                arrival_rate,
+            )
+        self.consumer.scale(
+            pollers=pollers, max_messages=batch_size, max_in_flight=in_flight
+        )
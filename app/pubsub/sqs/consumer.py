@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from commonutils.handlers.sqs import SQSHandler
+
+from app.exceptions import PoisonMessageError
+from app.pubsub.sqs.lane import ConsumerLane
+from app.pubsub.sqs.model import Message
+from app.pubsub.sqs.prefetch import PrefetchBuffer
+from app.pubsub.sqs.quarantine import MessageQuarantine
+
+logger = logging.getLogger()
+
+
+class SQSConsumer:
+    """
+    Consumer engine for a channel.
+
+    Receiving and handling are decoupled here - the receive loops (one per SQS client) of every
+    lane long-poll the lane queue into a bounded prefetch buffer, and a pool of async workers
+    shared by all the lanes drains these buffers and runs the channel SQS handler. The number of
+    sends in flight is bounded by `max_in_flight` and not by the number of SQS clients, and the
+    next receive overlaps the handling of the previous batch.
+
+    Workers are scheduled across lanes with weighted fair queuing, within the concurrency share of
+    each lane (see `ConsumerLane`). Poison messages are handed to the `quarantine`, if any, and
+    deleted right away.
+
+    Receiving pauses while the `backpressure` callable (the saturation of the channel gateways)
+    reports that sends would have to wait, so that no more messages are received than can be
+    sent.
+
+    The number of active receive loops per lane (up to the number of its clients), the receive
+    batch size and the number of workers can be changed at runtime using `scale`.
+    """
+
+    ERROR_BACKOFF_SECONDS = 1
+    # Receiving is checked again at least this often while paused by the backpressure
+    MAX_BACKPRESSURE_SECONDS = 1
+    # Smoothing factor of the exponentially weighted moving averages of the latencies
+    LATENCY_EWMA_ALPHA = 0.2
+
+    def __init__(
+        self,
+        channel: str,
+        lanes: List[ConsumerLane],
+        handler: SQSHandler,
+        max_messages: int = 10,
+        max_in_flight: int = 10,
+        wait_time_seconds: int = 20,
+        prefetch_messages: int = None,
+        prefetch_bytes: int = 5 * 1024 * 1024,
+        quarantine: MessageQuarantine = None,
+        backpressure: Optional[Callable[[], float]] = None,
+    ):
+        self.channel = channel
+        self.lanes = lanes
+        self.handler = handler
+        # SQS allows receiving at most 10 messages in a single call
+        self.max_messages = max(1, min(max_messages, 10))
+        self.max_in_flight = max(1, max_in_flight)
+        self.pollers = self.max_pollers
+        self.wait_time_seconds = wait_time_seconds
+        self.prefetch_messages = prefetch_messages
+        self.prefetch_bytes = prefetch_bytes
+        self.quarantine = quarantine
+        self.backpressure = backpressure
+        # Receives paused by the backpressure
+        self.throttled = 0
+        # Messages received since the start
+        self.received = 0
+        # Average time (in seconds) taken to handle a message and by a non-empty receive
+        self.handler_latency: float = None
+        self.receive_latency: float = None
+
+        self._changed: asyncio.Condition = None
+        self._stopping = False
+        self._virtual_time = 0.0
+        self._pollers: Dict[Tuple[str, int], asyncio.Task] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    @property
+    def max_pollers(self) -> int:
+        return max(len(lane.clients) for lane in self.lanes)
+
+    def start(self):
+        # A single condition for all the lane buffers lets a worker wait on any of them
+        self._changed = asyncio.Condition()
+        for lane in self.lanes:
+            # By default every receive loop can keep one batch ready while the workers are busy
+            prefetch_messages = self.prefetch_messages or self.max_messages * len(
+                lane.clients
+            )
+            lane.start(
+                PrefetchBuffer(prefetch_messages, self.prefetch_bytes, self._changed)
+            )
+        self.scale()
+        logger.info(
+            "Started %s consumer with lanes %s, %s receive loops per lane and %s workers",
+            self.channel,
+            [lane.name for lane in self.lanes],
+            self.pollers,
+            self.max_in_flight,
+        )
+
+    def scale(
+        self, pollers: int = None, max_messages: int = None, max_in_flight: int = None
+    ):
+        """
+        Change the number of active receive loops per lane, the receive batch size and the number
+        of workers. Receive loops and workers above the new limits exit once done with their
+        current receive or message, missing ones are started right away. Nothing is started once
+        the consumer is stopping.
+        """
+        if self._stopping:
+            return
+        if pollers is not None:
+            self.pollers = max(1, min(pollers, self.max_pollers))
+        if max_messages is not None:
+            self.max_messages = max(1, min(max_messages, 10))
+        if max_in_flight is not None:
+            self.max_in_flight = max(1, max_in_flight)
+
+        for lane in self.lanes:
+            lane.resize(self.max_in_flight)
+            for index in range(min(self.pollers, len(lane.clients))):
+                key = (lane.name, index)
+                if key not in self._pollers or self._pollers[key].done():
+                    self._pollers[key] = asyncio.create_task(self._poll(lane, index))
+        for index in range(self.max_in_flight):
+            if index not in self._workers or self._workers[index].done():
+                self._workers[index] = asyncio.create_task(self._work(index))
+
+    async def stop(self, timeout: float):
+        """
+        Drain the consumer - stop receiving, wait (for at most `timeout` seconds) for the messages
+        being handled, return the buffered ones to the queue and flush the pending acks.
+        """
+        self._stopping = True
+        for task in self._pollers.values():
+            task.cancel()
+
+        in_flight = lambda: sum(lane.in_flight for lane in self.lanes)  # noqa: E731
+        try:
+            async with self._changed:
+                # Idle workers stop waiting for messages only once `_stopping` is seen
+                self._changed.notify_all()
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: in_flight() == 0), timeout
+                )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "%s %s messages still being handled at the shutdown deadline",
+                in_flight(),
+                self.channel,
+            )
+        for task in self._workers.values():
+            task.cancel()
+
+        for lane in self.lanes:
+            await lane.stop()
+        logger.info("Stopped %s consumer", self.channel)
+
+    async def queue_depth(self) -> int:
+        depth = 0
+        for lane in self.lanes:
+            depth += await lane.clients[0].queue_depth()
+        return depth
+
+    def stats(self) -> Dict:
+        return {
+            "channel": self.channel,
+            "pollers": self.pollers,
+            "max_messages": self.max_messages,
+            "max_in_flight": self.max_in_flight,
+            "lanes": {
+                lane.name: {
+                    "in_flight": lane.in_flight,
+                    "buffered": len(lane.buffer) if lane.buffer else 0,
+                }
+                for lane in self.lanes
+            },
+            "handler_latency": self.handler_latency,
+            "receive_latency": self.receive_latency,
+            "quarantined": self.quarantine.quarantined if self.quarantine else 0,
+            "throttled": self.throttled,
+            "received": self.received,
+        }
+
+    def _record_latency(self, average: float, started_at: float) -> float:
+        latency = time.monotonic() - started_at
+        if average is None:
+            return latency
+        return average + self.LATENCY_EWMA_ALPHA * (latency - average)
+
+    async def _poll(self, lane: ConsumerLane, index: int):
+        client = lane.clients[index]
+        while index < self.pollers and not self._stopping:
+            delay = self.backpressure() if self.backpressure else 0
+            if delay > 0:
+                self.throttled += 1
+                await asyncio.sleep(min(delay, self.MAX_BACKPRESSURE_SECONDS))
+                continue
+            batch_size = await lane.buffer.reserve(self.max_messages)
+            started_at = time.monotonic()
+            try:
+                response = await client.fetch_messages(
+                    max_no_of_messages=batch_size,
+                    wait_time_seconds=self.wait_time_seconds,
+                    visibility_timeout=lane.heartbeat.visibility_timeout,
+                )
+            except Exception as err:
+                logger.error(
+                    "Couldn't receive %s %s messages: %s", self.channel, lane.name, err
+                )
+                await lane.buffer.fill(batch_size, [])
+                await asyncio.sleep(self.ERROR_BACKOFF_SECONDS)
+                continue
+
+            self.received += len(response.messages)
+            if response.messages:
+                self.receive_latency = self._record_latency(
+                    self.receive_latency, started_at
+                )
+            for message in response.messages:
+                lane.heartbeat.track(message.receipt_handle)
+            await lane.buffer.fill(
+                batch_size, [(message, message.size) for message in response.messages]
+            )
+
+    def _select_lane(self) -> Optional[ConsumerLane]:
+        """
+        Weighted fair queuing across the lanes having buffered messages - the lane whose next
+        message would start first in virtual time is served (start-time fair queuing, the virtual
+        time being the start tag of the last dispatched message). Critical lanes can borrow the
+        workers left idle once the other lanes are either empty or at their concurrency share.
+        """
+        if self._stopping:
+            return None
+        ready = [lane for lane in self.lanes if len(lane.buffer)]
+        eligible = [lane for lane in ready if lane.in_flight < lane.max_in_flight]
+        if not eligible:
+            eligible = [lane for lane in ready if lane.critical]
+        if not eligible:
+            return None
+        return min(eligible, key=lambda lane: lane.next_start_tag(self._virtual_time))
+
+    async def _next_message(self) -> Tuple[ConsumerLane, Message]:
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._select_lane() is not None)
+            lane = self._select_lane()
+            self._virtual_time = lane.next_start_tag(self._virtual_time)
+            lane.finish_tag = self._virtual_time + 1 / lane.weight
+            lane.in_flight += 1
+            return lane, lane.buffer.pop()
+
+    async def _work(self, index: int):
+        while index < self.max_in_flight:
+            lane, message = await self._next_message()
+            try:
+                await self._handle(lane, message)
+            finally:
+                async with self._changed:
+                    lane.in_flight -= 1
+                    self._changed.notify_all()
+
+    async def _handle(self, lane: ConsumerLane, message: Message):
+        started_at = time.monotonic()
+        try:
+            await self.handler.handle_event(message.body)
+            self.handler_latency = self._record_latency(
+                self.handler_latency, started_at
+            )
+        except PoisonMessageError as err:
+            logger.error(
+                "Poison %s %s message %s: %s",
+                self.channel,
+                lane.name,
+                message.message_id,
+                err,
+            )
+            if not (
+                self.quarantine
+                and await self.quarantine.put(self.channel, lane.name, message, err)
+            ):
+                # Nowhere to move it, left for the queue's redrive policy
+                return
+        except Exception as err:
+            # Leave the message in the queue, it is redelivered after the visibility timeout
+            logger.exception(
+                "Couldn't handle %s %s message: %s", self.channel, lane.name, err
+            )
+            return
+        finally:
+            lane.heartbeat.untrack(message.receipt_handle)
+        await lane.acks.ack(message.receipt_handle)
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Tuple
+
+from app.pubsub.sqs.sms_sqs import APIClientSQS
+
+logger = logging.getLogger()
+
+
+class VisibilityHeartbeat:
+    """
+    Keeps received messages of a queue invisible while they are being handled.
+
+    Messages whose visibility timeout is about to expire are extended by another
+    `visibility_timeout` seconds with ChangeMessageVisibilityBatch, so that a slow send is not
+    redelivered to (and sent again by) another subscriber. A message is not kept invisible for
+    more than `max_processing_time` seconds since it was received, after which SQS is free to
+    redeliver it.
+    """
+
+    # SQS allows changing visibility of at most 10 messages in a single call
+    MAX_BATCH_SIZE = 10
+
+    def __init__(
+        self,
+        client: APIClientSQS,
+        visibility_timeout: int = 30,
+        max_processing_time: int = 15 * 60,
+    ):
+        self.client = client
+        self.visibility_timeout = visibility_timeout
+        self.max_processing_time = max_processing_time
+        # Extend messages having less than a third of their visibility timeout left
+        self.margin = visibility_timeout / 3
+        # receipt handle -> (received at, visible again at)
+        self._in_flight: Dict[str, Tuple[float, float]] = {}
+        self._beater: asyncio.Task = None
+
+    def start(self):
+        self._beater = asyncio.create_task(self._beat_periodically())
+
+    def stop(self):
+        if self._beater:
+            self._beater.cancel()
+
+    def track(self, receipt_handle: str):
+        now = time.monotonic()
+        self._in_flight[receipt_handle] = (now, now + self.visibility_timeout)
+
+    def untrack(self, receipt_handle: str):
+        self._in_flight.pop(receipt_handle, None)
+
+    async def _beat_periodically(self):
+        while True:
+            await asyncio.sleep(self.margin / 2)
+            try:
+                await self.beat()
+            except Exception as err:
+                logger.error("Couldn't extend messages visibility: %s", err)
+
+    async def beat(self):
+        now = time.monotonic()
+        expiring = []
+        for receipt_handle, (received_at, visible_at) in list(self._in_flight.items()):
+            if visible_at - now > self.margin:
+                continue
+            if now - received_at >= self.max_processing_time:
+                logger.warning(
+                    "Message in flight for more than %s seconds, not extending its visibility",
+                    self.max_processing_time,
+                )
+                self.untrack(receipt_handle)
+                continue
+            expiring.append(receipt_handle)
+
+        for index in range(0, len(expiring), self.MAX_BATCH_SIZE):
+            await self._extend(expiring[index : index + self.MAX_BATCH_SIZE], now)
+
+    async def release(self, receipt_handles: List[str]):
+        """
+        Make the given messages visible again right away, for another subscriber to receive them
+        """
+        for receipt_handle in receipt_handles:
+            self.untrack(receipt_handle)
+        for index in range(0, len(receipt_handles), self.MAX_BATCH_SIZE):
+            entries = [
+                {"Id": str(position), "ReceiptHandle": receipt_handle, "VisibilityTimeout": 0}
+                for position, receipt_handle in enumerate(
+                    receipt_handles[index : index + self.MAX_BATCH_SIZE]
+                )
+            ]
+            try:
+                await self.client.change_visibility(entries)
+            except Exception as err:
+                # These are redelivered after their visibility timeout anyway
+                logger.error("Couldn't release messages: %s", err)
+
+    async def _extend(self, receipt_handles: List[str], now: float):
+        entries = []
+        for receipt_handle in receipt_handles:
+            tracked = self._in_flight.get(receipt_handle)
+            if tracked is None:
+                # Handled while the previous batches were being extended
+                continue
+            received_at, _ = tracked
+            # Never extend beyond the hard ceiling of the message
+            timeout = min(
+                self.visibility_timeout,
+                received_at + self.max_processing_time - now,
+            )
+            entries.append(
+                {
+                    "Id": str(len(entries)),
+                    "ReceiptHandle": receipt_handle,
+                    "VisibilityTimeout": max(1, int(timeout)),
+                }
+            )
+        if not entries:
+            return
+        try:
+            response = await self.client.change_visibility(entries)
+        except Exception as err:
+            logger.error("Couldn't extend messages visibility: %s", err)
+            return
+
+        failed = {entry["Id"] for entry in response.get("Failed", [])}
+        for entry in entries:
+            receipt_handle = entry["ReceiptHandle"]
+            tracked = self._in_flight.get(receipt_handle)
+            if entry["Id"] in failed or tracked is None:
+                # Most likely the message got deleted in the meantime
+                continue
+            received_at, _ = tracked
+            self._in_flight[receipt_handle] = (
+                received_at,
+                now + entry["VisibilityTimeout"],
+            )
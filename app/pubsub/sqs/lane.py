@@ -0,0 +1,68 @@
+from typing import List
+
+from app.pubsub.sqs.acks import AckAggregator
+from app.pubsub.sqs.heartbeat import VisibilityHeartbeat
+from app.pubsub.sqs.prefetch import PrefetchBuffer
+from app.pubsub.sqs.sms_sqs import APIClientSQS
+
+
+class ConsumerLane:
+    """
+    A queue consumed by a channel consumer, along with its scheduling parameters.
+
+    Lanes of a consumer share its workers - a lane gets workers in proportion to its `weight` and
+    is not handed more than `concurrency_share` of the workers at a time. A `critical` lane can
+    go beyond its share when the workers are left idle by the other lanes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        clients: List[APIClientSQS],
+        weight: float = 1,
+        concurrency_share: float = 1,
+        critical: bool = False,
+        ack_batch_size: int = 10,
+        ack_flush_interval: float = 1,
+        visibility_timeout: int = 30,
+        max_processing_time: int = 15 * 60,
+    ):
+        self.name = name
+        self.clients = clients
+        self.weight = weight
+        self.concurrency_share = concurrency_share
+        self.critical = critical
+        # All the clients of a lane subscribe to the same queue, so do the receipt handles
+        self.acks = AckAggregator(
+            clients[0], batch_size=ack_batch_size, flush_interval=ack_flush_interval
+        )
+        self.heartbeat = VisibilityHeartbeat(
+            clients[0],
+            visibility_timeout=visibility_timeout,
+            max_processing_time=max_processing_time,
+        )
+        self.buffer: PrefetchBuffer = None
+        self.max_in_flight = 1
+        self.in_flight = 0
+        # Weighted fair queuing tag - virtual time at which the last dispatched message finishes
+        self.finish_tag = 0.0
+
+    def start(self, buffer: PrefetchBuffer):
+        self.buffer = buffer
+        self.acks.start()
+        self.heartbeat.start()
+
+    async def stop(self):
+        """
+        Return the buffered (not yet handled) messages to the queue and flush the pending acks
+        """
+        unstarted = self.buffer.drain() if self.buffer else []
+        await self.heartbeat.release([message.receipt_handle for message in unstarted])
+        self.heartbeat.stop()
+        await self.acks.stop()
+
+    def resize(self, consumer_in_flight: int):
+        self.max_in_flight = max(1, round(consumer_in_flight * self.concurrency_share))
+
+    def next_start_tag(self, virtual_time: float) -> float:
+        return max(self.finish_tag, virtual_time)
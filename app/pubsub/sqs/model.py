@@ -12,6 +12,9 @@ class Message:
             self.body = None
             self.attributes = []
             self.receipt_handle = None
+            self.message_id = None
+            self.receive_count = 0
+            self.size = 0
         else:
             self.body = message["Body"]
             message_attributes = message.get("MessageAttributes", {})
@@ -20,6 +23,11 @@ class Message:
                 for attribute_name in message_attributes
             ]
             self.receipt_handle = message["ReceiptHandle"]
+            self.message_id = message.get("MessageId")
+            self.receive_count = int(
+                message.get("Attributes", {}).get("ApproximateReceiveCount", 1)
+            )
+            self.size = len(self.body.encode("utf-8"))
 
 
 class Attribute:
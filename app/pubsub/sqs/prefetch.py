@@ -0,0 +1,83 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, List, Tuple
+
+
+class PrefetchBuffer:
+    """
+    Bounded local buffer of received but not yet handled messages.
+
+    Receive loops reserve room in the buffer before they poll SQS and fill it with whatever was
+    received, handler workers drain it. Polling is paused while the buffer is full (by number of
+    messages or by bytes), so messages are not sitting locally while their visibility timeout runs.
+    The byte bound is checked before a receive and hence can be overshot by at most one batch.
+
+    Buffers can share the `changed` condition, which lets a consumer wait on several of them at once.
+    """
+
+    def __init__(
+        self, max_messages: int, max_bytes: int, changed: asyncio.Condition = None
+    ):
+        self.max_messages = max(1, max_messages)
+        self.max_bytes = max_bytes
+        self._items: Deque[Tuple[Any, int]] = deque()
+        self._reserved = 0
+        self._bytes = 0
+        self._changed = changed or asyncio.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def size_in_bytes(self) -> int:
+        return self._bytes
+
+    def _free_slots(self) -> int:
+        if self._bytes >= self.max_bytes:
+            return 0
+        return self.max_messages - len(self._items) - self._reserved
+
+    async def reserve(self, count: int) -> int:
+        """
+        Wait until the buffer has room and reserve it for up to `count` messages.
+        Returns the number of reserved slots, these must be handed back using `fill`
+        """
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._free_slots() > 0)
+            reserved = min(count, self._free_slots())
+            self._reserved += reserved
+            return reserved
+
+    async def fill(self, reserved: int, items: List[Tuple[Any, int]]):
+        """
+        Release `reserved` slots and add the received (item, size in bytes) pairs to the buffer
+        """
+        async with self._changed:
+            self._reserved -= reserved
+            for item, size in items:
+                self._items.append((item, size))
+                self._bytes += size
+            self._changed.notify_all()
+
+    async def get(self) -> Any:
+        async with self._changed:
+            await self._changed.wait_for(lambda: len(self._items) > 0)
+            return self.pop()
+
+    def drain(self) -> List[Any]:
+        """
+        Take all the items out of the buffer
+        """
+        items = [item for item, _ in self._items]
+        self._items.clear()
+        self._bytes = 0
+        return items
+
+    def pop(self) -> Any:
+        """
+        Take the oldest item out of a non-empty buffer, must be called holding the `changed` condition
+        """
+        item, size = self._items.popleft()
+        self._bytes -= size
+        self._changed.notify_all()
+        return item
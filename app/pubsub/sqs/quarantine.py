@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import Optional
+
+from app.commons import time
+from app.pubsub.sqs.model import Message
+from app.pubsub.sqs.sms_sqs import APIClientSQS
+from app.utils import json_dumps
+
+logger = logging.getLogger()
+
+
+class MessageQuarantine:
+    """
+    Destination of the poison messages of a channel - messages that can never be handled (see
+    `PoisonMessageError`) are moved here and deleted from their queue, instead of being
+    redelivered until the queue's maxReceiveCount is hit.
+
+    The raw message, along with the reason it was quarantined, is published to the quarantine
+    queue if one is configured, and appended (as a JSON line) to the spool file otherwise or if
+    publishing fails. A message that couldn't be quarantined anywhere is left in its queue.
+    """
+
+    def __init__(
+        self, client: Optional[APIClientSQS] = None, spool_path: Optional[str] = None
+    ):
+        self.client = client
+        self.spool_path = spool_path
+        self.quarantined = 0
+
+    async def put(self, channel: str, lane: str, message: Message, err: Exception) -> bool:
+        """
+        Quarantine a message, returns whether it was stored anywhere (and can be deleted)
+        """
+        record = json_dumps(
+            {
+                "quarantined_at": time.now(as_str=True),
+                "channel": channel,
+                "lane": lane,
+                "reason": getattr(err, "reason", type(err).__name__),
+                "error": str(err),
+                "message_id": message.message_id,
+                "receive_count": message.receive_count,
+                "body": message.body,
+            }
+        )
+        stored = await self._publish(record) or await self._spool(record)
+        if stored:
+            self.quarantined += 1
+        return stored
+
+    async def _publish(self, record: str) -> bool:
+        if not self.client:
+            return False
+        try:
+            await self.client.publish_to_sqs(payload=record, batch=False)
+            return True
+        except Exception as err:
+            logger.error("Couldn't publish message to the quarantine queue: %s", err)
+            return False
+
+    async def _spool(self, record: str) -> bool:
+        if not self.spool_path:
+            return False
+        try:
+            # Off the event loop, the spool may be on a slow disk
+            await asyncio.get_running_loop().run_in_executor(None, self._append, record)
+            return True
+        except OSError as err:
+            logger.error("Couldn't write message to the quarantine spool: %s", err)
+            return False
+
+    def _append(self, record: str):
+        with open(self.spool_path, "a") as spool:
+            spool.write(record + "\n")
@@ -1,5 +1,9 @@
+from typing import Dict, List, Optional
+
 from commonutils import BaseSQSWrapper
 
+from app.pubsub.sqs.model import Response
+
 
 class APIClientSQS(BaseSQSWrapper):
     sqs_handler = None
@@ -7,3 +11,70 @@ class APIClientSQS(BaseSQSWrapper):
     def __init__(self, config: dict = {}) -> None:
         self.config = config or {"SQS": {}}
         super().__init__(self.config)
+
+    async def fetch_messages(
+        self,
+        max_no_of_messages: int = 10,
+        wait_time_seconds: int = 20,
+        visibility_timeout: Optional[int] = None,
+    ) -> Response:
+        """
+        Long poll the subscribed queue for at most `max_no_of_messages` messages.
+        Unlike `subscribe_all`, this only receives - handling and deleting the messages is left
+        to the caller. The queue's own visibility timeout is used if `visibility_timeout` is not given.
+        """
+        params = {
+            "QueueUrl": self.queue_url,
+            "MaxNumberOfMessages": max_no_of_messages,
+            "WaitTimeSeconds": wait_time_seconds,
+            "AttributeNames": ["ApproximateReceiveCount"],
+            "MessageAttributeNames": ["All"],
+        }
+        if visibility_timeout is not None:
+            params["VisibilityTimeout"] = visibility_timeout
+        response = await self.sqs_client.receive_message(**params)
+        return Response(response)
+
+    async def ack_message(self, receipt_handle: str):
+        """
+        Delete a handled message from the subscribed queue
+        """
+        return await self.sqs_client.delete_message(
+            QueueUrl=self.queue_url, ReceiptHandle=receipt_handle
+        )
+
+    async def ack_messages(self, entries: List[Dict[str, str]]) -> Dict:
+        """
+        Delete up to 10 handled messages from the subscribed queue in a single call.
+        `entries` is a list of {"Id": ..., "ReceiptHandle": ...} dicts
+        """
+        return await self.sqs_client.delete_message_batch(
+            QueueUrl=self.queue_url, Entries=entries
+        )
+
+    async def change_visibility(self, entries: List[Dict]) -> Dict:
+        """
+        Change the visibility timeout of up to 10 received messages in a single call.
+        `entries` is a list of {"Id": ..., "ReceiptHandle": ..., "VisibilityTimeout": ...} dicts
+        """
+        return await self.sqs_client.change_message_visibility_batch(
+            QueueUrl=self.queue_url, Entries=entries
+        )
+
+    async def publish_messages(self, entries: List[Dict[str, str]]) -> Dict:
+        """
+        Send up to 10 messages (256KB in total) to the queue in a single call.
+        `entries` is a list of {"Id": ..., "MessageBody": ...} dicts
+        """
+        return await self.sqs_client.send_message_batch(
+            QueueUrl=self.queue_url, Entries=entries
+        )
+
+    async def queue_depth(self) -> int:
+        """
+        Approximate number of messages available for retrieval from the subscribed queue
+        """
+        response = await self.sqs_client.get_queue_attributes(
+            QueueUrl=self.queue_url, AttributeNames=["ApproximateNumberOfMessages"]
+        )
+        return int(response["Attributes"]["ApproximateNumberOfMessages"])
@@ -0,0 +1,122 @@
+import logging
+import multiprocessing
+import queue
+import signal
+import time
+from typing import Callable, Dict
+
+logger = logging.getLogger()
+
+
+class ConsumerSupervisor:
+    """
+    Runs `processes` shared-nothing consumer processes and keeps them running.
+
+    Every process runs `target(index, metrics_queue)`, where `metrics_queue` is a multiprocessing
+    queue the process periodically puts its metrics (a dict) on. The supervisor restarts the
+    processes that exit (with an exponential backoff for the ones crashing repeatedly), keeps the
+    latest metrics of every process and logs them every `metrics_interval` seconds.
+    """
+
+    RESTART_BACKOFF_SECONDS = 1
+    MAX_RESTART_BACKOFF_SECONDS = 60
+    # A process running for longer than this is considered healthy, its backoff is reset
+    HEALTHY_UPTIME_SECONDS = 60
+    STOP_TIMEOUT_SECONDS = 60
+
+    def __init__(
+        self,
+        target: Callable[[int, multiprocessing.Queue], None],
+        processes: int,
+        metrics_interval: int = 60,
+    ):
+        self.target = target
+        self.processes = max(1, processes)
+        self.metrics_interval = metrics_interval
+        self.metrics: Dict[int, Dict] = {}
+        self.restarts: Dict[int, int] = {}
+
+        self._metrics_queue = multiprocessing.Queue()
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._started_at: Dict[int, float] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._backoff: Dict[int, float] = {}
+        self._stopping = False
+
+    @staticmethod
+    def _run_target(target: Callable, index: int, metrics_queue: multiprocessing.Queue):
+        # Forked processes inherit the supervisor signal handlers, restore the defaults
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        target(index, metrics_queue)
+
+    def _spawn(self, index: int):
+        process = multiprocessing.Process(
+            target=self._run_target,
+            args=(self.target, index, self._metrics_queue),
+            name="consumer-{}".format(index),
+        )
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+        self._restart_at.pop(index, None)
+        logger.info("Started consumer process %s with pid %s", index, process.pid)
+
+    def _stop(self, *args):
+        self._stopping = True
+
+    def _collect_metrics(self, timeout: float):
+        try:
+            index, metrics = self._metrics_queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        self.metrics[index] = metrics
+
+    def _check_processes(self):
+        now = time.monotonic()
+        for index, process in self._processes.items():
+            if process.is_alive():
+                continue
+            if index not in self._restart_at:
+                if now - self._started_at[index] > self.HEALTHY_UPTIME_SECONDS:
+                    self._backoff[index] = self.RESTART_BACKOFF_SECONDS
+                else:
+                    self._backoff[index] = min(
+                        self._backoff.get(index, self.RESTART_BACKOFF_SECONDS / 2) * 2,
+                        self.MAX_RESTART_BACKOFF_SECONDS,
+                    )
+                self._restart_at[index] = now + self._backoff[index]
+                logger.error(
+                    "Consumer process %s exited with code %s, restarting in %s seconds",
+                    index,
+                    process.exitcode,
+                    self._backoff[index],
+                )
+            elif now >= self._restart_at[index]:
+                self.restarts[index] = self.restarts.get(index, 0) + 1
+                self._spawn(index)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for index in range(self.processes):
+            self._spawn(index)
+
+        logged_at = time.monotonic()
+        while not self._stopping:
+            self._collect_metrics(timeout=1)
+            self._check_processes()
+            if time.monotonic() - logged_at >= self.metrics_interval:
+                logger.info(
+                    "Consumer processes metrics: %s, restarts: %s",
+                    self.metrics,
+                    self.restarts,
+                )
+                logged_at = time.monotonic()
+
+        logger.info("Stopping consumer processes")
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes.values():
+            process.join(self.STOP_TIMEOUT_SECONDS)
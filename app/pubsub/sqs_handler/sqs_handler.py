@@ -1,26 +1,46 @@
-import json
-
 from commonutils.handlers.sqs import SQSHandler
 from sanic.log import logger
 
+from app.commons.json_codec import JSONDecodeError
 from app.commons.logging.types import LogRecord
 from app.constants.error_messages import JsonDecode
+from app.exceptions import MessageDecodeError, MissingFieldError
 from app.services.handlers.email.handler import EmailHandler
 from app.services.handlers.push.handler import PushHandler
 from app.services.handlers.sms.handler import SmsHandler
 from app.services.handlers.whatsapp.handler import WhatsappHandler
+from app.utils import json_loads
+
+
+def decode_event(data) -> dict:
+    """
+    Decode the body of an event message, a message not holding a JSON object is poison
+    """
+    try:
+        event = json_loads(data)
+    except JSONDecodeError as err:
+        logger.info(JsonDecode.DECODE.value.format(err))
+        raise MessageDecodeError(JsonDecode.DECODE.value.format(err)) from err
+    if not isinstance(event, dict):
+        raise MessageDecodeError(
+            "Expected a JSON object, got {}".format(type(event).__name__)
+        )
+    return event
+
+
+def pop_required(event: dict, field: str):
+    if field not in event:
+        raise MissingFieldError(field)
+    return event.pop(field)
 
 
 class SMSSqsHandler(SQSHandler):
     @classmethod
     async def handle_event(cls, data):
-        try:
-            data = json.loads(data)
-        except json.JSONDecodeError as err:
-            logger.info(JsonDecode.DECODE.value.format(err))
+        data = decode_event(data)
 
-        to = data.pop("to")
-        message = data.pop("message")
+        to = pop_required(data, "to")
+        message = pop_required(data, "message")
         log_info = LogRecord(log_id=data.pop("notification_log_id", "-1"))
         return await SmsHandler.notify(to, message, log_info=log_info, **data)
 
@@ -28,15 +48,11 @@ class SMSSqsHandler(SQSHandler):
 class EmailSqsHandler(SQSHandler):
     @classmethod
     async def handle_event(self, data):
-        try:
-            data = json.loads(data)
-        except json.JSONDecodeError as e:
-            logger.info(JsonDecode.DECODE.value.format(e))
-            raise e
+        data = decode_event(data)
 
         log_info = LogRecord(log_id=data.pop("notification_log_id", "-1"))
-        to = data.pop("to", "")
-        message = data.pop("message", "")
+        to = pop_required(data, "to")
+        message = pop_required(data, "message")
         return await EmailHandler.notify(
             to=to, message=message, log_info=log_info, **data
         )
@@ -45,28 +61,20 @@ class EmailSqsHandler(SQSHandler):
 class WhatsappSqsHandler(SQSHandler):
     @classmethod
     async def handle_event(cls, data):
-        try:
-            data = json.loads(data)
-        except json.JSONDecodeError as err:
-            logger.info(JsonDecode.DECODE.value.format(err))
-            raise err
+        data = decode_event(data)
 
         log_info = LogRecord(data.pop("notification_log_id", "-1"))
-        to = data.pop("mobile", "")
+        to = pop_required(data, "mobile")
         return await WhatsappHandler.notify(to, data, log_info=log_info)
 
 
 class PushSqsHandler(SQSHandler):
     @classmethod
     async def handle_event(cls, data):
-        try:
-            data = json.loads(data)
-        except json.JSONDecodeError as err:
-            logger.error("Not a valid JSON, unable to decode: %s", err)
-            raise err
+        data = decode_event(data)
 
         log_info = LogRecord(log_id=data.get("notification_log_id"))
-        data = data.pop("push_data", {})
+        data = pop_required(data, "push_data")
         registration_ids = []
         for device in data.pop("registered_devices", []):
             registration_ids.append(device.get("register_id"))
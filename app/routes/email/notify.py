@@ -1,6 +1,8 @@
 from torpedo import Request, send_response
 
 from app.commons.logging.types import LogRecord
+from app.constants import HTTPStatusCodes
+from app.exceptions import UnknownChannelError
 from app.routes.email.api_model import EmailNotifyApiModel
 from app.routes.email.blueprint import EmailBlueprint
 from app.services.handlers.email.handler import EmailHandler
@@ -31,9 +33,18 @@ async def notify(request: Request):
     message = data.pop("message")
     log_info = LogRecord(log_id=data.pop("notification_log_id", "-1"))
 
-    provider, response = await EmailHandler.notify(
-        to, message, log_info=log_info, **data
-    )
+    try:
+        provider, response = await EmailHandler.notify(
+            to, message, log_info=log_info, **data
+        )
+    except UnknownChannelError as err:
+        return send_response(
+            data={
+                "status": HTTPStatusCodes.SERVICE_UNAVAILABLE.value,
+                "message": {"error": str(err)},
+            },
+            status_code=HTTPStatusCodes.SERVICE_UNAVAILABLE.value,
+        )
     response_data = {
         "status": response.status_code,
         "message": response.data or response.error,
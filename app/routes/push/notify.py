@@ -2,6 +2,8 @@ from sanic import Request, json
 from sanic_openapi import openapi
 
 from app.commons.logging.types import LogRecord
+from app.constants import HTTPStatusCodes
+from app.exceptions import UnknownChannelError
 from app.routes.push.api_model import PushNotifyApiModel
 from app.routes.push.blueprint import PushBlueprint
 from app.services.handlers.push.handler import PushHandler
@@ -33,9 +35,18 @@ async def notify(request: Request):
     for device in data.pop("registered_devices", []):
         registration_ids.append(device.get("register_id"))
 
-    provider, response = await PushHandler.notify(
-        to, message, log_info=log_info, **data
-    )
+    try:
+        provider, response = await PushHandler.notify(
+            to, message, log_info=log_info, **data
+        )
+    except UnknownChannelError as err:
+        return json(
+            {
+                "status": HTTPStatusCodes.SERVICE_UNAVAILABLE.value,
+                "message": {"error": str(err)},
+            },
+            status=HTTPStatusCodes.SERVICE_UNAVAILABLE.value,
+        )
 
     return json(
         {
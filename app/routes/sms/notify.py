@@ -2,6 +2,8 @@ from sanic_openapi import openapi
 from torpedo import Request, send_response
 
 from app.commons.logging.types import LogRecord
+from app.constants import HTTPStatusCodes
+from app.exceptions import UnknownChannelError
 from app.routes.sms.api_model import SmsNotifyApiModel
 from app.routes.sms.blueprint import SmsBlueprint
 from app.services.handlers.sms.handler import SmsHandler
@@ -29,7 +31,16 @@ async def notify(request: Request):
     to = data.pop("to")
     message = data.pop("message")
     log_info = LogRecord(log_id=data.pop("notification_log_id", "-1"))
-    provider, response = await SmsHandler.notify(to, message, log_info=log_info, **data)
+    try:
+        provider, response = await SmsHandler.notify(to, message, log_info=log_info, **data)
+    except UnknownChannelError as err:
+        return send_response(
+            data={
+                "status": HTTPStatusCodes.SERVICE_UNAVAILABLE.value,
+                "message": {"error": str(err)},
+            },
+            status_code=HTTPStatusCodes.SERVICE_UNAVAILABLE.value,
+        )
     response_data = {
         "status": response.status_code,
         "message": response.data or response.error,
@@ -2,6 +2,8 @@ from sanic import Request, json
 from sanic_openapi import openapi
 
 from app.commons.logging.types import LogRecord
+from app.constants import HTTPStatusCodes
+from app.exceptions import UnknownChannelError
 from app.routes.whatsapp.api_model import WhatsappNotifyApiModel
 from app.routes.whatsapp.blueprint import WhatsappBlueprint
 from app.services.handlers.whatsapp.handler import WhatsappHandler
@@ -30,9 +32,18 @@ async def notify(request: Request):
     message = data.pop("message")
     log_info = LogRecord(log_id=data.pop("notification_log_id", "-1"))
 
-    provider, response = await WhatsappHandler.notify(
-        to, message, log_info=log_info, **data
-    )
+    try:
+        provider, response = await WhatsappHandler.notify(
+            to, message, log_info=log_info, **data
+        )
+    except UnknownChannelError as err:
+        return json(
+            {
+                "status": HTTPStatusCodes.SERVICE_UNAVAILABLE.value,
+                "message": {"error": str(err)},
+            },
+            status=HTTPStatusCodes.SERVICE_UNAVAILABLE.value,
+        )
 
     return json(
         {
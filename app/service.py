@@ -1,10 +1,26 @@
+import logging
+import sys
+
 from torpedo import Host
 
 from app.initialize import Initialize
 from app.listeners import listeners
+from app.pubsub.sqs.supervisor import ConsumerSupervisor
 from app.routes import blueprint_group
 
 if __name__ == "__main__":
+    if "--consumer-only" in sys.argv:
+        # Run only the SQS consumers, in `CONSUMER.PROCESSES` shared-nothing processes.
+        # The HTTP APIs are served by the Sanic workers of another deployment.
+        logging.basicConfig(level=logging.INFO)
+        consumer_config = Initialize.consumer_config()
+        ConsumerSupervisor(
+            Initialize.run_consumer_process,
+            processes=consumer_config.get("PROCESSES", 1),
+            metrics_interval=consumer_config.get("METRICS_INTERVAL", 60),
+        ).run()
+        sys.exit(0)
+
     # register listeners
     Host._listeners = listeners
 
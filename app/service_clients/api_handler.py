@@ -3,6 +3,7 @@ from typing import Optional
 from aiohttp import ClientSession, TCPConnector
 from torpedo.exceptions import HTTPRequestException
 
+from app.commons import deadline
 from app.constants import HTTPStatusCodes
 from app.utils import json_dumps
 
@@ -18,7 +19,7 @@ class APIClient:
     async def get_session(cls):
         if cls.SESSION is None:
             conn = TCPConnector(limit=(0), limit_per_host=(0))
-            cls.SESSION = ClientSession(connector=conn)
+            cls.SESSION = ClientSession(connector=conn, json_serialize=json_dumps)
         return cls.SESSION
 
     async def request(
@@ -34,7 +35,8 @@ class APIClient:
             "data": json_dumps(data),
             "json": json,
             "method": method,
-            "timeout": self.timeout,
+            # Shortened to the deadline of the notification being sent, if any
+            "timeout": deadline.timeout(self.timeout),
         }
         if self.headers:
             request_info["headers"] = self.headers
@@ -1,3 +1,6 @@
+import gzip
+from typing import List
+
 from torpedo import CONFIG, BaseApiRequest
 from torpedo.constants import HTTPMethod
 
@@ -12,6 +15,7 @@ class NotifyOneCoreClient(BaseApiRequest):
     ns_config = CONFIG.config['NOTIFYONE_CORE']
     _host = ns_config['HOST']
     _timeout = ns_config['TIMEOUT']
+    _status_updates_path = ns_config.get('STATUS_UPDATES_PATH', '/notifications/status/bulk')
 
     @classmethod
     async def get_channel_partners_configurations(cls, channels: list[Channels]):
@@ -31,3 +35,19 @@ class NotifyOneCoreClient(BaseApiRequest):
             query_params=params
         )
         return result.data
+
+    @classmethod
+    async def publish_status_updates(cls, status_updates: List[str]) -> List[int]:
+        """
+        Use this routine to publish notification status updates (JSON documents) in bulk.
+        The request body is gzipped. It returns the indexes of the updates core couldn't accept,
+        raises on a failed request.
+        """
+        body = '{"status_updates":[' + ','.join(status_updates) + ']}'
+        result = await cls.request(
+            HTTPMethod.POST.value,
+            cls._status_updates_path,
+            data=gzip.compress(body.encode('utf-8')),
+            headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        )
+        return (result.data or {}).get('failed', [])
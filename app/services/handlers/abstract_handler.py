@@ -1,11 +1,23 @@
+import asyncio
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Dict, Iterator, List, Tuple
 
+from app.commons import deadline
+from app.commons.http import ErrorType, Response
 from app.commons.logging.types import AsyncLoggerContextCreator, LogRecord
 from app.constants import HTTPStatusCodes
+from app.exceptions import UnknownChannelError
+from app.services.handlers.balancing import GatewayBalancer
+from app.services.handlers.deadline import NotificationDeadline
+from app.services.handlers.dedup import NotificationDeduplicator
+from app.services.handlers.gateway_health import GatewayHealth
 from app.services.handlers.gateway_priority import PriorityGatewaySelection
+from app.services.handlers.hedging import HedgingPolicy
 from app.services.handlers.notifier import Notifier
+from app.services.handlers.rate_limit import RateLimiter
+from app.services.handlers.retry import RetryPolicy
 
 logger = logging.getLogger()
 
@@ -23,6 +35,13 @@ class AbstractHandler(PriorityGatewaySelection, ABC):
     MAX_ATTEMPTS = None
 
     PROVIDERS: Dict[str, Notifier] = {}
+    # Health of the providers, by unique identifier, kept across configuration refreshes
+    GATEWAYS_HEALTH: Dict[str, GatewayHealth] = {}
+    BALANCER: GatewayBalancer = GatewayBalancer([])
+    # Rate limiters of the rate limited providers, by unique identifier
+    RATE_LIMITERS: Dict[str, RateLimiter] = {}
+    # None if the sends of the channel are never hedged
+    HEDGING: HedgingPolicy = None
 
     @classmethod
     @abstractmethod
@@ -44,6 +63,7 @@ class AbstractHandler(PriorityGatewaySelection, ABC):
     def update_configuration(cls, handler_configuration: dict):
         cls._HANDLER_CONFIG = handler_configuration
         cls.refresh_providers()
+        cls.compile_priority_logic()
 
     @classmethod
     def refresh_providers(cls):
@@ -62,11 +82,24 @@ class AbstractHandler(PriorityGatewaySelection, ABC):
         existing_providers_map = cls.PROVIDERS
         cls.PROVIDERS = new_providers_map
         del existing_providers_map
+        cls.GATEWAYS_HEALTH = {
+            unique_id: cls.GATEWAYS_HEALTH.get(unique_id) or GatewayHealth(unique_id)
+            for unique_id in new_providers_map
+        }
+        cls.BALANCER = GatewayBalancer(gateways)
+        rate_limiters = {}
+        for gateway_config in gateways:
+            unique_id = gateway_config["unique_identifier"]
+            limiter = RateLimiter.for_gateway(gateway_config, cls.RATE_LIMITERS.get(unique_id))
+            if limiter:
+                rate_limiters[unique_id] = limiter
+        cls.RATE_LIMITERS = rate_limiters
 
     @classmethod
     def initialize(cls, log: AsyncLoggerContextCreator):
         cls.refresh_providers()
         cls.logger = log
+        cls.HEDGING = HedgingPolicy.for_channel(cls.CHANNEL)
 
     @classmethod
     async def notify(cls, to, message, **kwargs):
@@ -80,35 +113,253 @@ class AbstractHandler(PriorityGatewaySelection, ABC):
         """
         # If log_info is not present use log_id as `-1``
         log_info = kwargs.pop("log_info", LogRecord(log_id="-1"))
-        provider, response = None, None
-        for n_attempts in range(cls.ENABLED_GATEWAYS_COUNT):
-            gateway = cls.select_gateway(
-                n_attempts, cls._get_priority_logic_data(to, **kwargs)
+        sent = await NotificationDeduplicator.get_sent(log_info.log_id)
+        # The gateway could have been removed from the configuration since the notification was sent
+        if sent and sent["gateway"] in cls.PROVIDERS:
+            logger.info(
+                "Skipping %s %s, already sent using %s"
+                % (cls.CHANNEL, log_info.log_id, sent["gateway"])
             )
-            provider = cls.PROVIDERS[gateway]
-            response = await provider.send_notification(to, message, **kwargs)
-            async with cls.logger as log:
-                await log.log(
-                    log_info,
-                    extras={
-                        "provider": provider,
-                        "response": response,
-                        "sent_to": to,
-                        "attempt_number": n_attempts,
-                        "channel": cls.CHANNEL,
-                    },
-                )
-            if response.status_code == HTTPStatusCodes.SUCCESS.value:
-                logger.info(
-                    "Successfully sent %s using %s" % (cls.CHANNEL, provider.__class__.__name__)
+            return cls.PROVIDERS[sent["gateway"]], Response(
+                status_code=HTTPStatusCodes.SUCCESS.value,
+                data={"data": "Notification already sent"},
+                event_id=sent["event_id"],
+            )
+
+        # Configuration loaded, but without any gateway for the channel
+        if cls._HANDLER_CONFIG and not cls.PROVIDERS:
+            raise UnknownChannelError(cls.CHANNEL)
+
+        # The attempts share the time budget of the notification
+        token = deadline.set_deadline(
+            NotificationDeadline.deadline(
+                cls.CHANNEL, kwargs.get("event_type"), kwargs.pop("deadline", None)
+            )
+        )
+        try:
+            return await cls._send_with_failover(to, message, log_info, kwargs)
+        finally:
+            deadline.reset_deadline(token)
+
+    @classmethod
+    async def _send_with_failover(cls, to, message, log_info: LogRecord, kwargs: Dict):
+        provider, response = None, None
+        # The same order is followed across the attempts
+        priority_order = cls.get_priority_order(cls._get_priority_logic_data(to, **kwargs))
+        gateways = cls._gateways_to_try(priority_order)
+        hedging = cls.HEDGING
+        if hedging and not hedging.applies(kwargs.get("event_type")):
+            hedging = None
+        n_attempts = 0
+        for gateway in gateways:
+            retries = 0
+            while True:
+                if hedging:
+                    # Only the send through the primary gateway is hedged
+                    sends = await cls._send_hedged(gateway, gateways, hedging, to, message, kwargs)
+                    hedging = None
+                else:
+                    sends = [(gateway, await cls._send(gateway, to, message, kwargs))]
+                for sent_through, response in sends:
+                    provider = cls.PROVIDERS[sent_through]
+                    await cls._log_attempt(log_info, provider, response, to, n_attempts)
+                    n_attempts += 1
+                    if response.status_code == HTTPStatusCodes.SUCCESS.value:
+                        logger.info(
+                            "Successfully sent %s using %s"
+                            % (cls.CHANNEL, provider.__class__.__name__)
+                        )
+                        await NotificationDeduplicator.mark_sent(
+                            log_info.log_id, sent_through, response.event_id
+                        )
+                        return provider, response
+                    else:
+                        logger.error(
+                            "Couldn't send %s using %s provider, %s error"
+                            % (
+                                cls.CHANNEL,
+                                provider.__class__.__name__,
+                                response.error_type or "unknown",
+                            )
+                        )
+                rejected = next(
+                    (
+                        (sent_through, response)
+                        for sent_through, response in sends
+                        if response.error_type == ErrorType.PERMANENT_RECIPIENT.value
+                    ),
+                    None,
                 )
-                break
-            else:
+                if rejected:
+                    # No other gateway can reach the recipient either
+                    return cls.PROVIDERS[rejected[0]], rejected[1]
+                # A hedged send already went through two gateways
+                delay = RetryPolicy.delay(response, retries) if len(sends) == 1 else None
+                if delay is None:
+                    break
+                logger.info("Retrying %s send through %s in %.2fs", cls.CHANNEL, gateway, delay)
+                await asyncio.sleep(delay)
+                retries += 1
+            if deadline.expired():
                 logger.error(
-                    "Couldn't send %s using %s provider" % (cls.CHANNEL, provider.__class__.__name__)
+                    "Deadline of %s %s exceeded after %s attempts"
+                    % (cls.CHANNEL, log_info.log_id, n_attempts)
                 )
+                break
         return provider, response
 
+    @classmethod
+    async def _log_attempt(
+        cls, log_info: LogRecord, provider: Notifier, response: Response, to, n_attempts: int
+    ):
+        async with cls.logger as log:
+            await log.log(
+                log_info,
+                extras={
+                    "provider": provider,
+                    "response": response,
+                    "sent_to": to,
+                    "attempt_number": n_attempts,
+                    "channel": cls.CHANNEL,
+                },
+            )
+
+    @classmethod
+    async def _send(cls, gateway: str, to, message, kwargs: Dict) -> Response:
+        """
+        Send through a gateway within its rate limit and the notification deadline, recording the
+        outcome in its health. A send that would wait too long for the rate limit fails right away
+        with a 429 response, a send not done by the deadline with a 408 response.
+        """
+        if deadline.expired():
+            return Response(
+                status_code=HTTPStatusCodes.TIMEOUT_ERROR.value,
+                error={"error": "Notification deadline exceeded"},
+            )
+        health = cls.GATEWAYS_HEALTH[gateway]
+        limiter = cls.RATE_LIMITERS.get(gateway)
+        health.outstanding += 1
+        try:
+            if limiter and not await limiter.acquire(deadline.timeout(RateLimiter.MAX_WAIT)):
+                logger.warning("Rate limit of %s gateway %s exceeded", cls.CHANNEL, gateway)
+                return Response(
+                    status_code=HTTPStatusCodes.TOO_MANY_REQUESTS.value,
+                    error={"error": "Rate limit of gateway {} exceeded".format(gateway)},
+                    error_type=ErrorType.THROTTLED.value,
+                    retry_after=limiter.delay(),
+                )
+            started_at = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    cls.PROVIDERS[gateway].send_notification(to, message, **kwargs),
+                    deadline.remaining(),
+                )
+            except asyncio.TimeoutError:
+                # Cut short by the deadline, not necessarily a slow gateway
+                logger.error("%s gateway %s didn't respond by the deadline", cls.CHANNEL, gateway)
+                return Response(
+                    status_code=HTTPStatusCodes.TIMEOUT_ERROR.value,
+                    error={"error": "Notification deadline exceeded"},
+                )
+            except Exception:
+                health.record(False, time.monotonic() - started_at)
+                raise
+        finally:
+            health.outstanding -= 1
+        # An unreachable recipient doesn't tell anything about the gateway
+        health.record(
+            response.status_code == HTTPStatusCodes.SUCCESS.value
+            or response.error_type == ErrorType.PERMANENT_RECIPIENT.value,
+            time.monotonic() - started_at,
+        )
+        return response
+
+    @classmethod
+    async def _send_hedged(
+        cls,
+        primary: str,
+        gateways: Iterator[str],
+        hedging: HedgingPolicy,
+        to,
+        message,
+        kwargs: Dict,
+    ) -> List[Tuple[str, Response]]:
+        """
+        Send through the primary gateway, and through the next gateway as well if the primary one
+        hasn't responded within its usual latency. Returns the completed sends, in the order they
+        completed, up to the first successful one - the other send is cancelled. The gateway of the
+        cancelled send may still deliver it, which is why hedging is limited to the channels safe
+        for duplicates (see `HedgingPolicy`).
+        """
+        hedging.record_send()
+        delay = cls.GATEWAYS_HEALTH[primary].latency_percentile(HedgingPolicy.PERCENTILE)
+        sends = {asyncio.ensure_future(cls._send(primary, to, message, kwargs)): primary}
+        try:
+            # Without a latency history yet, the primary send is waited for
+            done, _ = await asyncio.wait(sends, timeout=delay)
+            if not done and hedging.can_hedge():
+                secondary = next(gateways, None)
+                if secondary is not None:
+                    logger.info(
+                        "Hedging %s send through %s with %s", cls.CHANNEL, primary, secondary
+                    )
+                    hedging.hedge()
+                    sends[asyncio.ensure_future(cls._send(secondary, to, message, kwargs))] = (
+                        secondary
+                    )
+
+            completed, pending = [], set(sends)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                completed.extend((sends[send], send.result()) for send in done)
+                if any(
+                    response.status_code == HTTPStatusCodes.SUCCESS.value
+                    for _, response in completed
+                ):
+                    break
+            return completed
+        finally:
+            for send in sends:
+                send.cancel()
+
+    @classmethod
+    def _gateways_to_try(cls, priority_order: List[str]) -> Iterator[str]:
+        """
+        Gateways to try in turn for a send request, the instances of a gateway balanced among
+        their places in the priority order, skipping the ones whose circuit is open. If every
+        circuit is open, the first gateway is tried anyway rather than not sending at all.
+        """
+        attempts = [
+            cls.select_gateway(n_attempts, priority_order=priority_order)
+            for n_attempts in range(cls.ENABLED_GATEWAYS_COUNT)
+        ]
+        attempts = cls.BALANCER.balance(
+            attempts, lambda gateway: cls.GATEWAYS_HEALTH[gateway].outstanding
+        )
+        skipped = []
+        for gateway in attempts:
+            if cls.GATEWAYS_HEALTH[gateway].allow_request():
+                yield gateway
+            else:
+                skipped.append(gateway)
+        if skipped and len(skipped) == cls.ENABLED_GATEWAYS_COUNT:
+            logger.warning("Every %s gateway is unhealthy, trying %s", cls.CHANNEL, skipped[0])
+            yield skipped[0]
+
+    @classmethod
+    def saturation(cls) -> float:
+        """
+        Seconds a send would wait for a gateway once all of them are at their rate limit, 0 while
+        any gateway can take it right away (or isn't rate limited)
+        """
+        if not cls.RATE_LIMITERS or len(cls.RATE_LIMITERS) < len(cls.PROVIDERS):
+            return 0.0
+        return min(limiter.delay() for limiter in cls.RATE_LIMITERS.values())
+
+    @classmethod
+    def gateways_health(cls) -> Dict[str, Dict]:
+        return {gateway: health.stats() for gateway, health in cls.GATEWAYS_HEALTH.items()}
+
     @classmethod
     def _get_priority_logic_data(cls, to, **kwargs):
         return {
@@ -0,0 +1,64 @@
+import random
+from typing import Callable, Dict, List
+
+
+class GatewayBalancer:
+    """
+    Spreads the sends of a channel over the instances of a gateway (gateway configurations of the
+    same `gateway`, e.g. several Plivo accounts, each with its own `unique_identifier`).
+
+    The order of the attempts still follows the priority order, but the instances of a gateway
+    swap their places in it - in LEAST_OUTSTANDING mode, the instance with the least sends in
+    progress relative to its `weight` comes first, in WEIGHTED mode the instances are shuffled in
+    proportion to their `weight`.
+    """
+
+    LEAST_OUTSTANDING = "LEAST_OUTSTANDING"
+    WEIGHTED = "WEIGHTED"
+
+    ENABLED = False
+    MODE = LEAST_OUTSTANDING
+
+    @classmethod
+    def initialize(cls, config: Dict):
+        mode = config.get("MODE", cls.LEAST_OUTSTANDING)
+        if mode not in (cls.LEAST_OUTSTANDING, cls.WEIGHTED):
+            raise ValueError("Unknown gateway balancing mode {}".format(mode))
+        cls.ENABLED = config.get("ENABLED", False)
+        cls.MODE = mode
+
+    def __init__(self, gateways_config: List[Dict]):
+        # Gateway of every instance, by unique identifier
+        self.gateways = {
+            config["unique_identifier"]: config["gateway"] for config in gateways_config
+        }
+        self.weights = {
+            config["unique_identifier"]: max(config.get("weight", 1), 0.001)
+            for config in gateways_config
+        }
+
+    def balance(self, order: List[str], outstanding: Callable[[str], int]) -> List[str]:
+        """
+        Reorder the instances of every gateway among the places they take in `order`
+        """
+        if not self.ENABLED:
+            return order
+        instances: Dict[str, List[str]] = {}
+        for unique_id in order:
+            instances.setdefault(self.gateways.get(unique_id, unique_id), []).append(unique_id)
+
+        for group in instances.values():
+            if len(group) < 2:
+                continue
+            if self.MODE == self.WEIGHTED:
+                # Weighted random sampling without replacement
+                group.sort(key=lambda unique_id: -random.random() ** (1 / self._weight(unique_id)))
+            else:
+                # Stable, ties keep the priority order
+                group.sort(key=lambda unique_id: outstanding(unique_id) / self._weight(unique_id))
+
+        places = {gateway: iter(group) for gateway, group in instances.items()}
+        return [next(places[self.gateways.get(unique_id, unique_id)]) for unique_id in order]
+
+    def _weight(self, unique_id: str) -> float:
+        return self.weights.get(unique_id, 1)
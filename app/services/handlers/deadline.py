@@ -0,0 +1,38 @@
+import logging
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger()
+
+
+class NotificationDeadline:
+    """
+    Time budget of a notification, across all its send attempts. The budget is configured per
+    channel, with overrides per event type - {"DEFAULT": seconds, "EVENT_TYPES": {type: seconds}}.
+    A `deadline` (UNIX timestamp) in the notification request takes precedence.
+    """
+
+    # Config by channel
+    CHANNELS: Dict[str, Dict] = {}
+
+    @classmethod
+    def initialize(cls, config: Dict):
+        cls.CHANNELS = config
+
+    @classmethod
+    def deadline(
+        cls, channel: str, event_type: Optional[str], deadline_at: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        Deadline of a notification, by time.monotonic - None if it has no deadline
+        """
+        if deadline_at is not None:
+            try:
+                return time.monotonic() + float(deadline_at) - time.time()
+            except (TypeError, ValueError):
+                logger.warning("Ignoring invalid deadline %s of %s notification", deadline_at, channel)
+        config = cls.CHANNELS.get(channel) or {}
+        budget = (config.get("EVENT_TYPES") or {}).get(event_type, config.get("DEFAULT"))
+        if budget is None:
+            return None
+        return time.monotonic() + budget
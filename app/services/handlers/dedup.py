@@ -0,0 +1,69 @@
+import logging
+from typing import Dict, Optional
+
+from app.commons.lru import LRUCache
+
+logger = logging.getLogger()
+
+
+class NotificationDeduplicator:
+    """
+    Remembers the notifications sent successfully, keyed by their notification_log_id, so that an
+    SQS redelivery of an already sent notification does not hit the gateway again.
+    Sent notifications are kept in an in-process LRU cache, optionally backed by Redis to share
+    them among the handler processes and deployments.
+    """
+
+    # Log id used for requests not having a notification_log_id
+    UNKNOWN_LOG_ID = "-1"
+
+    _enabled = False
+    _sent: LRUCache = LRUCache(max_size=0)
+    _redis = None
+
+    @classmethod
+    def initialize(cls, config: Dict):
+        cls._enabled = config.get("ENABLED", False)
+        ttl = config.get("TTL", 24 * 60 * 60)
+        cls._sent = LRUCache(max_size=config.get("MAX_SIZE", 100000), ttl=ttl)
+        if cls._enabled and config.get("USE_REDIS"):
+            # Redis is an optional dependency, only needed when enabled
+            from app.caches import SentNotificationCache
+
+            SentNotificationCache.expire_time = ttl
+            cls._redis = SentNotificationCache
+
+    @classmethod
+    def _is_applicable(cls, log_id) -> bool:
+        return cls._enabled and log_id is not None and str(log_id) != cls.UNKNOWN_LOG_ID
+
+    @classmethod
+    async def get_sent(cls, log_id) -> Optional[Dict]:
+        """
+        Returns {"gateway": ..., "event_id": ...} of the send if the notification was already sent
+        """
+        if not cls._is_applicable(log_id):
+            return None
+        log_id = str(log_id)
+        sent = cls._sent.get(log_id)
+        if sent is None and cls._redis:
+            try:
+                sent = await cls._redis.get_sent(log_id)
+            except Exception as err:
+                logger.error("Couldn't check sent notification %s in redis: %s", log_id, err)
+            if sent:
+                cls._sent.set(log_id, sent)
+        return sent
+
+    @classmethod
+    async def mark_sent(cls, log_id, gateway: str, event_id: Optional[str]):
+        if not cls._is_applicable(log_id):
+            return
+        log_id = str(log_id)
+        sent = {"gateway": gateway, "event_id": event_id}
+        cls._sent.set(log_id, sent)
+        if cls._redis:
+            try:
+                await cls._redis.set_sent(log_id, sent)
+            except Exception as err:
+                logger.error("Couldn't mark notification %s sent in redis: %s", log_id, err)
@@ -15,6 +15,11 @@ logger = logging.getLogger()
 
 class AwsSesHandler(Notifier):
     __provider__ = EmailGateways.AWS_SES.value
+    __metadata_fields__ = [
+        "MessageId",
+        "ResponseMetadata.RequestId",
+        "ResponseMetadata.HTTPStatusCode",
+    ]
 
     CHARSET = "UTF-8"
     # ENDPOINT = "http://localhost:4566"  # For local testing
@@ -129,7 +134,10 @@ class AwsSesHandler(Notifier):
             except Exception as err:
                 logger.error("Encountered error while calling send_raw_email: %s", err)
                 return http.Response(
-                    status_code=400, error={"error": str(err)}, meta=str(err)
+                    status_code=400,
+                    error={"error": str(err)},
+                    meta=str(err),
+                    error_type=aws.aws_error_type(err),
                 )
 
     async def _send_email_using_ses(
@@ -166,7 +174,10 @@ class AwsSesHandler(Notifier):
             except Exception as err:
                 logger.error("Encountered error while calling send_email: %s", err)
                 return http.Response(
-                    status_code=400, error={"error": str(err)}, meta=str(err)
+                    status_code=400,
+                    error={"error": str(err)},
+                    meta=str(err),
+                    error_type=aws.aws_error_type(err),
                 )
 
     async def _send_email_without_attachments(
@@ -195,6 +206,12 @@ class AwsSesHandler(Notifier):
             )
         except Exception as err:
             logger.exception("Couldn't send mail using AWS SES %s", err)
+            return http.Response(
+                status_code=400,
+                error={"error": str(err)},
+                meta=str(err),
+                error_type=aws.aws_error_type(err),
+            )
 
     async def _send_email_with_attachments(
         self,
@@ -224,7 +241,10 @@ class AwsSesHandler(Notifier):
         except Exception as err:
             logger.error("Couldn't send email with attachment using AWS SES: %s", err)
             return http.Response(
-                status_code=400, error={"error": str(err)}, meta=str(err)
+                status_code=400,
+                error={"error": str(err)},
+                meta=str(err),
+                error_type=aws.aws_error_type(err),
             )
 
     async def send_notification(self, to: str, message: str, **kwargs) -> http.Response:
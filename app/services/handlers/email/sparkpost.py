@@ -13,17 +13,33 @@ from app.service_clients.api_handler import APIClient
 from app.service_clients.callback_handler import (CallbackHandler,
                                                   CallbackLogger)
 from app.services.handlers.notifier import Notifier
-from app.utils import get_value_by_priority
+from app.utils import get_value_by_priority, json_loads
 
 logger = logging.getLogger()
 
 
 class SparkPostHandler(Notifier, APIClient, CallbackHandler):
     __provider__ = EmailGateways.SPARK_POST.value
+    __metadata_fields__ = [
+        "results.id",
+        "results.total_accepted_recipients",
+        "results.total_rejected_recipients",
+        "errors",
+        "msys.*.type",
+        "msys.*.transmission_id",
+        "msys.*.timestamp",
+        "msys.*.error_code",
+        "msys.*.raw_reason",
+    ]
 
     BASE_URL: str = "https://api.sparkpost.com"
     ENDPOINT: str = "/api/v1/transmissions?num_rcpt_errors=3"
 
+    # Error codes - message generation rejected, the recipients are invalid or suppressed
+    RECIPIENT_ERRORS = {"1902"}
+    # Unconfigured or unverified sending domain
+    CONFIG_ERRORS = {"7001"}
+
     def __init__(self, config: Dict) -> None:
         self.config = config
         self._headers = {
@@ -81,11 +97,12 @@ class SparkPostHandler(Notifier, APIClient, CallbackHandler):
             return http.Response(
                 status_code=HTTPStatusCodes.INTERNAL_ERROR.value,
                 error={"error": f"Encountered error while sending email {str(err)}"},
+                error_type=http.exception_error_type(err),
             )
 
     @staticmethod
     async def format_response(response: ClientResponse):
-        json = await response.json()
+        json = await response.json(loads=json_loads)
         if http.is_success(response.status):
             response = {
                 "status_code": HTTPStatusCodes.SUCCESS.value,
@@ -98,9 +115,23 @@ class SparkPostHandler(Notifier, APIClient, CallbackHandler):
                 "status_code": HTTPStatusCodes.BAD_REQUEST.value,
                 "error": {"error": json},
                 "meta": json,
+                "error_type": SparkPostHandler._error_type(response.status, json),
+                "retry_after": http.retry_after(response.headers),
             }
         return http.Response(**response)
 
+    @classmethod
+    def _error_type(cls, status: int, json: Dict):
+        """
+        Kind of a failed transmission, by the documented `code` of the SparkPost errors
+        """
+        codes = {str(error.get("code")) for error in json.get("errors") or []}
+        if codes & cls.RECIPIENT_ERRORS:
+            return http.ErrorType.PERMANENT_RECIPIENT.value
+        if codes & cls.CONFIG_ERRORS:
+            return http.ErrorType.PERMANENT_CONFIG.value
+        return http.error_type_of(status)
+
     async def _send_email_with_attachments(
         self,
         to: str,
@@ -138,6 +169,7 @@ class SparkPostHandler(Notifier, APIClient, CallbackHandler):
             return http.Response(
                 status_code=HTTPStatusCodes.BAD_REQUEST.value,
                 error={"error": f"Encountered error while sending email {str(err)}"},
+                error_type=http.exception_error_type(err),
             )
 
     async def send_notification(self, to: str, message: str, **kwargs):
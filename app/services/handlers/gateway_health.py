@@ -0,0 +1,138 @@
+import logging
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger()
+
+
+class GatewayHealth:
+    """
+    Rolling health of a gateway (a provider instance, by `unique_identifier`) along with its
+    circuit breaker.
+
+    Every send outcome updates exponentially weighted moving averages of the success rate and of
+    the latency, the latencies of the last `LATENCY_WINDOW` successful sends are kept as well for
+    percentiles. The circuit opens after `FAILURE_THRESHOLD` consecutive failures, or once the
+    success rate drops below `MIN_SUCCESS_RATE` over at least `MIN_REQUESTS` sends - the gateway
+    is then skipped. After `OPEN_INTERVAL` seconds, the circuit is half-open and a single probe
+    send is let through, closing the circuit if it succeeds and opening it again otherwise. A
+    probe whose outcome never comes (e.g. cancelled on shutdown) is replaced after another
+    `OPEN_INTERVAL`.
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    ENABLED = False
+    # Weight of the latest outcome in the moving averages
+    ALPHA = 0.1
+    FAILURE_THRESHOLD = 5
+    MIN_SUCCESS_RATE = 0.5
+    MIN_REQUESTS = 20
+    OPEN_INTERVAL = 30
+    LATENCY_WINDOW = 200
+    # Latency percentiles are unknown below these many sends
+    MIN_LATENCY_SAMPLES = 20
+
+    @classmethod
+    def initialize(cls, config: Dict):
+        cls.ENABLED = config.get("ENABLED", False)
+        cls.ALPHA = config.get("ALPHA", cls.ALPHA)
+        cls.FAILURE_THRESHOLD = config.get("FAILURE_THRESHOLD", cls.FAILURE_THRESHOLD)
+        cls.MIN_SUCCESS_RATE = config.get("MIN_SUCCESS_RATE", cls.MIN_SUCCESS_RATE)
+        cls.MIN_REQUESTS = config.get("MIN_REQUESTS", cls.MIN_REQUESTS)
+        cls.OPEN_INTERVAL = config.get("OPEN_INTERVAL", cls.OPEN_INTERVAL)
+        cls.LATENCY_WINDOW = config.get("LATENCY_WINDOW", cls.LATENCY_WINDOW)
+
+    def __init__(self, gateway: str, clock: Callable[[], float] = time.monotonic):
+        self.gateway = gateway
+        self.clock = clock
+        self.state = self.CLOSED
+        self.success_rate = 1.0
+        # Seconds, None until the first send
+        self.latency = None
+        self.requests = 0
+        self.consecutive_failures = 0
+        # Sends in progress
+        self.outstanding = 0
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+        # When the circuit opened, or the last probe was let through
+        self._opened_at = 0.0
+
+    def allow_request(self) -> bool:
+        """
+        Whether a send can go through the gateway, a send let through a half-open circuit is its
+        probe and must be followed by `record`
+        """
+        if not self.ENABLED or self.state == self.CLOSED:
+            return True
+        now = self.clock()
+        if now - self._opened_at < self.OPEN_INTERVAL:
+            return False
+        if self.state == self.OPEN:
+            logger.info("Probing gateway %s", self.gateway)
+        self.state = self.HALF_OPEN
+        self._opened_at = now
+        return True
+
+    def record(self, success: bool, latency: float):
+        self.requests += 1
+        self.success_rate += self.ALPHA * (float(success) - self.success_rate)
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.ALPHA * (latency - self.latency)
+        self.consecutive_failures = 0 if success else self.consecutive_failures + 1
+        if success:
+            self.latencies.append(latency)
+
+        if self.state == self.HALF_OPEN:
+            if success:
+                self._close()
+            else:
+                self._open()
+        elif self.state == self.CLOSED and not success and self._is_unhealthy():
+            self._open()
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """
+        Latency percentile (0 to 1) of the recent successful sends, None without enough of them
+        """
+        if len(self.latencies) < self.MIN_LATENCY_SAMPLES:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+    def _is_unhealthy(self) -> bool:
+        return self.consecutive_failures >= self.FAILURE_THRESHOLD or (
+            self.requests >= self.MIN_REQUESTS and self.success_rate < self.MIN_SUCCESS_RATE
+        )
+
+    def _open(self):
+        if self.ENABLED:
+            logger.warning(
+                "Opening circuit of gateway %s, success rate %.2f, %s consecutive failures",
+                self.gateway,
+                self.success_rate,
+                self.consecutive_failures,
+            )
+            self.state = self.OPEN
+            self._opened_at = self.clock()
+
+    def _close(self):
+        logger.info("Closing circuit of gateway %s", self.gateway)
+        self.state = self.CLOSED
+        # The history before the outage doesn't tell anything about the recovered gateway
+        self.success_rate = 1.0
+        self.requests = 0
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "success_rate": round(self.success_rate, 3),
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "latency_p95": self.latency_percentile(0.95),
+            "outstanding": self.outstanding,
+        }
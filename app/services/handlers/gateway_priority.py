@@ -1,4 +1,132 @@
+import ast
+import logging
 from abc import ABC, abstractmethod
+from types import CodeType
+from typing import List, NamedTuple, Optional
+
+from app.commons.lru import LRUCache
+from app.exceptions import PriorityLogicError
+
+logger = logging.getLogger()
+
+# Syntax allowed in priority logic expressions - literals, comparisons, boolean logic, conditional
+# expressions and lookups in the request `data`
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.IfExp,
+    ast.BoolOp,
+    ast.And,
+    ast.Or,
+    ast.UnaryOp,
+    ast.Not,
+    ast.Compare,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+    ast.In,
+    ast.NotIn,
+    ast.Is,
+    ast.IsNot,
+    ast.BinOp,
+    ast.Add,
+    ast.Constant,
+    ast.List,
+    ast.Tuple,
+    ast.Set,
+    ast.Dict,
+    ast.Subscript,
+    ast.Slice,
+    ast.Name,
+    ast.Load,
+    ast.Attribute,
+    ast.Call,
+)
+ALLOWED_NAMES = {"data"}
+ALLOWED_METHODS = {"get", "lower", "upper", "strip", "startswith", "endswith"}
+
+# Key of the recipient in the request data, the other keys describe the event
+RECIPIENT_KEY = "to"
+
+
+class PriorityLogic(NamedTuple):
+    code: CodeType
+    # Whether the gateways order may depend on the recipient, and not only on the event
+    uses_recipient: bool
+
+
+# Compiled expressions, by expression - configurations are refreshed periodically, mostly unchanged
+_compiled_expressions = LRUCache(max_size=64)
+
+
+def _data_keys(tree: ast.AST) -> Optional[set]:
+    """
+    Keys of `data` looked up by an expression, None if it uses `data` otherwise (non constant keys,
+    `data` as a whole...) and so could read any key
+    """
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+
+    keys = set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Name) and node.id == "data"):
+            continue
+        parent = parents.get(node)
+        if isinstance(parent, ast.Subscript) and isinstance(parent.slice, ast.Constant):
+            keys.add(parent.slice.value)
+            continue
+        call = parents.get(parent)
+        if (
+            isinstance(parent, ast.Attribute)
+            and parent.attr == "get"
+            and isinstance(call, ast.Call)
+            and call.args
+            and isinstance(call.args[0], ast.Constant)
+        ):
+            keys.add(call.args[0].value)
+            continue
+        return None
+    return keys
+
+
+def compile_priority_logic(expression: str) -> PriorityLogic:
+    """
+    Parse and compile a priority logic expression, raises `PriorityLogicError` if it isn't a valid
+    expression or uses anything beyond the allowed syntax
+    """
+    logic = _compiled_expressions.get(expression)
+    if logic is not None:
+        return logic
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as err:
+        raise PriorityLogicError("Invalid priority logic: {}".format(err)) from err
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise PriorityLogicError(
+                "{} is not allowed in priority logic".format(type(node).__name__)
+            )
+        if isinstance(node, ast.Name) and node.id not in ALLOWED_NAMES:
+            raise PriorityLogicError("Unknown name {} in priority logic".format(node.id))
+        if isinstance(node, ast.Attribute) and node.attr not in ALLOWED_METHODS:
+            raise PriorityLogicError(
+                "Method {} is not allowed in priority logic".format(node.attr)
+            )
+        if isinstance(node, ast.Call) and not isinstance(node.func, ast.Attribute):
+            raise PriorityLogicError("Only methods can be called in priority logic")
+
+    keys = _data_keys(tree)
+    logic = PriorityLogic(
+        code=compile(tree, "<priority_logic>", "eval"),
+        uses_recipient=keys is None or RECIPIENT_KEY in keys,
+    )
+    _compiled_expressions.set(expression, logic)
+    return logic
 
 
 class PriorityGatewaySelection(ABC):
@@ -6,6 +134,12 @@ class PriorityGatewaySelection(ABC):
     priority_logic
     """
 
+    # Compiled priority logic of the current configuration, None to use the default priority
+    _PRIORITY_LOGIC: Optional[PriorityLogic] = None
+    # Gateways orders by event, for priority logic not depending on the recipient
+    _PRIORITY_ORDERS: Optional[LRUCache] = None
+    PRIORITY_ORDERS_CACHE_SIZE = 1024
+
     @classmethod
     @abstractmethod
     def get_priority_logic(cls) -> str:
@@ -23,31 +157,82 @@ class PriorityGatewaySelection(ABC):
         pass
 
     @classmethod
-    def select_gateway(cls, n_attempts: int, request_data: dict) -> str:
+    def compile_priority_logic(cls):
+        """
+        Compile the priority logic of the current configuration, to be called whenever the
+        configuration changes. Invalid priority logic is reported here and the default priority is
+        used instead.
+        """
+        cls._PRIORITY_LOGIC = None
+        # Orders computed for the previous configuration are stale
+        cls._PRIORITY_ORDERS = LRUCache(max_size=cls.PRIORITY_ORDERS_CACHE_SIZE)
+        expression = cls.get_priority_logic()
+        if not expression:
+            return
+        try:
+            cls._PRIORITY_LOGIC = compile_priority_logic(expression)
+        except PriorityLogicError as err:
+            logger.error(
+                "%s - falling back to the default priority. Priority logic - %s",
+                err,
+                expression,
+            )
+
+    @classmethod
+    def get_priority_order(cls, request_data: dict) -> List[str]:
+        """
+        Gateways in the order they are to be tried for a send request.
+        If the priority logic is set, the order is governed by the priority logic output, the
+        default priority is used otherwise (or if the priority logic fails). The order is computed
+        once per event if the priority logic doesn't depend on the recipient.
+        """
+        logic = cls._PRIORITY_LOGIC
+        if logic is None:
+            return cls.get_default_priority()
+        if logic.uses_recipient:
+            return cls._evaluate_priority_logic(logic, request_data)
+
+        event = tuple(value for key, value in request_data.items() if key != RECIPIENT_KEY)
+        try:
+            priority_order = cls._PRIORITY_ORDERS.get(event)
+        except TypeError:
+            # Unhashable event data, not worth caching
+            return cls._evaluate_priority_logic(logic, request_data)
+        if priority_order is None:
+            priority_order = cls._evaluate_priority_logic(logic, request_data)
+            cls._PRIORITY_ORDERS.set(event, priority_order)
+        return priority_order
+
+    @classmethod
+    def _evaluate_priority_logic(cls, logic: PriorityLogic, request_data: dict) -> List[str]:
+        try:
+            # The priority logic only has access to the request `data`
+            return eval(logic.code, {"__builtins__": {}}, {"data": request_data})
+        except Exception as err:
+            logger.error("Priority logic failed, using the default priority: %s", err)
+            return cls.get_default_priority()
+
+    @classmethod
+    def select_gateway(
+        cls,
+        n_attempts: int,
+        request_data: dict = None,
+        priority_order: List[str] = None,
+    ) -> str:
         """
         Gateway selection for the current send request
         The logic makes use of below attributes to decide the gateway -
-            1) priority logic for the channel
+            1) priority order of the request (see `get_priority_order`), computed from
+               `request_data` unless already known
             2) default priority for the channel
             3) n_attempts - no of attempt for this request
 
-        * This will be extended to use the gateways current health and other relevant parameters
-        to decide the gateway in the future releases.
+        * The gateways whose circuit is open (see `GatewayHealth`) are skipped by the handler.
         * Current Logic -
-            - If the priority logic is set, the gateways order is governed by the priority logic output
             - the (n_attempts)th gateway from the priority order is returned for the current request
 
         """
-        priority_logic_expression = cls.get_priority_logic()
-        current_priority = cls.get_default_priority()
-        if priority_logic_expression:
-            # execute the priority logic to get the priority order of gateways
-            try:
-                # Never delete the 'data' declaration below. It is used in the eval statement.
-                data = request_data
-                current_priority = eval(priority_logic_expression)
-            except Exception:
-                # Log the exception and fallback to default priority order
-                pass
-        total_gateways = min(len(cls.get_default_priority()), len(current_priority))
-        return current_priority[n_attempts % total_gateways]
+        if priority_order is None:
+            priority_order = cls.get_priority_order(request_data)
+        total_gateways = min(len(cls.get_default_priority()), len(priority_order))
+        return priority_order[n_attempts % total_gateways]
@@ -0,0 +1,70 @@
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger()
+
+
+class HedgingPolicy:
+    """
+    Hedged sends of a channel - when the primary gateway hasn't responded within its observed
+    `PERCENTILE` latency, the next gateway is tried in parallel and the first success is taken.
+
+    The losing send is cancelled, but only locally - the gateway may have accepted it already, so
+    a hedged notification can be delivered twice. Hedging is hence opted in per channel, only for
+    the channels whose config states `DUPLICATES_SAFE` (e.g. an OTP sent twice with the same code),
+    for all their sends or only the ones of some event types. The hedged traffic of a channel is
+    capped with a budget - every send earns `MAX_RATIO` of a hedge, up to `BURST` hedges, and every
+    hedge spends one.
+    """
+
+    ENABLED = False
+    PERCENTILE = 0.95
+    # Config by channel,
+    # {"DUPLICATES_SAFE": ..., "EVENT_TYPES": [...], "MAX_RATIO": ..., "BURST": ...}
+    CHANNELS: Dict[str, Dict] = {}
+
+    @classmethod
+    def initialize(cls, config: Dict):
+        cls.ENABLED = config.get("ENABLED", False)
+        cls.PERCENTILE = config.get("PERCENTILE", cls.PERCENTILE)
+        cls.CHANNELS = config.get("CHANNELS", {})
+
+    @classmethod
+    def for_channel(cls, channel: str) -> Optional["HedgingPolicy"]:
+        """
+        Hedging policy of a channel, None if its sends are never hedged
+        """
+        config = cls.CHANNELS.get(channel)
+        if not cls.ENABLED or config is None:
+            return None
+        if not config.get("DUPLICATES_SAFE", False):
+            logger.warning(
+                "Not hedging %s sends, the channel isn't marked safe for duplicates", channel
+            )
+            return None
+        return cls(
+            event_types=config.get("EVENT_TYPES"),
+            max_ratio=config.get("MAX_RATIO", 0.1),
+            burst=config.get("BURST", 10),
+        )
+
+    def __init__(self, event_types=None, max_ratio: float = 0.1, burst: float = 10):
+        # All the event types if None
+        self.event_types = set(event_types) if event_types else None
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.budget = burst
+        self.hedged = 0
+
+    def applies(self, event_type: Optional[str]) -> bool:
+        return self.event_types is None or event_type in self.event_types
+
+    def record_send(self):
+        self.budget = min(self.burst, self.budget + self.max_ratio)
+
+    def can_hedge(self) -> bool:
+        return self.budget >= 1
+
+    def hedge(self):
+        self.budget -= 1
+        self.hedged += 1
@@ -6,6 +6,8 @@ from app.commons import http
 class Notifier(ABC):
 
     __provider__ = "Provider"
+    # Fields (dotted paths) of the response metadata kept in compacted status updates, all if None
+    __metadata_fields__ = None
 
     @abstractmethod
     async def send_notification(self, to: str, message: str, **kwargs) -> http.Response:
@@ -16,6 +16,18 @@ class APNSHandler(Notifier, HTTP20Client):
     HOST = "https://api.push.apple.com"
     ENDPOINT = "3/device/{token}"
 
+    # Reasons of the error responses - the device token isn't valid (or not anymore)
+    RECIPIENT_ERRORS = {"BadDeviceToken", "Unregistered", "DeviceTokenNotForTopic"}
+    # The certificate or the topic of the gateway is wrong
+    CONFIG_ERRORS = {
+        "BadCertificate",
+        "BadCertificateEnvironment",
+        "BadTopic",
+        "MissingTopic",
+        "TopicDisallowed",
+        "Forbidden",
+    }
+
     def __init__(self, config: Dict) -> None:
         self.CERT = config.get("CERT", "")
         self.PRIVATE_KEY = config.get("PRIVATE_KEY", "")
@@ -46,12 +58,27 @@ class APNSHandler(Notifier, HTTP20Client):
                 "data": {"data": await response.json()},
             }
         else:
+            error = await response.json()
             response = {
                 "status_code": HTTPStatusCodes.BAD_REQUEST.value,
-                "error": {"error": await response.json()},
+                "error": {"error": error},
+                "error_type": APNSHandler._error_type(response.status, error),
+                "retry_after": http.retry_after(response.headers),
             }
         return http.Response(**response)
 
+    @classmethod
+    def _error_type(cls, status: int, error: Dict):
+        """
+        Kind of a failed push, by the documented `reason` of the APNs error response
+        """
+        reason = error.get("reason") if isinstance(error, dict) else None
+        if reason in cls.RECIPIENT_ERRORS:
+            return http.ErrorType.PERMANENT_RECIPIENT.value
+        if reason in cls.CONFIG_ERRORS:
+            return http.ErrorType.PERMANENT_CONFIG.value
+        return http.error_type_of(status)
+
     async def push_notification(
         self, to: str, notification: push.Notification, **kwargs
     ):
@@ -66,6 +93,7 @@ class APNSHandler(Notifier, HTTP20Client):
             return http.Response(
                 status_code=HTTPStatusCodes.BAD_REQUEST.value,
                 error={"error": f"Encountered error while sending email {str(err)}"},
+                error_type=http.exception_error_type(err),
             )
 
     async def send_notification(self, to: str, message: str, **kwargs):
@@ -8,12 +8,14 @@ from app.constants import HTTPStatusCodes
 from app.constants.channel_gateways import PushGateways
 from app.service_clients.api_handler import APIClient
 from app.services.handlers.notifier import Notifier
+from app.utils import json_loads
 
 logger = logging.getLogger()
 
 
 class FCMHandler(Notifier, APIClient):
     __provider__ = PushGateways.FCM.value
+    __metadata_fields__ = ["multicast_id", "success", "failure", "canonical_ids"]
 
     HOST = "https://fcm.googleapis.com"
     ENDPOINT = "fcm/send"
@@ -48,7 +50,7 @@ class FCMHandler(Notifier, APIClient):
     async def format_response(response):
         content = ""
         try:
-            content = await response.json()
+            content = await response.json(loads=json_loads)
             event_id = content.get("multicast_id")
         except ContentTypeError:
             content = await response.text()
@@ -66,6 +68,8 @@ class FCMHandler(Notifier, APIClient):
                 "status_code": HTTPStatusCodes.BAD_REQUEST.value,
                 "error": {"error": content},
                 "meta": content,
+                "error_type": http.error_type_of(response.status),
+                "retry_after": http.retry_after(response.headers),
             }
         return http.Response(**response)
 
@@ -85,6 +89,7 @@ class FCMHandler(Notifier, APIClient):
                 error={
                     "error": f"Encountered error while sending push noitifcation {str(err)}"
                 },
+                error_type=http.exception_error_type(err),
             )
 
     async def send_notification(self, to: List[str], message: str, **kwargs):
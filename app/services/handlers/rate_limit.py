@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+
+from app.commons.resp import RedisConnection
+from app.services.handlers.rate_limit_store import RedisBucketStore
+
+logger = logging.getLogger()
+
+
+class RateLimiter(ABC):
+    """
+    Send rate limit of a gateway (a provider instance), configured by the `rate_limit` of its
+    channel partner configuration - {"tps": sends per second, "burst": sends allowed at once}.
+    Senders wait for at most `MAX_WAIT` seconds for their turn.
+
+    With the LOCAL `BACKEND`, every handler process enforces the limit on its own. With the REDIS
+    backend, the limit is shared by all the handler processes and deployments (by the `key` of the
+    `rate_limit`, the unique identifier of the gateway by default). While Redis is unavailable,
+    every process falls back to `FALLBACK_SHARE` of the limit.
+    """
+
+    LOCAL = "LOCAL"
+    REDIS = "REDIS"
+
+    ENABLED = False
+    MAX_WAIT = 0.5
+    BACKEND = LOCAL
+    # Tokens taken at once from the shared bucket
+    LEASE_SIZE = 5
+    # Seconds during which the local limit is used after the shared bucket failed
+    REDIS_RETRY_INTERVAL = 5
+    # Share of the limit enforced locally by every process while the shared bucket fails, about
+    # 1 / the number of handler processes
+    FALLBACK_SHARE = 0.25
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = max(1, burst or rate)
+
+    @classmethod
+    def initialize(cls, config: Dict):
+        cls.ENABLED = config.get("ENABLED", False)
+        cls.MAX_WAIT = config.get("MAX_WAIT", cls.MAX_WAIT)
+        cls.BACKEND = config.get("BACKEND", cls.LOCAL)
+        cls.LEASE_SIZE = config.get("LEASE_SIZE", cls.LEASE_SIZE)
+        cls.REDIS_RETRY_INTERVAL = config.get("REDIS_RETRY_INTERVAL", cls.REDIS_RETRY_INTERVAL)
+        cls.FALLBACK_SHARE = config.get("FALLBACK_SHARE", cls.FALLBACK_SHARE)
+        if cls.ENABLED and cls.BACKEND == cls.REDIS:
+            # A lease is taken while a send waits for its turn
+            RedisBucketStore.initialize(RedisConnection(config["REDIS_URL"], cls.MAX_WAIT))
+
+    @classmethod
+    def for_gateway(
+        cls, gateway_config: Dict, existing: Optional["RateLimiter"] = None
+    ) -> Optional["RateLimiter"]:
+        """
+        Rate limiter of a gateway, None if it isn't limited. The `existing` limiter is kept if
+        the limit didn't change.
+        """
+        rate_limit = gateway_config.get("rate_limit") or {}
+        rate, burst = rate_limit.get("tps"), rate_limit.get("burst")
+        if not cls.ENABLED or not rate:
+            return None
+        limit = (rate, max(1, burst or rate))
+        if cls.BACKEND == cls.REDIS:
+            key = rate_limit.get("key") or gateway_config["unique_identifier"]
+            shared = isinstance(existing, RedisTokenBucket) and existing.key == key
+            if shared and (existing.rate, existing.burst) == limit:
+                return existing
+            return RedisTokenBucket(
+                key, rate, burst, RedisBucketStore, cls.LEASE_SIZE, cls.FALLBACK_SHARE
+            )
+        if isinstance(existing, TokenBucket) and (existing.rate, existing.burst) == limit:
+            return existing
+        return TokenBucket(rate, burst)
+
+    @abstractmethod
+    async def acquire(self, max_wait: float) -> bool:
+        """
+        Take a send slot, waiting for at most `max_wait` seconds. Returns False, without
+        waiting, if no slot would be available in time
+        """
+
+    @abstractmethod
+    def delay(self) -> float:
+        """
+        Seconds a send started now would wait for its slot
+        """
+
+
+class TokenBucket(RateLimiter):
+    """
+    In-process token bucket. Waiting senders reserve their token upfront (the bucket goes
+    negative), so that they are served in order.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(rate, burst)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self._updated_at = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def delay(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    async def acquire(self, max_wait: float) -> bool:
+        wait = self.delay()
+        if wait > max_wait:
+            return False
+        self.tokens -= 1
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.tokens += 1
+                raise
+        return True
+
+
+class RedisTokenBucket(RateLimiter):
+    """
+    Token bucket shared through Redis. Tokens are leased from the shared bucket `lease_size` at a
+    time, so that most sends don't wait for a Redis round trip. While the shared bucket fails
+    (e.g. Redis is unavailable), a local token bucket of `fallback_share` of the limit is used
+    instead, so that the processes together stay around the limit.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        rate: float,
+        burst: Optional[float],
+        store,
+        lease_size: int = 5,
+        fallback_share: float = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(rate, burst)
+        self.key = key
+        self.store = store
+        self.lease_size = max(1, min(lease_size, int(self.burst)))
+        self.clock = clock
+        self.fallback = TokenBucket(rate * fallback_share, self.burst * fallback_share, clock)
+        # Tokens leased and not used yet
+        self.leased = 0
+        self._empty_until = 0.0
+        self._failed_at: Optional[float] = None
+        self._leasing = asyncio.Lock()
+
+    def _use_fallback(self) -> bool:
+        return (
+            self._failed_at is not None
+            and self.clock() - self._failed_at < RateLimiter.REDIS_RETRY_INTERVAL
+        )
+
+    def delay(self) -> float:
+        if self._use_fallback():
+            return self.fallback.delay()
+        if self.leased >= 1:
+            return 0.0
+        return max(0.0, self._empty_until - self.clock())
+
+    async def acquire(self, max_wait: float) -> bool:
+        deadline = self.clock() + max_wait
+        while True:
+            if self._use_fallback():
+                return await self.fallback.acquire(max(0.0, deadline - self.clock()))
+            if self.leased < 1:
+                async with self._leasing:
+                    # Another sender may have leased tokens in the meantime
+                    if self.leased < 1:
+                        await self._lease()
+            if self.leased >= 1:
+                self.leased -= 1
+                return True
+            if self._use_fallback():
+                continue
+            # The shared bucket is empty, the next token is due in 1 / rate seconds
+            wait = 1 / self.rate
+            if self.clock() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    async def _lease(self):
+        try:
+            granted = await self.store.lease(self.key, self.rate, self.burst, self.lease_size)
+        except Exception as err:
+            logger.error(
+                "Couldn't lease rate limit tokens of %s, using the local limit: %s", self.key, err
+            )
+            self._failed_at = self.clock()
+            return
+        self._failed_at = None
+        self.leased += granted
+        if not granted:
+            self._empty_until = self.clock() + 1 / self.rate
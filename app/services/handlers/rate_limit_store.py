@@ -0,0 +1,48 @@
+from app.commons.resp import RedisConnection
+
+# Token bucket of a gateway, shared by all the handler processes - refills the bucket from the
+# time elapsed since the last lease (by the Redis clock, so that the handlers' clocks don't matter)
+# and grants up to the requested number of tokens, atomically
+LEASE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local granted = math.min(requested, math.floor(tokens))
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - granted), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return granted
+"""
+
+
+
+
+class RedisBucketStore:
+    """
+    Token buckets of the gateways in Redis, leased with a Lua script
+    """
+
+    _key_prefix = "gateway_rate_limit"
+    _connection: RedisConnection = None
+
+    @classmethod
+    def initialize(cls, connection: RedisConnection):
+        cls._connection = connection
+
+    @classmethod
+    async def lease(cls, key: str, rate: float, burst: float, count: int) -> int:
+        """
+        Take up to `count` tokens from the bucket of a gateway, returns the number of tokens granted
+        """
+        if cls._connection is None:
+            raise RuntimeError("Gateway rate limit store is not initialized")
+        # Redis caches the compiled script, only its text is sent again
+        granted = await cls._connection.execute(
+            "EVAL", LEASE_SCRIPT, 1, "{}:{}".format(cls._key_prefix, key), rate, burst, count
+        )
+        return int(granted)
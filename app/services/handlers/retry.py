@@ -0,0 +1,50 @@
+import random
+from typing import Dict, Optional
+
+from app.commons import deadline
+from app.commons.http import ErrorType, Response
+
+
+class RetryPolicy:
+    """
+    Retries of a failed send through the same gateway, before failing over to the next one.
+
+    Transient failures are retried up to `MAX_RETRIES` times with a jittered exponential backoff
+    (`BACKOFF` seconds doubled on every retry, at most `MAX_BACKOFF`). Throttled sends are retried
+    after the wait the gateway asks for (or the backoff), unless it is longer than
+    `MAX_THROTTLE_WAIT`. Nothing is retried past the notification deadline.
+    """
+
+    MAX_RETRIES = 1
+    BACKOFF = 0.2
+    MAX_BACKOFF = 2
+    MAX_THROTTLE_WAIT = 1
+
+    @classmethod
+    def initialize(cls, config: Dict):
+        cls.MAX_RETRIES = config.get("MAX_RETRIES", cls.MAX_RETRIES)
+        cls.BACKOFF = config.get("BACKOFF", cls.BACKOFF)
+        cls.MAX_BACKOFF = config.get("MAX_BACKOFF", cls.MAX_BACKOFF)
+        cls.MAX_THROTTLE_WAIT = config.get("MAX_THROTTLE_WAIT", cls.MAX_THROTTLE_WAIT)
+
+    @classmethod
+    def delay(cls, response: Response, retries: int) -> Optional[float]:
+        """
+        Seconds to wait before sending again through the same gateway after `retries` retries,
+        None to move on
+        """
+        if retries >= cls.MAX_RETRIES:
+            return None
+        backoff = random.uniform(0, min(cls.MAX_BACKOFF, cls.BACKOFF * 2 ** retries))
+        if response.error_type == ErrorType.TRANSIENT.value:
+            delay = backoff
+        elif response.error_type == ErrorType.THROTTLED.value:
+            delay = response.retry_after if response.retry_after is not None else backoff
+            if delay > cls.MAX_THROTTLE_WAIT:
+                return None
+        else:
+            return None
+        left = deadline.remaining()
+        if left is not None and delay >= left:
+            return None
+        return delay
@@ -2,7 +2,7 @@ from typing import Any, Dict
 
 from aiohttp import BasicAuth
 
-from app.commons.http import Response
+from app.commons.http import Response, error_type_of, exception_error_type
 from app.commons.logging import LogRecord
 from app.constants.channel_gateways import SmsGateways
 from app.constants.constants import HTTPStatusCodes
@@ -10,10 +10,19 @@ from app.service_clients.api_handler import APIClient
 from app.service_clients.callback_handler import (CallbackHandler,
                                                   CallbackLogger)
 from app.services.handlers.notifier import Notifier
+from app.utils import json_loads
 
 
 class PlivoHandler(Notifier, APIClient, CallbackHandler):
     __provider__ = SmsGateways.PLIVO.value
+    __metadata_fields__ = [
+        "api_id",
+        "message_uuid",
+        "error",
+        "body.MessageUUID",
+        "body.Status",
+        "body.ErrorCode",
+    ]
 
     CALL_STATUS = {
         "ringing": 1,
@@ -80,7 +89,7 @@ class PlivoHandler(Notifier, APIClient, CallbackHandler):
 
         try:
             response = await self.request(method="POST", path=url, data=values)
-            result = await response.json()
+            result = await response.json(loads=json_loads)
             if str(response.status).startswith("20"):
                 response.job_id = self.extract_job_id(result)
                 if response.job_id is not None:
@@ -94,12 +103,14 @@ class PlivoHandler(Notifier, APIClient, CallbackHandler):
                 status_code=HTTPStatusCodes.BAD_REQUEST.value,
                 error={"error": result},
                 meta=result,
+                error_type=error_type_of(response.status),
             )
         except Exception as err:
             return Response(
                 status_code=HTTPStatusCodes.BAD_REQUEST.value,
                 error={"error": str(err)},
                 meta=str(err),
+                error_type=exception_error_type(err),
             )
 
     @staticmethod
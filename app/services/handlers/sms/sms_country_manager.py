@@ -2,7 +2,7 @@ import logging
 import re
 from typing import Any, Dict
 
-from app.commons.http import Response
+from app.commons.http import Response, error_type_of, exception_error_type
 from app.commons.logging import LogRecord
 from app.constants.channel_gateways import SmsGateways
 from app.constants.constants import HTTPStatusCodes, SMSSenderConstant
@@ -16,6 +16,7 @@ logger = logging.getLogger()
 
 class SMSCountryHandler(Notifier, APIClient, CallbackHandler):
     __provider__ = SmsGateways.SMS_COUNTRY.value
+    __metadata_fields__ = ["args.jobno", "args.status"]
 
     def __init__(self, config: Dict[str, Any]):
         self.config = config
@@ -44,6 +45,7 @@ class SMSCountryHandler(Notifier, APIClient, CallbackHandler):
                 status_code=HTTPStatusCodes.BAD_REQUEST.value,
                 error={"error": result},
                 meta=result,
+                error_type=error_type_of(response.status),
             )
         except Exception as err:
             logger.error(
@@ -53,6 +55,7 @@ class SMSCountryHandler(Notifier, APIClient, CallbackHandler):
                 status_code=HTTPStatusCodes.BAD_REQUEST.value,
                 error={"error": str(err)},
                 meta=str(err),
+                error_type=exception_error_type(err),
             )
 
     def get_otp_channel_values(self, to, body):
@@ -1,4 +1,5 @@
-from app.commons.http import Response
+from app.commons.aws import aws_error_type
+from app.commons.http import Response, error_type_of
 from app.constants.channel_gateways import SmsGateways
 from app.constants.constants import HTTPStatusCodes
 from app.service_clients.aws_sns_manager import AWSSNSManager
@@ -8,6 +9,11 @@ from app.services.handlers.notifier import Notifier
 class SnsHandler(Notifier):
 
     __provider__ = SmsGateways.AWS_SNS.value
+    __metadata_fields__ = [
+        "MessageId",
+        "ResponseMetadata.RequestId",
+        "ResponseMetadata.HTTPStatusCode",
+    ]
 
     def __init__(self, config):
         self._config = config
@@ -57,7 +63,15 @@ class SnsHandler(Notifier):
                         status_code=HTTPStatusCodes.BAD_REQUEST.value,
                         error={"error": response},
                     )
+            status_code = (response or {}).get("ResponseMetadata", {}).get("HTTPStatusCode")
+            return Response(
+                status_code=HTTPStatusCodes.BAD_REQUEST.value,
+                error={"error": response or "No response from SNS"},
+                error_type=error_type_of(status_code) if status_code else None,
+            )
         except Exception as e:
             return Response(
-                status_code=HTTPStatusCodes.BAD_REQUEST.value, error={"error": e}
+                status_code=HTTPStatusCodes.BAD_REQUEST.value,
+                error={"error": e},
+                error_type=aws_error_type(e),
             )
@@ -1,4 +1,3 @@
-import json
 import logging
 from typing import Any, Dict
 
@@ -10,12 +9,14 @@ from app.service_clients.api_handler import APIClient
 from app.service_clients.callback_handler import (CallbackHandler,
                                                   CallbackLogger)
 from app.services.handlers.notifier import Notifier
+from app.utils import json_loads
 
 logger = logging.getLogger()
 
 
 class InteraktHandler(Notifier, APIClient, CallbackHandler):
     __provider__ = WhatsAppGateways.INTERAKT.value
+    __metadata_fields__ = ["id", "result", "status_code", "message"]
 
     def __init__(self, config):
         self._config = config
@@ -117,13 +118,14 @@ class InteraktHandler(Notifier, APIClient, CallbackHandler):
             )
             response_status = response.status
             response_text = await response.text()
-            response = json.loads(response_text)
+            response = json_loads(response_text)
             response.update({"status_code": response_status})
             if not str(response_status).startswith("20"):
                 return http.Response(
                     status_code=HTTPStatusCodes.BAD_REQUEST.value,
                     error={"error": response},
                     meta=response,
+                    error_type=http.error_type_of(response_status),
                 )
             return http.Response(
                 status_code=HTTPStatusCodes.SUCCESS.value,
@@ -138,6 +140,7 @@ class InteraktHandler(Notifier, APIClient, CallbackHandler):
             return http.Response(
                 status_code=HTTPStatusCodes.BAD_REQUEST.value,
                 error={"error": str(err)},
+                error_type=http.exception_error_type(err),
             )
 
     @staticmethod
@@ -1,7 +1,8 @@
-import json
 import logging
 from typing import Any, Dict, List, Optional
 
+from app.commons import json_codec
+
 logger = logging.getLogger()
 
 
@@ -32,8 +33,8 @@ def get_value_by_priority(
 
 
 def json_dumps(json_obj: dict):
-    return json.dumps(json_obj)
+    return json_codec.dumps(json_obj)
 
 
 def json_loads(json_str: str):
-    return json.loads(json_str)
+    return json_codec.loads(json_str)
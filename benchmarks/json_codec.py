@@ -0,0 +1,87 @@
+"""
+Microbenchmark of the JSON codec backends on the payload shapes of the service.
+
+Usage - python -m benchmarks.json_codec [number of iterations]
+"""
+import sys
+import timeit
+
+from app.commons import json_codec
+
+SMS_EVENT = {
+    "to": "7827XXXXXX",
+    "message": "123456 is your OTP to login. Do not share it with anyone.",
+    "notification_log_id": "121212",
+    "event_id": 111,
+    "event_name": "otp_login",
+    "app_name": "test_app",
+    "event_type": "otp",
+    "channel": "otp",
+}
+
+EMAIL_EVENT = {
+    "to": ["user@example.com"],
+    "cc": ["cc@example.com"],
+    "bcc": [],
+    "message": "<html><body>" + "<p>Your order has been shipped.</p>" * 50 + "</body></html>",
+    "subject": "Your order has been shipped",
+    "sender": {
+        "name": "Test App",
+        "address": "noreply@example.com",
+        "reply_to": "support@example.com",
+    },
+    "files": [
+        {"url": "https://bucket.s3.amazonaws.com/invoice.pdf?X-Amz-Signature=abc", "filename": "invoice.pdf"}
+    ],
+    "notification_log_id": "121213",
+    "event_id": 112,
+    "event_name": "order_shipped",
+    "app_name": "test_app",
+}
+
+STATUS_UPDATE = {
+    "sent_at": "October 18, 2026 10:00:00",
+    "notification_log_id": "121212",
+    "status": "SUCCESS",
+    "message": {"data": {"message_uuid": ["a1b2c3d4-e5f6-11ed-a1b2-0242ac120002"], "api_id": "x"}},
+    "operator": "PLIVO",
+    "operator_event_id": "a1b2c3d4-e5f6-11ed-a1b2-0242ac120002",
+    "metadata": {"message_uuid": ["a1b2c3d4-e5f6-11ed-a1b2-0242ac120002"], "api_id": "x"},
+    "sent_to": "7827XXXXXX",
+    "attempt_number": 0,
+    "channel": "sms",
+}
+
+FCM_RESULT = {
+    "multicast_id": 216,
+    "success": 450,
+    "failure": 50,
+    "canonical_ids": 0,
+    "results": [{"message_id": "0:1366%s" % i} for i in range(450)]
+    + [{"error": "NotRegistered"} for _ in range(50)],
+}
+
+PAYLOADS = {
+    "sms_event": SMS_EVENT,
+    "email_event": EMAIL_EVENT,
+    "status_update": STATUS_UPDATE,
+    "fcm_result": FCM_RESULT,
+}
+
+
+def run(number: int):
+    print("%-8s %-14s %12s %12s" % ("backend", "payload", "dumps (us)", "loads (us)"))
+    for backend in json_codec.available_backends():
+        json_codec.set_backend(backend)
+        for name, payload in PAYLOADS.items():
+            encoded = json_codec.dumps(payload)
+            dumps = timeit.timeit(lambda: json_codec.dumps(payload), number=number)
+            loads = timeit.timeit(lambda: json_codec.loads(encoded), number=number)
+            print(
+                "%-8s %-14s %12.2f %12.2f"
+                % (backend, name, dumps / number * 1e6, loads / number * 1e6)
+            )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
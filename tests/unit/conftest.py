@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from app.pubsub.sqs.model import Response
+
+
+class Clock:
+    """
+    Time standing still until `now` is set - callable as a clock, or standing in for the time
+    module
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeSQSClient:
+    """
+    In-memory queue - receives hand out the queued bodies, deletes and visibility changes are
+    recorded. Receipt handles in `failed` fail in their batch, and deletes raise while SQS is
+    `unavailable`
+    """
+
+    def __init__(self):
+        self.queue = []
+        self.failed = set()
+        self.unavailable = False
+        # Receipt handles deleted in batches, deleted individually, and deleted either way
+        self.batches = []
+        self.deleted = []
+        self.acked = []
+        # Visibility timeouts set, by receipt handle, in each batch, and the messages released
+        self.changes = []
+        self.released = []
+
+    async def fetch_messages(self, max_no_of_messages, wait_time_seconds, visibility_timeout):
+        if not self.queue:
+            await asyncio.sleep(0.01)
+            return Response({})
+        bodies = self.queue[:max_no_of_messages]
+        self.queue = self.queue[max_no_of_messages:]
+        return Response(
+            {
+                "Messages": [
+                    {"Body": body, "ReceiptHandle": "rh-" + body, "MessageId": body}
+                    for body in bodies
+                ]
+            }
+        )
+
+    async def ack_messages(self, entries):
+        if self.unavailable:
+            raise ConnectionError("SQS is unreachable")
+        self.batches.append([entry["ReceiptHandle"] for entry in entries])
+        self.acked.extend(
+            entry["ReceiptHandle"] for entry in entries if entry["ReceiptHandle"] not in self.failed
+        )
+        return self._failed(entries)
+
+    async def ack_message(self, receipt_handle):
+        self.deleted.append(receipt_handle)
+        self.acked.append(receipt_handle)
+
+    async def change_visibility(self, entries):
+        self.changes.append(
+            {entry["ReceiptHandle"]: entry["VisibilityTimeout"] for entry in entries}
+        )
+        self.released.extend(
+            entry["ReceiptHandle"] for entry in entries if entry["VisibilityTimeout"] == 0
+        )
+        return self._failed(entries)
+
+    def _failed(self, entries):
+        return {
+            "Failed": [
+                {"Id": entry["Id"], "SenderFault": False}
+                for entry in entries
+                if entry["ReceiptHandle"] in self.failed
+            ]
+        }
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def sqs_client():
+    return FakeSQSClient()
@@ -0,0 +1,198 @@
+import asyncio
+
+from app.commons.http import ErrorType, Response
+from app.commons.logging.types import LogRecord
+from app.services.handlers.abstract_handler import AbstractHandler
+from app.services.handlers.dedup import NotificationDeduplicator
+from app.services.handlers.hedging import HedgingPolicy
+from app.services.handlers.notifier import Notifier
+from app.services.handlers.retry import RetryPolicy
+
+OK = "OK"
+
+
+class FakeGateway(Notifier):
+    """
+    Answers with its scripted outcomes in turn (the last one repeated), after `delay` seconds
+    """
+
+    def __init__(self, config):
+        self.name = config["name"]
+        self.outcomes = list(config["outcomes"])
+        self.delay = config.get("delay", 0)
+        self.calls = 0
+        self.completed = 0
+
+    async def send_notification(self, to, message, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        self.completed += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if outcome == OK:
+            return Response(status_code=200, data={"data": "sent"}, event_id=self.name)
+        return Response(status_code=400, error={"error": "failed"}, error_type=outcome)
+
+
+class StatusLog:
+    def __init__(self):
+        self.records = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def log(self, log_info, extras):
+        self.records.append(extras)
+
+
+def make_handler(gateways, hedging=None):
+    """
+    Handler of fake gateways, tried in the given order - {name: {"outcomes": [...], ...}}, with
+    the HEDGING config `hedging`
+    """
+
+    HedgingPolicy.initialize(hedging or {})
+
+    class Handler(AbstractHandler):
+        CHANNEL = "sms"
+
+        @classmethod
+        def gateways_class_mapping(cls):
+            return {"FAKE": FakeGateway}
+
+    Handler.initialize(StatusLog())
+    Handler.update_configuration(
+        {
+            "default_priority": list(gateways),
+            "dynamic_priority": "",
+            "gateways": [
+                {
+                    "unique_identifier": name,
+                    "gateway": "FAKE",
+                    "configuration": {"name": name, **config},
+                }
+                for name, config in gateways.items()
+            ],
+        }
+    )
+    return Handler
+
+
+def calls(handler):
+    return {name: provider.calls for name, provider in handler.PROVIDERS.items()}
+
+
+def test_transient_errors_are_retried_before_failing_over():
+    RetryPolicy.initialize({"MAX_RETRIES": 1, "BACKOFF": 0.01})
+    handler = make_handler(
+        {"a": {"outcomes": [ErrorType.TRANSIENT.value]}, "b": {"outcomes": [OK]}}
+    )
+
+    provider, response = asyncio.run(handler.notify("9999999999", "Hello"))
+
+    assert (provider.name, response.status_code) == ("b", 200)
+    assert calls(handler) == {"a": 2, "b": 1}
+
+
+def test_recipient_errors_stop_the_failover():
+    RetryPolicy.initialize({"MAX_RETRIES": 1, "BACKOFF": 0.01})
+    handler = make_handler(
+        {"a": {"outcomes": [ErrorType.PERMANENT_RECIPIENT.value]}, "b": {"outcomes": [OK]}}
+    )
+
+    provider, response = asyncio.run(handler.notify("9999999999", "Hello"))
+
+    assert response.error_type == ErrorType.PERMANENT_RECIPIENT.value
+    assert calls(handler) == {"a": 1, "b": 0}
+    # The gateway itself is fine
+    assert handler.GATEWAYS_HEALTH["a"].consecutive_failures == 0
+
+
+def test_config_errors_fail_over_without_retry():
+    RetryPolicy.initialize({"MAX_RETRIES": 1, "BACKOFF": 0.01})
+    handler = make_handler(
+        {"a": {"outcomes": [ErrorType.PERMANENT_CONFIG.value]}, "b": {"outcomes": [OK]}}
+    )
+
+    provider, response = asyncio.run(handler.notify("9999999999", "Hello"))
+
+    assert (provider.name, response.status_code) == ("b", 200)
+    assert calls(handler) == {"a": 1, "b": 1}
+
+
+def test_already_sent_notifications_are_skipped():
+    NotificationDeduplicator.initialize({"ENABLED": True})
+    handler = make_handler({"a": {"outcomes": [OK]}, "b": {"outcomes": [OK]}})
+
+    async def scenario():
+        first = await handler.notify("9999999999", "Hello", log_info=LogRecord(log_id="42"))
+        # Redelivered by SQS
+        second = await handler.notify("9999999999", "Hello", log_info=LogRecord(log_id="42"))
+        return first, second
+
+    (_, sent), (provider, response) = asyncio.run(scenario())
+
+    assert calls(handler) == {"a": 1, "b": 0}
+    assert (provider.name, response.status_code) == ("a", 200)
+    assert response.event_id == sent.event_id == "a"
+
+
+def test_gateways_removed_from_the_configuration_are_not_reused():
+    NotificationDeduplicator.initialize({"ENABLED": True})
+    asyncio.run(NotificationDeduplicator.mark_sent("43", "removed", "event"))
+    handler = make_handler({"a": {"outcomes": [OK]}})
+
+    provider, response = asyncio.run(
+        handler.notify("9999999999", "Hello", log_info=LogRecord(log_id="43"))
+    )
+
+    # Sent again, through a configured gateway
+    assert calls(handler) == {"a": 1}
+    assert (provider.name, response.event_id) == ("a", "a")
+
+
+def make_hedged_handler(primary_delay, secondary_delay):
+    """
+    Handler hedging its sends through "a" with "b" after 0.05 seconds, the usual latency of "a"
+    """
+    handler = make_handler(
+        {
+            "a": {"outcomes": [OK], "delay": primary_delay},
+            "b": {"outcomes": [OK], "delay": secondary_delay},
+        },
+        hedging={"ENABLED": True, "CHANNELS": {"sms": {"DUPLICATES_SAFE": True}}},
+    )
+    for _ in range(20):
+        handler.GATEWAYS_HEALTH["a"].record(True, 0.05)
+    return handler
+
+
+def test_sends_are_hedged_only_past_the_usual_latency():
+    handler = make_hedged_handler(primary_delay=0.01, secondary_delay=0)
+
+    provider, response = asyncio.run(handler.notify("9999999999", "Hello"))
+
+    assert (provider.name, response.status_code) == ("a", 200)
+    assert calls(handler) == {"a": 1, "b": 0}
+
+
+def test_first_successful_hedged_send_wins_and_the_other_is_cancelled():
+    handler = make_hedged_handler(primary_delay=0.3, secondary_delay=0.05)
+
+    async def scenario():
+        send = asyncio.ensure_future(handler.notify("9999999999", "Hello"))
+        await asyncio.sleep(0.03)
+        # Still within the usual latency of "a"
+        assert calls(handler) == {"a": 1, "b": 0}
+
+        provider, response = await send
+        await asyncio.sleep(0.35)
+        return provider, response
+
+    provider, response = asyncio.run(scenario())
+
+    assert (provider.name, response.event_id) == ("b", "b")
+    assert calls(handler) == {"a": 1, "b": 1}
+    assert handler.PROVIDERS["a"].completed == 0
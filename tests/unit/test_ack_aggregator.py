@@ -0,0 +1,46 @@
+import asyncio
+
+from app.pubsub.sqs.acks import AckAggregator
+
+
+def test_acks_are_flushed_once_a_batch_is_full(sqs_client):
+    async def scenario():
+        acks = AckAggregator(sqs_client, batch_size=3, flush_interval=60)
+        for index in range(7):
+            await acks.ack(str(index))
+        assert sqs_client.batches == [["0", "1", "2"], ["3", "4", "5"]]
+
+        await acks.stop()
+        assert sqs_client.batches[-1] == ["6"]
+
+    asyncio.run(scenario())
+
+
+def test_acks_are_flushed_periodically(sqs_client):
+    async def scenario():
+        acks = AckAggregator(sqs_client, batch_size=10, flush_interval=0.05)
+        acks.start()
+        await acks.ack("a")
+        assert sqs_client.batches == []
+
+        await asyncio.sleep(0.1)
+        assert sqs_client.batches == [["a"]]
+        await acks.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failed_entries_are_deleted_individually(sqs_client):
+    async def scenario():
+        sqs_client.failed.add("b")
+        acks = AckAggregator(sqs_client, batch_size=3, flush_interval=60)
+        for receipt_handle in ("a", "b", "c"):
+            await acks.ack(receipt_handle)
+        assert sqs_client.deleted == ["b"]
+
+        sqs_client.unavailable = True
+        await acks.ack("d")
+        await acks.stop()
+        assert sqs_client.deleted == ["b", "d"]
+
+    asyncio.run(scenario())
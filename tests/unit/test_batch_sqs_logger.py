@@ -0,0 +1,128 @@
+import asyncio
+
+from app.commons.logging.spool import StatusSpool
+from app.commons.logging.sqs import BatchSQSLogger
+
+
+class FakeClient:
+    def __init__(self, failures=None):
+        self.batches = []
+        # Number of times each message body fails before being accepted
+        self.failures = failures or {}
+
+    async def publish_messages(self, entries):
+        self.batches.append([entry["MessageBody"] for entry in entries])
+        failed = []
+        for entry in entries:
+            if self.failures.get(entry["MessageBody"], 0):
+                self.failures[entry["MessageBody"]] -= 1
+                failed.append({"Id": entry["Id"], "SenderFault": False})
+        return {"Failed": failed}
+
+
+def test_flushes_full_batches():
+    async def scenario():
+        client = FakeClient()
+        logger = BatchSQSLogger(client, batch_size=10, flush_interval=60)
+        for index in range(25):
+            await logger.publish(str(index))
+        assert [len(batch) for batch in client.batches] == [10, 10]
+        await logger.stop()
+        assert [len(batch) for batch in client.batches] == [10, 10, 5]
+
+    asyncio.run(scenario())
+
+
+def test_batches_are_bounded_by_bytes():
+    async def scenario():
+        client = FakeClient()
+        logger = BatchSQSLogger(client, batch_size=10, flush_interval=60)
+        for index in range(3):
+            await logger.publish(str(index) * 100 * 1024)
+        await logger.stop()
+        assert [len(batch) for batch in client.batches] == [2, 1]
+
+    asyncio.run(scenario())
+
+
+def test_failed_entries_are_retried():
+    async def scenario():
+        client = FakeClient(failures={"a": 1, "b": 5})
+        logger = BatchSQSLogger(client, batch_size=10, flush_interval=60, max_retries=2)
+        await logger.publish("a")
+        await logger.publish("b")
+        await logger.stop()
+        sent = [body for batch in client.batches for body in batch]
+        # "a" succeeds on its retry, "b" is dropped after 1 + 2 attempts
+        assert sent.count("a") == 2
+        assert sent.count("b") == 3
+
+    asyncio.run(scenario())
+
+
+def test_publish_waits_while_buffer_is_full():
+    async def scenario():
+        client = FakeClient()
+        logger = BatchSQSLogger(client, batch_size=10, flush_interval=60, max_buffered=10)
+        logger._sending = 10
+        waiter = asyncio.create_task(logger.publish("late"))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        async with logger._room:
+            logger._sending = 0
+            logger._room.notify_all()
+        await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(scenario())
+
+
+def test_exhausted_retries_are_spooled(tmp_path):
+    async def scenario():
+        spool = StatusSpool(str(tmp_path))
+        spool.open()
+        client = FakeClient(failures={"a": 5})
+        logger = BatchSQSLogger(client, flush_interval=60, max_retries=1, spool=spool)
+        await logger.publish("a")
+        await logger.stop()
+        assert spool.read(10)[0] == ["a"]
+        spool.close()
+
+    asyncio.run(scenario())
+
+
+class UnreachableClient:
+    async def publish_messages(self, entries):
+        await asyncio.sleep(60)
+
+
+def test_pending_messages_are_spooled_past_the_shutdown_deadline(tmp_path):
+    async def scenario():
+        spool = StatusSpool(str(tmp_path))
+        spool.open()
+        logger = BatchSQSLogger(UnreachableClient(), flush_interval=60, spool=spool)
+        await logger.publish("a")
+        await logger.publish("b")
+
+        try:
+            await asyncio.wait_for(logger.stop(), 0.05)
+        except asyncio.TimeoutError:
+            logger.abandon()
+        assert spool.read(10)[0] == ["a", "b"]
+        spool.close()
+
+    asyncio.run(scenario())
+
+
+def test_pending_messages_are_logged_without_a_spool(caplog):
+    async def scenario():
+        logger = BatchSQSLogger(UnreachableClient(), flush_interval=60)
+        await logger.publish("a")
+        try:
+            await asyncio.wait_for(logger.stop(), 0.05)
+        except asyncio.TimeoutError:
+            logger.abandon()
+        assert logger._pending == []
+
+    asyncio.run(scenario())
+    assert "Dropping status update at the shutdown deadline: a" in caplog.text
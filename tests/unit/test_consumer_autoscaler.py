@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from app.pubsub.sqs.autoscaler import ConsumerAutoscaler
+from app.pubsub.sqs.consumer import SQSConsumer
+from app.pubsub.sqs.lane import ConsumerLane
+from app.pubsub.sqs.model import Response
+
+
+class DummyConsumer:
+    channel = "SMS"
+    max_pollers = 4
+    max_in_flight = 200
+    max_messages = 10
+    received = 0
+
+
+class IdleClient:
+    async def fetch_messages(self, max_no_of_messages, wait_time_seconds, visibility_timeout):
+        await asyncio.sleep(0.01)
+        return Response({})
+
+    async def change_visibility(self, entries):
+        return {}
+
+    async def ack_messages(self, entries):
+        return {}
+
+
+class DummyHandler:
+    async def handle_event(self, body):
+        pass
+
+
+def test_scales_down_to_lower_bounds_for_an_idle_queue():
+    autoscaler = ConsumerAutoscaler(DummyConsumer(), min_pollers=1, min_in_flight=5)
+    assert autoscaler.desired_scale(0, 0, 0.5, 0.05) == (1, 1, 5)
+
+
+def test_keeps_the_workers_of_a_consumer_keeping_up():
+    autoscaler = ConsumerAutoscaler(DummyConsumer(), min_pollers=1, min_in_flight=5)
+    # The queue looks empty, but 50 messages/second arrive and take 0.5 second each
+    pollers, batch_size, in_flight = autoscaler.desired_scale(0, 50, 0.5, 0.05)
+    assert in_flight == 25
+    assert (pollers, batch_size) == (1, 3)
+
+
+def test_scales_up_within_upper_bounds_for_a_backlog():
+    autoscaler = ConsumerAutoscaler(DummyConsumer(), target_drain_time=30)
+    pollers, batch_size, in_flight = autoscaler.desired_scale(3000, 0, 1, 0.1)
+    assert batch_size == 10
+    assert in_flight == 100
+    assert pollers == 1
+
+    pollers, batch_size, in_flight = autoscaler.desired_scale(100000, 0, 0.2, 0.5)
+    assert (pollers, batch_size, in_flight) == (4, 10, 200)
+
+
+def test_batch_size_is_bounded_by_the_configured_one():
+    autoscaler = ConsumerAutoscaler(DummyConsumer(), max_messages=5)
+    _, batch_size, _ = autoscaler.desired_scale(3000, 100, 1, 0.1)
+    assert batch_size == 5
+
+
+def test_arrival_rate_is_measured_between_samples():
+    consumer = DummyConsumer()
+    autoscaler = ConsumerAutoscaler(consumer)
+    autoscaler._sample_arrival_rate()
+    autoscaler._sampled_at = time.monotonic() - 10
+    consumer.received = 100
+
+    assert 9.9 < autoscaler._sample_arrival_rate() <= 10
+
+
+def test_nothing_is_restarted_once_stopping():
+    async def scenario():
+        consumer = SQSConsumer(
+            "SMS", [ConsumerLane("default", [IdleClient()])], DummyHandler(), max_in_flight=2
+        )
+        consumer.start()
+        autoscaler = ConsumerAutoscaler(consumer, interval=0.01)
+        autoscaler.start()
+        autoscaler.stop()
+        await consumer.stop(timeout=1)
+
+        # A late scaling request doesn't start receive loops on the drained lanes
+        consumer.scale(pollers=1, max_in_flight=4)
+        await asyncio.sleep(0.05)
+        assert all(task.done() for task in consumer._pollers.values())
+        assert all(task.done() for task in consumer._workers.values())
+        assert autoscaler._scaler.cancelled()
+
+    asyncio.run(scenario())
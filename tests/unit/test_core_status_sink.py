@@ -0,0 +1,105 @@
+import asyncio
+import gzip
+import json
+
+from torpedo.exceptions import HTTPRequestException
+
+from app.commons.logging.core import (CoreAioLogger, CoreStatusClient,
+                                      CoreStatusLogger)
+from app.service_clients.notifyone_core import NotifyOneCoreClient
+
+
+class FakeCore:
+    """
+    notifyone-core bulk endpoint - fails the requests with the scripted statuses in turn, then
+    rejects the updates listed in `rejected`
+    """
+
+    def __init__(self, statuses=None, rejected=()):
+        self.statuses = list(statuses or [])
+        self.rejected = set(rejected)
+        self.requests = []
+
+    async def publish_status_updates(self, status_updates):
+        self.requests.append(list(status_updates))
+        if self.statuses:
+            raise HTTPRequestException(None, self.statuses.pop(0), "Core request failed")
+        return [index for index, update in enumerate(status_updates) if update in self.rejected]
+
+
+def core_logger(monkeypatch, core, **kwargs):
+    monkeypatch.setattr(NotifyOneCoreClient, "publish_status_updates", core.publish_status_updates)
+    return CoreStatusLogger(CoreStatusClient(), flush_interval=60, **kwargs)
+
+
+def test_core_sink_defaults_to_its_own_batch_size():
+    async def scenario():
+        sink = CoreAioLogger({"BATCH": {"SIZE": 10}})
+        status_logger = sink._create_logger()
+        assert status_logger.batch_size == 100
+        assert status_logger.sqs_client is sink.core_client
+        assert not hasattr(sink, "sqs_client")
+        await status_logger.stop()
+
+    asyncio.run(scenario())
+
+
+def test_updates_are_published_in_batches_of_100(monkeypatch):
+    core = FakeCore()
+
+    async def scenario():
+        status_logger = core_logger(monkeypatch, core, batch_size=100)
+        for index in range(250):
+            await status_logger.publish(json.dumps({"id": index}))
+        await status_logger.stop()
+
+    asyncio.run(scenario())
+    assert [len(request) for request in core.requests] == [100, 100, 50]
+
+
+def test_requests_are_gzipped(monkeypatch):
+    posted = {}
+
+    class Result:
+        data = {"failed": [1]}
+
+    async def request(method, path, data=None, headers=None):
+        posted.update(method=method, path=path, data=data, headers=headers)
+        return Result()
+
+    monkeypatch.setattr(NotifyOneCoreClient, "request", request)
+    failed = asyncio.run(NotifyOneCoreClient.publish_status_updates(['{"id": 1}', '{"id": 2}']))
+
+    assert failed == [1]
+    assert posted["path"] == "/notifications/status/bulk"
+    assert posted["headers"]["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(posted["data"])) == {
+        "status_updates": [{"id": 1}, {"id": 2}]
+    }
+
+
+def test_failed_requests_and_rejected_updates_are_retried(monkeypatch):
+    # A server error fails the whole request, then core rejects a single update
+    core = FakeCore(statuses=[503], rejected={"b"})
+
+    async def scenario():
+        status_logger = core_logger(monkeypatch, core, batch_size=100, max_retries=2)
+        for update in ("a", "b", "c"):
+            await status_logger.publish(update)
+        await status_logger.stop()
+
+    asyncio.run(scenario())
+    # "b" is dropped after 1 + 2 attempts
+    assert core.requests == [["a", "b", "c"], ["a", "b", "c"], ["b"]]
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    core = FakeCore(statuses=[400])
+
+    async def scenario():
+        status_logger = core_logger(monkeypatch, core, batch_size=100, max_retries=2)
+        await status_logger.publish("a")
+        await status_logger.stop()
+
+    asyncio.run(scenario())
+    assert core.requests == [["a"]]
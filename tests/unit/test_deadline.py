@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from app.commons import deadline
+from app.services.handlers.deadline import NotificationDeadline
+
+
+def test_deadline_is_configured_per_channel_and_event_type():
+    NotificationDeadline.initialize({"sms": {"DEFAULT": 60, "EVENT_TYPES": {"otp": 15}}})
+    now = time.monotonic()
+
+    assert 14 < NotificationDeadline.deadline("sms", "otp") - now <= 15.1
+    assert 59 < NotificationDeadline.deadline("sms", "promotion") - now <= 60.1
+    assert NotificationDeadline.deadline("email", "otp") is None
+    # The deadline of the request takes precedence
+    assert 4 < NotificationDeadline.deadline("sms", "otp", time.time() + 5) - now <= 5.1
+    assert 14 < NotificationDeadline.deadline("sms", "otp", "soon") - now <= 15.1
+
+
+def test_timeouts_shrink_to_the_deadline_of_the_context():
+    async def call():
+        return deadline.timeout(30), deadline.timeout(None)
+
+    async def scenario():
+        assert await call() == (30, None)
+        token = deadline.set_deadline(time.monotonic() + 2)
+        try:
+            # Tasks started for the notification share its deadline
+            timeouts = await asyncio.create_task(call())
+            assert all(1.9 < timeout <= 2 for timeout in timeouts)
+            assert not deadline.expired()
+        finally:
+            deadline.reset_deadline(token)
+        assert deadline.remaining() is None
+
+        token = deadline.set_deadline(time.monotonic() - 1)
+        assert deadline.expired() and deadline.timeout(30) == 0
+        deadline.reset_deadline(token)
+
+    asyncio.run(scenario())
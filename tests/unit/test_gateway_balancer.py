@@ -0,0 +1,47 @@
+import collections
+
+import pytest
+
+from app.services.handlers.balancing import GatewayBalancer
+
+GATEWAYS = [
+    {"unique_identifier": "plivo_1", "gateway": "PLIVO"},
+    {"unique_identifier": "sms_country", "gateway": "SMS_COUNTRY"},
+    {"unique_identifier": "plivo_2", "gateway": "PLIVO", "weight": 3},
+]
+ORDER = ["plivo_1", "sms_country", "plivo_2"]
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    yield
+    GatewayBalancer.initialize({})
+
+
+def test_least_outstanding_instance_takes_the_first_place_of_its_gateway():
+    GatewayBalancer.initialize({"ENABLED": True})
+    balancer = GatewayBalancer(GATEWAYS)
+    outstanding = {"plivo_1": 2, "plivo_2": 3, "sms_country": 0}
+
+    # plivo_2 has 1 send in progress per unit of weight, plivo_1 has 2
+    assert balancer.balance(ORDER, outstanding.get) == ["plivo_2", "sms_country", "plivo_1"]
+    outstanding["plivo_2"] = 6
+    assert balancer.balance(ORDER, outstanding.get) == ORDER
+
+
+def test_weighted_instances_share_the_first_place():
+    GatewayBalancer.initialize({"ENABLED": True, "MODE": GatewayBalancer.WEIGHTED})
+    balancer = GatewayBalancer(GATEWAYS)
+    firsts = collections.Counter(
+        tuple(balancer.balance(ORDER, lambda _: 0)) for _ in range(4000)
+    )
+
+    assert set(firsts) == {tuple(ORDER), ("plivo_2", "sms_country", "plivo_1")}
+    assert 2700 < firsts[("plivo_2", "sms_country", "plivo_1")] < 3300
+
+
+def test_balancing_is_disabled_by_default():
+    balancer = GatewayBalancer(GATEWAYS)
+    assert balancer.balance(ORDER, {"plivo_1": 10}.get) == ORDER
+    with pytest.raises(ValueError):
+        GatewayBalancer.initialize({"MODE": "ROUND_ROBIN"})
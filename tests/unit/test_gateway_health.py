@@ -0,0 +1,72 @@
+import pytest
+
+from app.services.handlers.gateway_health import GatewayHealth
+
+
+@pytest.fixture(autouse=True)
+def enabled():
+    GatewayHealth.initialize({"ENABLED": True, "FAILURE_THRESHOLD": 3, "OPEN_INTERVAL": 30})
+    yield
+    GatewayHealth.initialize({})
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    health = GatewayHealth("plivo", clock=clock)
+    for _ in range(2):
+        health.record(False, 1)
+    health.record(True, 1)
+    for _ in range(2):
+        health.record(False, 1)
+    assert health.state == GatewayHealth.CLOSED and health.allow_request()
+
+    health.record(False, 5)
+    assert health.state == GatewayHealth.OPEN
+    assert not health.allow_request()
+
+
+def test_circuit_opens_on_low_success_rate(clock):
+    GatewayHealth.initialize({"ENABLED": True, "MIN_REQUESTS": 10, "ALPHA": 0.5})
+    health = GatewayHealth("plivo", clock=clock)
+    for _ in range(5):
+        health.record(True, 1)
+        health.record(False, 1)
+    assert health.state == GatewayHealth.OPEN
+
+
+def test_single_probe_closes_or_reopens_the_circuit(clock):
+    health = GatewayHealth("plivo", clock=clock)
+    for _ in range(3):
+        health.record(False, 1)
+
+    clock.now = 31
+    assert health.allow_request()
+    assert health.state == GatewayHealth.HALF_OPEN
+    # Only one probe at a time
+    assert not health.allow_request()
+    health.record(False, 1)
+    assert health.state == GatewayHealth.OPEN and not health.allow_request()
+
+    clock.now = 62
+    assert health.allow_request()
+    health.record(True, 1)
+    assert health.state == GatewayHealth.CLOSED
+    assert health.success_rate == 1.0 and health.allow_request()
+
+
+def test_lost_probe_is_replaced(clock):
+    health = GatewayHealth("plivo", clock=clock)
+    for _ in range(3):
+        health.record(False, 1)
+    clock.now = 31
+    assert health.allow_request()
+    clock.now = 62
+    assert health.allow_request()
+
+
+def test_disabled_circuit_never_opens(clock):
+    GatewayHealth.initialize({})
+    health = GatewayHealth("plivo", clock=clock)
+    for _ in range(10):
+        health.record(False, 1)
+    assert health.state == GatewayHealth.CLOSED and health.allow_request()
+    assert health.stats()["success_rate"] < 0.5
@@ -0,0 +1,107 @@
+import pytest
+
+from app.exceptions import PriorityLogicError
+from app.services.handlers.gateway_priority import (PriorityGatewaySelection,
+                                                    compile_priority_logic)
+
+
+class Selection(PriorityGatewaySelection):
+    PRIORITY_LOGIC = None
+
+    @classmethod
+    def get_priority_logic(cls):
+        return cls.PRIORITY_LOGIC
+
+    @classmethod
+    def get_default_priority(cls):
+        return ["plivo", "sms_country"]
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "__import__('os').system('true')",
+        "data.__class__",
+        "[g for g in data]",
+        "lambda: 1",
+        "['plivo'] if",
+    ],
+)
+def test_disallowed_expressions_are_rejected(expression):
+    with pytest.raises(PriorityLogicError):
+        compile_priority_logic(expression)
+
+
+def test_priority_logic_is_compiled_once_and_applied():
+    Selection.PRIORITY_LOGIC = (
+        "['sms_country', 'plivo'] if data.get('event_type') == 'otp' else ['plivo', 'sms_country']"
+    )
+    Selection.compile_priority_logic()
+
+    order = Selection.get_priority_order({"event_type": "otp"})
+    assert order == ["sms_country", "plivo"]
+    assert Selection.select_gateway(1, priority_order=order) == "plivo"
+    assert Selection.select_gateway(0, {"event_type": "promo"}) == "plivo"
+    assert compile_priority_logic(Selection.PRIORITY_LOGIC) is Selection._PRIORITY_LOGIC
+
+
+def test_invalid_priority_logic_falls_back_to_default_priority():
+    Selection.PRIORITY_LOGIC = "open('/etc/passwd')"
+    Selection.compile_priority_logic()
+
+    assert Selection._PRIORITY_LOGIC is None
+    assert Selection.get_priority_order({}) == ["plivo", "sms_country"]
+
+
+@pytest.mark.parametrize(
+    "expression, uses_recipient",
+    [
+        ("['plivo'] if data['event_type'] == 'otp' else ['sms_country']", False),
+        ("['plivo'] if data.get('app_name') == 'app' else ['sms_country']", False),
+        ("['plivo'] if data['to'].startswith('+1') else ['sms_country']", True),
+        ("['plivo'] if data.get('to') else ['sms_country']", True),
+        ("['plivo'] if data else ['sms_country']", True),
+        ("['plivo'] if data[data.get('key')] else ['sms_country']", True),
+    ],
+)
+def test_recipient_references_are_detected(expression, uses_recipient):
+    assert compile_priority_logic(expression).uses_recipient is uses_recipient
+
+
+def test_priority_order_is_memoized_per_event():
+    Selection.PRIORITY_LOGIC = (
+        "['sms_country', 'plivo'] if data['event_type'] == 'otp' else ['plivo', 'sms_country']"
+    )
+    Selection.compile_priority_logic()
+
+    order = Selection.get_priority_order({"to": "1", "event_id": 1, "event_type": "otp"})
+    assert order == ["sms_country", "plivo"]
+    assert Selection.get_priority_order({"to": "2", "event_id": 1, "event_type": "otp"}) is order
+    assert Selection.get_priority_order({"to": "1", "event_id": 2, "event_type": "promo"}) == [
+        "plivo",
+        "sms_country",
+    ]
+
+    # A new configuration invalidates the memoized orders
+    Selection.PRIORITY_LOGIC = "['plivo', 'sms_country']"
+    Selection.compile_priority_logic()
+    assert Selection.get_priority_order({"to": "1", "event_id": 1, "event_type": "otp"}) == [
+        "plivo",
+        "sms_country",
+    ]
+
+
+def test_priority_order_depending_on_recipient_is_not_memoized():
+    Selection.PRIORITY_LOGIC = (
+        "['sms_country', 'plivo'] if data['to'].startswith('+1') else ['plivo', 'sms_country']"
+    )
+    Selection.compile_priority_logic()
+
+    assert Selection.get_priority_order({"to": "+15550100", "event_id": 1}) == [
+        "sms_country",
+        "plivo",
+    ]
+    assert Selection.get_priority_order({"to": "+915550100", "event_id": 1}) == [
+        "plivo",
+        "sms_country",
+    ]
@@ -0,0 +1,42 @@
+from app.services.handlers.gateway_health import GatewayHealth
+from app.services.handlers.hedging import HedgingPolicy
+
+
+def test_policy_is_opted_in_per_channel_and_event_type():
+    HedgingPolicy.initialize(
+        {
+            "ENABLED": True,
+            "CHANNELS": {"sms": {"DUPLICATES_SAFE": True, "EVENT_TYPES": ["otp"]}, "email": {}},
+        }
+    )
+    # A hedged send can be delivered twice
+    assert HedgingPolicy.for_channel("email") is None
+    assert HedgingPolicy.for_channel("push") is None
+    policy = HedgingPolicy.for_channel("sms")
+    assert policy.applies("otp") and not policy.applies("promotion")
+
+    HedgingPolicy.initialize({"ENABLED": False, "CHANNELS": {"sms": {"DUPLICATES_SAFE": True}}})
+    assert HedgingPolicy.for_channel("sms") is None
+
+
+def test_hedges_are_capped_by_the_budget():
+    policy = HedgingPolicy(max_ratio=0.25, burst=2)
+    hedges = 0
+    for _ in range(40):
+        policy.record_send()
+        if policy.can_hedge():
+            policy.hedge()
+            hedges += 1
+    # The initial burst of 2, then a hedge every 4 sends
+    assert hedges == 11
+
+
+def test_latency_percentile_needs_enough_samples():
+    health = GatewayHealth("plivo")
+    for latency in range(1, 20):
+        health.record(True, latency / 100)
+    assert health.latency_percentile(0.95) is None
+    health.record(False, 5)
+    health.record(True, 0.2)
+    assert health.latency_percentile(0.95) == 0.2
+    assert health.latency_percentile(0.5) == 0.11
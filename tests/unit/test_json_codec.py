@@ -0,0 +1,23 @@
+import pytest
+
+from app.commons import json_codec
+
+
+@pytest.fixture(params=json_codec.available_backends())
+def backend(request):
+    default = json_codec.backend_name
+    json_codec.set_backend(request.param)
+    yield request.param
+    json_codec.set_backend(default)
+
+
+def test_round_trip(backend):
+    payload = {"to": "7827XXXXXX", "event_id": 111, "files": [{"url": "u"}], "cc": None}
+    encoded = json_codec.dumps(payload)
+    assert isinstance(encoded, str)
+    assert json_codec.loads(encoded) == payload
+
+
+def test_invalid_document_raises_json_decode_error(backend):
+    with pytest.raises(json_codec.JSONDecodeError):
+        json_codec.loads("{not json")
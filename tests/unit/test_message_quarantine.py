@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+from app.exceptions import MissingFieldError, PoisonMessageError, UnknownChannelError
+from app.pubsub.sqs.model import Message
+from app.pubsub.sqs.quarantine import MessageQuarantine
+
+
+class FailingClient:
+    async def publish_to_sqs(self, payload, batch=False):
+        raise ConnectionError("SQS is unreachable")
+
+
+def make_message():
+    return Message({"Body": '{"to": "9999999999"}', "ReceiptHandle": "rh", "MessageId": "id"})
+
+
+def test_spools_when_publishing_fails(tmp_path):
+    spool_path = tmp_path / "quarantine.jsonl"
+    quarantine = MessageQuarantine(FailingClient(), str(spool_path))
+
+    stored = asyncio.run(
+        quarantine.put("SMS", "default", make_message(), MissingFieldError("message"))
+    )
+
+    assert stored
+    record = json.loads(spool_path.read_text())
+    assert record["reason"] == "MISSING_FIELD"
+    assert record["body"] == '{"to": "9999999999"}'
+    assert quarantine.quarantined == 1
+
+
+def test_nothing_stored_without_a_destination():
+    quarantine = MessageQuarantine()
+
+    stored = asyncio.run(
+        quarantine.put("SMS", "default", make_message(), MissingFieldError("message"))
+    )
+
+    assert not stored
+    assert quarantine.quarantined == 0
+
+
+def test_channel_without_gateways_is_not_poison():
+    # Gateways are usually missing for a while only, the message is to be redelivered
+    assert not isinstance(UnknownChannelError("sms"), PoisonMessageError)
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.pubsub.sqs.prefetch import PrefetchBuffer
+
+
+def test_reserve_is_bounded_by_number_of_messages():
+    async def scenario():
+        buffer = PrefetchBuffer(max_messages=5, max_bytes=1024)
+        assert await buffer.reserve(10) == 5
+        await buffer.fill(5, [("a", 1), ("b", 1)])
+        assert len(buffer) == 2
+        assert await buffer.reserve(10) == 3
+
+    asyncio.run(scenario())
+
+
+def test_polling_waits_while_buffer_is_full_by_bytes():
+    async def scenario():
+        buffer = PrefetchBuffer(max_messages=10, max_bytes=100)
+        reserved = await buffer.reserve(10)
+        await buffer.fill(reserved, [("big", 150)])
+
+        waiter = asyncio.create_task(buffer.reserve(10))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        assert await buffer.get() == "big"
+        assert await asyncio.wait_for(waiter, 1) == 10
+        assert buffer.size_in_bytes == 0
+
+    asyncio.run(scenario())
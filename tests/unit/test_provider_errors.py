@@ -0,0 +1,155 @@
+import asyncio
+import json
+
+from app.commons.aws import aws_error_type
+from app.commons.http import ErrorType
+from app.service_clients.aws_sns_manager import AWSSNSManager
+from app.services.handlers.email.sparkpost import SparkPostHandler
+from app.services.handlers.push.apns import APNSHandler
+from app.services.handlers.push.fcm import FCMHandler
+from app.services.handlers.sms.plivo_manager import PlivoHandler
+from app.services.handlers.sms.sms_country_manager import SMSCountryHandler
+from app.services.handlers.sms.sns_manager import SnsHandler
+from app.services.handlers.whatsapp.interakt import InteraktHandler
+
+RECIPIENT = ErrorType.PERMANENT_RECIPIENT.value
+CONFIG = ErrorType.PERMANENT_CONFIG.value
+TRANSIENT = ErrorType.TRANSIENT.value
+THROTTLED = ErrorType.THROTTLED.value
+
+
+class FakeResponse:
+    def __init__(self, status, body, headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    async def json(self, loads=json.loads):
+        return self.body
+
+    async def text(self):
+        return self.body if isinstance(self.body, str) else json.dumps(self.body)
+
+
+class AWSError(Exception):
+    def __init__(self, code, message="", status_code=400):
+        super().__init__(message)
+        self.response = {
+            "Error": {"Code": code, "Message": message},
+            "ResponseMetadata": {"HTTPStatusCode": status_code},
+        }
+
+
+def send(provider, response, to="9999999999", message="Hello"):
+    async def request(*args, **kwargs):
+        return response
+
+    provider.request = request
+    return asyncio.run(provider.send_notification(to, message))
+
+
+def test_aws_errors_are_recipient_errors_only_for_the_recipient_parameter():
+    invalid_number = AWSError(
+        "InvalidParameter", "Invalid parameter: PhoneNumber Reason: +9199 is not valid"
+    )
+    assert aws_error_type(invalid_number) == RECIPIENT
+    # The same codes are returned for a bad sender ID or an unverified From address
+    bad_sender = AWSError(
+        "InvalidParameter", "Invalid parameter: MessageAttributes Reason: invalid sender ID"
+    )
+    assert aws_error_type(bad_sender) is None
+    assert aws_error_type(AWSError("InvalidParameterValue", "Missing final '@domain'")) is None
+    assert aws_error_type(AWSError("MessageRejected", "Email address is not verified")) == CONFIG
+    assert aws_error_type(AWSError("Throttling", "Maximum sending rate exceeded")) == THROTTLED
+    assert aws_error_type(AWSError("InternalFailure", status_code=500)) == TRANSIENT
+
+
+def test_sns_errors(monkeypatch):
+    monkeypatch.setattr(AWSSNSManager, "initialize", lambda config: None)
+    provider = SnsHandler({"MESSAGE_ATTRIBUTES": {}})
+
+    async def invalid_number(**kwargs):
+        raise AWSError("InvalidParameter", "Invalid parameter: PhoneNumber Reason: invalid")
+
+    monkeypatch.setattr(AWSSNSManager, "send_sms", invalid_number)
+    assert asyncio.run(provider.send_notification("99", "Hello")).error_type == RECIPIENT
+
+    async def throttled(**kwargs):
+        raise AWSError("Throttled", "Rate exceeded")
+
+    monkeypatch.setattr(AWSSNSManager, "send_sms", throttled)
+    assert asyncio.run(provider.send_notification("99", "Hello")).error_type == THROTTLED
+
+
+def test_plivo_errors():
+    config = {
+        "PLIVO_SMS_URL": "https://api.plivo.com/v1/Account/{auth_id}/Message/",
+        "PLIVO_AUTH_TOKEN": "token",
+        "PLIVO_AUTH_ID": "id",
+        "PLIVO_CALLBACK_URL": "https://callback",
+        "PLIVO_SENDER_ID": "SENDER",
+    }
+    # Plivo doesn't tell the failures apart by code, they fail over to the next gateway
+    invalid_number = FakeResponse(400, {"api_id": "1", "error": "invalid 'dst' parameter"})
+    assert send(PlivoHandler(config), invalid_number).error_type is None
+    unavailable = FakeResponse(503, {"api_id": "1", "error": "service unavailable"})
+    assert send(PlivoHandler(config), unavailable).error_type == TRANSIENT
+    unauthorized = FakeResponse(401, {"api_id": "1", "error": "authentication failed"})
+    assert send(PlivoHandler(config), unauthorized).error_type == CONFIG
+
+
+def test_sms_country_errors():
+    provider = SMSCountryHandler({"SMS_COUNTRY_URL": "https://smscountry"})
+
+    assert send(provider, FakeResponse(200, "ERROR: Invalid Mobile Number")).error_type is None
+    assert send(provider, FakeResponse(502, "Bad Gateway")).error_type == TRANSIENT
+    assert send(provider, FakeResponse(200, "OK:1234")).error_type is None
+
+
+def test_interakt_errors():
+    provider = InteraktHandler({"HOST": "https://api.interakt.ai", "PATH": "/v1/message/"})
+    data = {"template": "otp:en", "body_values": ["1234"]}
+
+    # A missing template is a gateway configuration problem, not a recipient one
+    template = FakeResponse(400, {"result": False, "message": "Template not found"})
+    assert send(provider, template, message=data).error_type is None
+    throttled = FakeResponse(429, {"result": False, "message": "Too many requests"})
+    assert send(provider, throttled, message=data).error_type == THROTTLED
+
+
+def test_sparkpost_errors():
+    def format_response(status, errors, headers=None):
+        response = FakeResponse(status, {"errors": errors}, headers)
+        return asyncio.run(SparkPostHandler.format_response(response))
+
+    suppressed = [{"message": "Message generation rejected", "code": "1902"}]
+    assert format_response(422, suppressed).error_type == RECIPIENT
+    invalid_recipients = [{"message": "invalid data format/type", "code": "1300"}]
+    assert format_response(422, invalid_recipients).error_type is None
+    sending_domain = [{"message": "Unconfigured Sending Domain", "code": "7001"}]
+    assert format_response(422, sending_domain).error_type == CONFIG
+
+    throttled = format_response(429, [{"message": "Too many requests"}], {"Retry-After": "2"})
+    assert (throttled.error_type, throttled.retry_after) == (THROTTLED, 2)
+
+
+def test_apns_errors():
+    def format_response(status, reason):
+        return asyncio.run(APNSHandler.format_response(FakeResponse(status, {"reason": reason})))
+
+    assert format_response(410, "Unregistered").error_type == RECIPIENT
+    assert format_response(400, "BadDeviceToken").error_type == RECIPIENT
+    assert format_response(400, "BadTopic").error_type == CONFIG
+    assert format_response(400, "PayloadTooLarge").error_type is None
+    assert format_response(503, "ServiceUnavailable").error_type == TRANSIENT
+
+
+def test_fcm_errors():
+    def format_response(status, headers=None):
+        response = FakeResponse(status, {"error": "failed"}, headers)
+        return asyncio.run(FCMHandler.format_response(response))
+
+    assert format_response(401).error_type == CONFIG
+    assert format_response(400).error_type is None
+    unavailable = format_response(503, {"Retry-After": "10"})
+    assert (unavailable.error_type, unavailable.retry_after) == (TRANSIENT, 10)
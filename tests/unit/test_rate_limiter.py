@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.commons.resp import RedisConnection
+from app.services.handlers.rate_limit_store import RedisBucketStore
+from app.services.handlers.rate_limit import (RateLimiter, RedisTokenBucket,
+                                                TokenBucket)
+
+
+def test_bucket_refills_at_its_rate_up_to_its_burst(clock):
+    bucket = TokenBucket(rate=10, burst=2, clock=clock)
+
+    async def scenario():
+        assert await bucket.acquire(0) and await bucket.acquire(0)
+        assert not await bucket.acquire(0.05)
+        assert bucket.delay() == 0.1
+        clock.now = 10
+        assert bucket.delay() == 0 and bucket.tokens == 2
+
+    asyncio.run(scenario())
+
+
+def test_senders_wait_their_turn_within_the_max_wait():
+    bucket = TokenBucket(rate=20, burst=1)
+
+    async def scenario():
+        started_at = time.monotonic()
+        results = await asyncio.gather(*(bucket.acquire(0.12) for _ in range(4)))
+        return results, time.monotonic() - started_at
+
+    results, elapsed = asyncio.run(scenario())
+    # The first token is available right away, the next two within 0.1s, the last one too late
+    assert results == [True, True, True, False]
+    assert 0.08 < elapsed < 0.3
+
+
+def test_limiter_is_kept_across_configuration_refreshes():
+    RateLimiter.initialize({"ENABLED": True})
+    try:
+        assert RateLimiter.for_gateway({"unique_identifier": "plivo"}) is None
+        limiter = RateLimiter.for_gateway({"rate_limit": {"tps": 5}})
+        assert limiter.burst == 5
+        assert RateLimiter.for_gateway({"rate_limit": {"tps": 5}}, limiter) is limiter
+        assert RateLimiter.for_gateway({"rate_limit": {"tps": 5, "burst": 1}}, limiter) is not limiter
+    finally:
+        RateLimiter.initialize({})
+    assert RateLimiter.for_gateway({"rate_limit": {"tps": 5}}) is None
+
+
+class SharedBucket:
+    """
+    Stand-in of the Redis lease script, a bucket shared by the limiters using it
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.buckets = {}
+        self.leases = 0
+        self.available = True
+
+    async def lease(self, key, rate, burst, count):
+        if not self.available:
+            raise ConnectionError("Redis unavailable")
+        self.leases += 1
+        tokens, updated_at = self.buckets.get(key, (burst, self.clock()))
+        tokens = min(burst, tokens + (self.clock() - updated_at) * rate)
+        granted = min(count, int(tokens))
+        self.buckets[key] = (tokens - granted, self.clock())
+        return granted
+
+
+def test_shared_bucket_is_leased_in_chunks_across_limiters(clock):
+    store = SharedBucket(clock)
+
+    async def scenario():
+        limiters = [
+            RedisTokenBucket("plivo", 10, 10, store, lease_size=4, clock=clock) for _ in range(2)
+        ]
+        granted = [await limiters[index % 2].acquire(0) for index in range(12)]
+        # 10 tokens in the shared bucket, leased 4 at a time - the last ones by the first limiter
+        assert granted == [True] * 9 + [False, True, False]
+        assert store.leases == 5
+
+        clock.now = 0.5
+        assert await limiters[0].acquire(0)
+        assert limiters[0].leased == 3
+
+    asyncio.run(scenario())
+
+
+def test_local_limit_is_used_while_redis_is_unavailable(clock):
+    store = SharedBucket(clock)
+    store.available = False
+
+    async def scenario():
+        # Every process takes its share of the limit on its own
+        limiter = RedisTokenBucket("plivo", 10, 4, store, fallback_share=0.5, clock=clock)
+        assert await limiter.acquire(0) and await limiter.acquire(0)
+        assert not await limiter.acquire(0)
+        assert store.leases == 0
+
+        # Redis is tried again after the retry interval
+        store.available = True
+        clock.now = RateLimiter.REDIS_RETRY_INTERVAL
+        assert await limiter.acquire(0)
+        assert store.leases == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def redis_url():
+    """
+    URL of a fake Redis server running Lua scripts
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "redis://127.0.0.1:{}/0".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def test_lease_script_grants_the_tokens_of_the_shared_bucket(redis_url):
+    async def scenario():
+        connection = RedisConnection(redis_url)
+        RedisBucketStore.initialize(connection)
+        leases = [await RedisBucketStore.lease("plivo", 1, 10, 4) for _ in range(4)]
+        assert leases == [4, 4, 2, 0]
+        # The buckets of other gateways are apart
+        assert await RedisBucketStore.lease("sns", 1, 10, 4) == 4
+
+        await asyncio.sleep(1.1)
+        assert await RedisBucketStore.lease("plivo", 1, 10, 4) == 1
+        await connection.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import aiohttp
+
+from app.commons import deadline
+from app.commons.http import ErrorType, Response, error_type_of, exception_error_type
+from app.services.handlers.retry import RetryPolicy
+
+
+def failure(error_type, retry_after=None):
+    return Response(
+        status_code=400, error={"error": "failed"}, error_type=error_type, retry_after=retry_after
+    )
+
+
+def test_errors_are_classified_by_status_and_exception():
+    assert error_type_of(429) == ErrorType.THROTTLED.value
+    assert error_type_of(503) == ErrorType.TRANSIENT.value
+    assert error_type_of(401) == ErrorType.PERMANENT_CONFIG.value
+    assert error_type_of(400) is None
+
+    assert exception_error_type(asyncio.TimeoutError()) == ErrorType.TRANSIENT.value
+    # Errors wrapped by the API client are classified by their cause
+    try:
+        try:
+            raise aiohttp.ClientConnectionError()
+        except aiohttp.ClientConnectionError as err:
+            raise Exception("request failed") from err
+    except Exception as err:
+        assert exception_error_type(err) == ErrorType.TRANSIENT.value
+    assert exception_error_type(KeyError("id")) is None
+
+
+def test_only_transient_and_throttled_sends_are_retried():
+    RetryPolicy.initialize({"MAX_RETRIES": 2, "BACKOFF": 0.2, "MAX_THROTTLE_WAIT": 1})
+
+    assert 0 <= RetryPolicy.delay(failure(ErrorType.TRANSIENT.value), 0) <= 0.2
+    assert 0 <= RetryPolicy.delay(failure(ErrorType.TRANSIENT.value), 1) <= 0.4
+    assert RetryPolicy.delay(failure(ErrorType.TRANSIENT.value), 2) is None
+    assert RetryPolicy.delay(failure(ErrorType.THROTTLED.value, retry_after=0.5), 0) == 0.5
+    # Waiting longer on a throttled gateway isn't worth it, the next one is tried
+    assert RetryPolicy.delay(failure(ErrorType.THROTTLED.value, retry_after=5), 0) is None
+    assert RetryPolicy.delay(failure(ErrorType.PERMANENT_RECIPIENT.value), 0) is None
+    assert RetryPolicy.delay(failure(ErrorType.PERMANENT_CONFIG.value), 0) is None
+    assert RetryPolicy.delay(failure(None), 0) is None
+
+
+def test_no_retry_past_the_deadline():
+    RetryPolicy.initialize({"MAX_RETRIES": 1})
+    token = deadline.set_deadline(time.monotonic() + 0.3)
+    try:
+        assert RetryPolicy.delay(failure(ErrorType.THROTTLED.value, retry_after=0.5), 0) is None
+        assert RetryPolicy.delay(failure(ErrorType.THROTTLED.value, retry_after=0.1), 0) == 0.1
+    finally:
+        deadline.reset_deadline(token)
@@ -0,0 +1,192 @@
+import asyncio
+
+from app.pubsub.sqs.consumer import SQSConsumer
+from app.pubsub.sqs.lane import ConsumerLane
+from app.pubsub.sqs.prefetch import PrefetchBuffer
+
+
+class SlowHandler:
+    """
+    Takes `delay` seconds per message, or until `release` is set
+    """
+
+    def __init__(self, delay=None):
+        self.delay = delay
+        self.release = asyncio.Event()
+        self.started = []
+        self.handled = []
+
+    async def handle_event(self, body):
+        self.started.append(body)
+        if self.delay is None:
+            await self.release.wait()
+        else:
+            await asyncio.sleep(self.delay)
+        self.handled.append(body)
+
+
+def make_consumer(sqs_client, handler, max_in_flight):
+    # Acks are only flushed by batch size or at the shutdown
+    lane = ConsumerLane("default", [sqs_client], ack_flush_interval=60)
+    return SQSConsumer("SMS", [lane], handler, max_in_flight=max_in_flight)
+
+
+async def wait_until(condition, timeout=1):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.005)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_stop_waits_for_messages_in_flight_and_flushes_their_acks(sqs_client):
+    async def scenario():
+        sqs_client.queue.extend(["a", "b"])
+        handler = SlowHandler(delay=0.1)
+        consumer = make_consumer(sqs_client, handler, max_in_flight=2)
+        consumer.start()
+        await wait_until(lambda: len(handler.started) == 2)
+
+        await consumer.stop(timeout=1)
+
+        assert handler.handled == ["a", "b"]
+        # Acks still pending at the shutdown are deleted before returning
+        assert sorted(sqs_client.acked) == ["rh-a", "rh-b"]
+        assert sqs_client.released == []
+
+    asyncio.run(scenario())
+
+
+def test_stop_returns_the_buffered_messages_to_the_queue(sqs_client):
+    async def scenario():
+        sqs_client.queue.extend(["a", "b", "c", "d"])
+        handler = SlowHandler(delay=0.05)
+        consumer = make_consumer(sqs_client, handler, max_in_flight=1)
+        consumer.start()
+        await wait_until(lambda: handler.started == ["a"])
+
+        await consumer.stop(timeout=1)
+
+        # The message being handled is done, the ones never started are made visible again
+        assert handler.started == handler.handled == ["a"]
+        assert sqs_client.acked == ["rh-a"]
+        assert sqs_client.released == ["rh-b", "rh-c", "rh-d"]
+
+    asyncio.run(scenario())
+
+
+def test_stop_gives_up_on_messages_in_flight_at_the_deadline(sqs_client):
+    async def scenario():
+        sqs_client.queue.extend(["a"])
+        handler = SlowHandler()
+        consumer = make_consumer(sqs_client, handler, max_in_flight=1)
+        consumer.start()
+        await wait_until(lambda: handler.started == ["a"])
+
+        await asyncio.wait_for(consumer.stop(timeout=0.05), 1)
+
+        # Neither deleted nor released, it is redelivered after its visibility timeout
+        assert handler.handled == []
+        assert sqs_client.acked == sqs_client.released == []
+        assert all(task.done() for task in consumer._workers.values())
+
+    asyncio.run(scenario())
+
+
+async def buffered_lanes(consumer, messages):
+    """
+    Give the lanes of a (not started) consumer their buffers, with `messages` buffered each
+    """
+    consumer._changed = asyncio.Condition()
+    for lane in consumer.lanes:
+        lane.buffer = PrefetchBuffer(100, 1024 * 1024, consumer._changed)
+        await lane.buffer.fill(0, [(index, 1) for index in range(messages)])
+        lane.resize(consumer.max_in_flight)
+
+
+async def dispatch(consumer, count):
+    """
+    Lanes of the next `count` messages handed to the workers, none of them done
+    """
+    return [(await consumer._next_message())[0].name for _ in range(count)]
+
+
+def test_lanes_are_served_in_proportion_to_their_weights(sqs_client):
+    async def scenario():
+        lanes = [
+            ConsumerLane("transactional", [sqs_client], weight=3),
+            ConsumerLane("promotional", [sqs_client], weight=1),
+        ]
+        consumer = SQSConsumer("SMS", lanes, SlowHandler(), max_in_flight=100)
+        await buffered_lanes(consumer, 50)
+
+        served = await dispatch(consumer, 40)
+        assert served.count("transactional") == 30
+        assert served.count("promotional") == 10
+
+    asyncio.run(scenario())
+
+
+def test_critical_lane_borrows_only_the_workers_left_idle(sqs_client):
+    async def scenario():
+        otp = ConsumerLane("otp", [sqs_client], concurrency_share=0.5, critical=True)
+        bulk = ConsumerLane("bulk", [sqs_client], concurrency_share=0.5)
+        consumer = SQSConsumer("SMS", [otp, bulk], SlowHandler(), max_in_flight=4)
+        await buffered_lanes(consumer, 5)
+
+        # 2 workers each, their concurrency share
+        assert sorted(await dispatch(consumer, 4)) == ["bulk", "bulk", "otp", "otp"]
+
+        # Below its share, the other lane is served first
+        bulk.in_flight -= 1
+        assert await dispatch(consumer, 1) == ["bulk"]
+        # At its share, the critical lane goes beyond its own
+        assert await dispatch(consumer, 2) == ["otp", "otp"]
+        assert otp.in_flight == 4
+
+        # A lane that isn't critical never does
+        otp.buffer.drain()
+        assert consumer._select_lane() is None
+
+    asyncio.run(scenario())
+
+
+def test_workers_bound_the_messages_in_flight(sqs_client):
+    async def scenario():
+        sqs_client.queue.extend([str(index) for index in range(10)])
+        handler = SlowHandler()
+        consumer = make_consumer(sqs_client, handler, max_in_flight=3)
+        consumer.start()
+        await wait_until(lambda: len(handler.started) == 3)
+        await asyncio.sleep(0.05)
+        assert len(handler.started) == 3
+
+        handler.release.set()
+        await wait_until(lambda: len(handler.handled) == 10)
+        await consumer.stop(timeout=1)
+        assert sorted(sqs_client.acked) == sorted("rh-" + str(index) for index in range(10))
+
+    asyncio.run(scenario())
+
+
+def test_messages_failing_to_be_handled_are_left_in_the_queue(sqs_client):
+    class FailingHandler:
+        async def handle_event(self, body):
+            if body == "b":
+                raise ConnectionError("gateway unreachable")
+
+    async def scenario():
+        sqs_client.queue.extend(["a", "b"])
+        consumer = make_consumer(sqs_client, FailingHandler(), max_in_flight=2)
+        consumer.start()
+        lane = consumer.lanes[0]
+        handled = lambda: not (lane.in_flight or len(lane.buffer))  # noqa: E731
+        await wait_until(lambda: consumer.received == 2 and handled())
+        await consumer.stop(timeout=1)
+
+        assert sqs_client.acked == ["rh-a"]
+        # Nor released, the message is redelivered after its visibility timeout
+        assert sqs_client.released == []
+        assert lane.heartbeat._in_flight == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,37 @@
+import asyncio
+import json
+
+import pytest
+
+from app.exceptions import MissingFieldError
+from app.pubsub.sqs_handler.sqs_handler import (EmailSqsHandler,
+                                                PushSqsHandler,
+                                                SMSSqsHandler,
+                                                WhatsappSqsHandler)
+
+
+def handle(handler, event):
+    return asyncio.run(handler.handle_event(json.dumps(event)))
+
+
+def assert_missing(handler, event, field):
+    with pytest.raises(MissingFieldError) as err:
+        handle(handler, event)
+    assert field in str(err.value)
+
+
+def test_sms_without_recipient_is_poison():
+    assert_missing(SMSSqsHandler, {"message": "Hello", "notification_log_id": "1"}, "to")
+
+
+def test_email_without_recipient_or_message_is_poison():
+    assert_missing(EmailSqsHandler, {"message": {"subject": "Hello"}}, "to")
+    assert_missing(EmailSqsHandler, {"to": {"to": ["user@example.com"]}}, "message")
+
+
+def test_whatsapp_without_mobile_is_poison():
+    assert_missing(WhatsappSqsHandler, {"template": "otp", "body_values": ["1234"]}, "mobile")
+
+
+def test_push_without_push_data_is_poison():
+    assert_missing(PushSqsHandler, {"notification_log_id": "1"}, "push_data")
@@ -0,0 +1,54 @@
+import asyncio
+import base64
+import gzip
+import json
+
+from app.commons.logging.compaction import LocalBlobStore, StatusCompactor, project
+
+
+def test_project_keeps_dotted_and_wildcard_paths():
+    metadata = {
+        "msys": {"message_event": {"type": "bounce", "raw_reason": "550", "rcpt_to": "a@b.c"}},
+        "results": {"id": "1", "total_accepted_recipients": 1},
+    }
+
+    projected = project(metadata, ["results.id", "msys.*.type", "missing.field"])
+
+    assert projected == {"results": {"id": "1"}, "msys": {"message_event": {"type": "bounce"}}}
+    assert project("plain text", ["results.id"]) == "plain text"
+    assert project(metadata, None) is metadata
+
+
+def test_oversized_fields_are_compressed():
+    compactor = StatusCompactor(max_field_bytes=1024)
+    metadata = {"results": ["ok"] * 1000}
+
+    message = json.loads(asyncio.run(compactor.compact({"status": "SUCCESS", "metadata": metadata})))
+
+    assert message["metadata"]["encoding"] == "gzip+base64"
+    decoded = gzip.decompress(base64.b64decode(message["metadata"]["data"]))
+    assert json.loads(decoded) == metadata
+
+
+def test_incompressible_fields_are_truncated_without_a_store():
+    compactor = StatusCompactor(max_field_bytes=64, compress=False)
+
+    message = json.loads(asyncio.run(compactor.compact({"message": "x" * 1000})))
+
+    assert message["message"]["truncated"]
+    assert len(message["message"]["data"]) == 64
+
+
+def test_large_updates_are_claim_checked(tmp_path):
+    compactor = StatusCompactor(
+        max_field_bytes=10 ** 6, max_message_bytes=256, store=LocalBlobStore(str(tmp_path))
+    )
+    payload = {"notification_log_id": "42", "status": "SUCCESS", "sent_to": ["x" * 40] * 20}
+
+    message = json.loads(asyncio.run(compactor.compact(dict(payload))))
+
+    assert message["notification_log_id"] == "42"
+    assert "sent_to" not in message
+    path = message["claim_check"][len("file://") :]
+    with open(path, "rb") as blob:
+        assert json.loads(gzip.decompress(blob.read()))["sent_to"] == payload["sent_to"]
@@ -0,0 +1,54 @@
+import asyncio
+
+from app.commons.logging.outbox import StatusOutbox
+from app.commons.logging.types import AsyncLogger, AsyncLoggerContextCreator, LogRecord
+
+
+class SlowLogger(AsyncLogger, AsyncLoggerContextCreator):
+    def __init__(self, delay):
+        self.delay = delay
+        self.logged = []
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def log(self, log, extras=None):
+        await asyncio.sleep(self.delay)
+        self.logged.append(log.log_id)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_logging_does_not_wait_for_publishing():
+    async def scenario():
+        inner = SlowLogger(delay=0.5)
+        outbox = StatusOutbox(inner, max_size=10, publishers=2)
+        async with outbox as log:
+            await asyncio.wait_for(log.log(LogRecord("1")), 0.1)
+            await asyncio.wait_for(log.log(LogRecord("2")), 0.1)
+        await outbox.close()
+        assert sorted(inner.logged) == ["1", "2"]
+        assert inner.closed
+
+    asyncio.run(scenario())
+
+
+def test_drop_policy_counts_dropped_updates():
+    async def scenario():
+        inner = SlowLogger(delay=10)
+        outbox = StatusOutbox(
+            inner, max_size=2, overflow=StatusOutbox.DROP, publishers=1, drain_timeout=0
+        )
+        async with outbox as log:
+            await log.log(LogRecord("0"))
+            # Let the publisher pick it up
+            await asyncio.sleep(0)
+            for index in range(1, 5):
+                await log.log(LogRecord(str(index)))
+        # One update is being published, two wait in the outbox
+        assert outbox.stats() == {"pending": 2, "spilled": 0, "dropped": 2}
+        await outbox.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from app.commons.logging.spool import SpoolReplayer, StatusSpool
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_records_are_read_back_in_order_across_segments(tmp_path, use_mmap):
+    spool = StatusSpool(str(tmp_path), segment_bytes=64, use_mmap=use_mmap)
+    spool.open()
+    records = ['{"id": %s}' % index for index in range(20)]
+    for record in records:
+        spool.append(record)
+
+    read = []
+    while True:
+        batch, position = spool.read(3)
+        if not batch:
+            break
+        read.extend(batch)
+        spool.commit(position)
+    spool.close()
+
+    assert read == records
+    assert spool.pending_bytes() == 0
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_records_longer_than_a_read_chunk_are_read_whole(tmp_path, monkeypatch, use_mmap):
+    monkeypatch.setattr(StatusSpool, "READ_CHUNK_BYTES", 16)
+    spool = StatusSpool(str(tmp_path), segment_bytes=128, use_mmap=use_mmap)
+    spool.open()
+    large = '{"message": "%s"}' % ("x" * 100)
+    # The large update is followed by others in its segment, then by another segment
+    records = ['{"id": 0}', large, '{"id": 1}', '{"id": 2}', large, '{"id": 3}']
+    for record in records:
+        spool.append(record)
+
+    read = []
+    while True:
+        batch, position = spool.read(10)
+        if not batch:
+            break
+        read.extend(batch)
+        spool.commit(position)
+    spool.close()
+
+    assert read == records
+
+
+def test_uncommitted_records_survive_a_restart(tmp_path):
+    spool = StatusSpool(str(tmp_path), segment_bytes=64)
+    spool.open()
+    for index in range(5):
+        spool.append(str(index))
+    batch, position = spool.read(2)
+    spool.commit(position)
+    spool.read(2)
+    spool.close()
+
+    reopened = StatusSpool(str(tmp_path), segment_bytes=64)
+    reopened.open()
+    assert reopened.path == spool.path
+    assert reopened.read(10)[0] == ["2", "3", "4"]
+    reopened.close()
+
+
+def test_concurrent_processes_get_spools_of_their_own(tmp_path):
+    first, second = StatusSpool(str(tmp_path)), StatusSpool(str(tmp_path))
+    first.open()
+    second.open()
+    assert first.path != second.path
+    first.close()
+    second.close()
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+
+    async def publish_messages(self, entries):
+        self.published.extend(entry["MessageBody"] for entry in entries)
+        return {}
+
+
+def test_replayer_publishes_spooled_records(tmp_path):
+    spool = StatusSpool(str(tmp_path))
+    spool.open()
+    for index in range(15):
+        spool.append(str(index))
+    client = FakeClient()
+    replayer = SpoolReplayer(spool, client, rate=1000)
+
+    asyncio.run(replayer.replay())
+    asyncio.run(replayer.replay())
+
+    assert client.published == [str(index) for index in range(15)]
+    assert spool.read(10)[0] == []
+    spool.close()
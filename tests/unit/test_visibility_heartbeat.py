@@ -0,0 +1,94 @@
+import asyncio
+
+from app.pubsub.sqs import heartbeat
+from app.pubsub.sqs.heartbeat import VisibilityHeartbeat
+
+
+def test_expiring_messages_are_extended(monkeypatch, clock, sqs_client):
+    monkeypatch.setattr(heartbeat, "time", clock)
+    beats = VisibilityHeartbeat(sqs_client, visibility_timeout=30)
+
+    beats.track("a")
+    clock.now = 10
+    beats.track("b")
+
+    clock.now = 15
+    asyncio.run(beats.beat())
+    assert sqs_client.changes == []
+
+    # "a" has less than a third of its visibility timeout left
+    clock.now = 21
+    asyncio.run(beats.beat())
+    assert sqs_client.changes == [{"a": 30}]
+    assert beats._in_flight["a"] == (0, 51)
+
+    # "a" isn't due again before "b"
+    clock.now = 31
+    asyncio.run(beats.beat())
+    assert sqs_client.changes[-1] == {"b": 30}
+
+
+def test_untracked_messages_are_not_extended(monkeypatch, clock, sqs_client):
+    monkeypatch.setattr(heartbeat, "time", clock)
+    beats = VisibilityHeartbeat(sqs_client, visibility_timeout=30)
+
+    beats.track("a")
+    beats.untrack("a")
+    clock.now = 25
+    asyncio.run(beats.beat())
+
+    assert sqs_client.changes == []
+    assert beats._in_flight == {}
+
+
+def test_visibility_is_not_extended_past_the_max_processing_time(monkeypatch, clock, sqs_client):
+    monkeypatch.setattr(heartbeat, "time", clock)
+    beats = VisibilityHeartbeat(sqs_client, visibility_timeout=30, max_processing_time=50)
+
+    beats.track("a")
+    clock.now = 25
+    asyncio.run(beats.beat())
+    # Up to the ceiling only
+    assert sqs_client.changes == [{"a": 25}]
+
+    clock.now = 50
+    asyncio.run(beats.beat())
+    assert len(sqs_client.changes) == 1
+    assert beats._in_flight == {}
+
+
+def test_failed_extensions_are_retried_on_the_next_beat(monkeypatch, clock, sqs_client):
+    monkeypatch.setattr(heartbeat, "time", clock)
+    sqs_client.failed.add("a")
+    beats = VisibilityHeartbeat(sqs_client, visibility_timeout=30)
+
+    beats.track("a")
+    clock.now = 25
+    asyncio.run(beats.beat())
+    sqs_client.failed.clear()
+    clock.now = 26
+    asyncio.run(beats.beat())
+
+    assert sqs_client.changes == [{"a": 30}, {"a": 30}]
+    assert beats._in_flight["a"] == (0, 56)
+
+
+def test_messages_handled_during_a_beat_are_skipped(monkeypatch, clock, sqs_client):
+    monkeypatch.setattr(heartbeat, "time", clock)
+    beats = VisibilityHeartbeat(sqs_client, visibility_timeout=30)
+    change_visibility = sqs_client.change_visibility
+
+    async def handled_meanwhile(entries):
+        # "m15" is done and untracked while the first batch is being extended
+        beats.untrack("m15")
+        return await change_visibility(entries)
+
+    sqs_client.change_visibility = handled_meanwhile
+    for index in range(20):
+        beats.track("m{}".format(index))
+    clock.now = 25
+    asyncio.run(beats.beat())
+
+    assert [len(change) for change in sqs_client.changes] == [10, 9]
+    assert "m15" not in sqs_client.changes[1]
+    assert all(visible_at == 55 for _, visible_at in beats._in_flight.values())